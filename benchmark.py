@@ -0,0 +1,304 @@
+import argparse
+import json
+import platform
+import random
+import string
+import sys
+import time
+
+import numpy as np
+
+from tools import adaptive
+from tools import breed
+from tools import crossover
+from tools import evolve
+from tools import genome
+from tools import mutation
+from tools import population
+from tools import rng
+from tools import selection
+from tools import steady_state
+
+"""
+Benchmark of the genetic algorithm operators.
+
+Every public operator of tools (sel_* and WeightedSampler, breed_*, co_*, mut_*, evolve_* and SteadyState.step) is timed
+over a sweep of population sizes, genome lengths and genome representations:
+list: list of lists of floats
+ndarray: Population of floats (genome matrix)
+str: list of strings
+chars: CharPopulation (uint8 character codes)
+binary: BinaryPopulation (packed bits)
+permutation: Population of permutations of 0..n-1 (order encoding)
+
+Selection only depends on the fitness values and is timed once per population size. Crossover and mutation are timed
+over a whole population, i.e one call per pair or individual for lists and strings and one vectorized call for the
+genome matrix. Operators that do not apply to a representation (e.g Gaussian mutation of strings) are skipped.
+
+The results are written as JSON, one record per (operator, representation, population size, genome length), holding
+the kind of operator (sel, breed, co, mut or evolve), the time of each repetition, the best and mean time, and the
+throughput in individuals per second. For evolve_* the time of one call is the latency of one generation, for
+SteadyState.step the latency of breeding and inserting a tenth of the population (scored by a constant fitness).
+
+Example:
+python benchmark.py --pop-sizes 1000 10000 --genome-lengths 100 --output bench.json
+"""
+
+CHARACTERS = list(string.ascii_letters)
+
+# Kind of operator of each module of tools
+KINDS = {
+    "selection": "sel",
+    "breed": "breed",
+    "crossover": "co",
+    "mutation": "mut",
+    "evolve": "evolve",
+    "steady_state": "evolve",
+}
+
+
+def make_individuals(representation, pop_size, genome_length):
+    """
+    :param representation: String, one of 'list', 'ndarray', 'str', 'chars', 'binary' or 'permutation'
+    :param pop_size: Integer
+    :param genome_length: Integer
+    :return: List of individuals or Population
+    """
+    if representation == "list":
+        return np.random.random((pop_size, genome_length)).tolist()
+    if representation == "ndarray":
+        return population.Population(np.random.random((pop_size, genome_length)))
+    if representation == "str":
+        return [''.join(random.choices(CHARACTERS, k=genome_length)) for _ in range(pop_size)]
+    if representation == "chars":
+        return genome.CharPopulation.random(pop_size, genome_length, CHARACTERS)
+    if representation == "binary":
+        return genome.BinaryPopulation.from_bits(np.random.randint(0, 2, size=(pop_size, genome_length)))
+    if representation == "permutation":
+        return population.Population(np.argsort(np.random.random((pop_size, genome_length)), axis=1))
+    raise ValueError("Unknown representation '{}'".format(representation))
+
+
+def mutate_str(child):
+    """
+    Mutation used to evolve string genomes, each character is replaced with probability 0.01.
+    """
+    for i, _ in enumerate(child):
+        if random.random() < 0.01:
+            child[i] = random.choice(CHARACTERS)
+
+
+def mutate_permutation(child):
+    """
+    Mutation used to evolve permutations, each gene is swapped with probability 0.01.
+    """
+    mutation.mut_swap(child, 0.01)
+
+
+def parent_fitness(child, parent, fitness, changed):
+    """
+    Delta fitness of evolve_delta timing the bookkeeping only, the child gets the fitness of its parent.
+    """
+    return fitness
+
+
+def zero_fitness(genomes):
+    """
+    Batch fitness of SteadyState timing the bookkeeping only.
+    """
+    return np.zeros(len(genomes))
+
+
+def _pairwise(individuals, operator, *args):
+    # One call per pair of individuals, or a single call with both halves of a genome matrix
+    half = len(individuals) // 2
+    if population.is_population(individuals):
+        return operator(individuals.take(range(half)), individuals.take(range(half, 2 * half)), *args)
+    return [operator(list(individuals[i]), list(individuals[i + half]), *args) for i in range(half)]
+
+
+def _each(individuals, operator, *args):
+    # One call per individual, or a single call with the genome matrix
+    if population.is_population(individuals):
+        return operator(individuals, *args)
+    return [operator(individual, *args) for individual in individuals]
+
+
+def selection_cases(fitness):
+    """
+    :param fitness: numpy array of fitness values
+    :return: Dictionary operator name -> (callable, items processed per call)
+    """
+    size = len(fitness)
+    k = max(2, size // 10)
+    return {
+        "selection.sel_best": (lambda: selection.sel_best(fitness, k), size),
+        "selection.sel_worst": (lambda: selection.sel_worst(fitness, k), size),
+        "selection.sel_random": (lambda: selection.sel_random(list(range(size)), k), size),
+        "selection.sel_roulette": (lambda: selection.sel_roulette(fitness, k), size),
+        "selection.WeightedSampler.sample_pairs": (lambda: selection.WeightedSampler(fitness).sample_pairs(size), size),
+        "selection.sel_sus": (lambda: selection.sel_sus(fitness, k), size),
+        "selection.sel_tournament": (lambda: selection.sel_tournament(fitness, k, 3), size),
+    }
+
+
+def operator_cases(representation, individuals, fitness):
+    """
+    Cases for the operators working on genomes. The individuals are copied before each repetition since mutation
+    modifies them in place.
+    :param representation: String
+    :param individuals: List of individuals or Population
+    :param fitness: numpy array of fitness values
+    :return: Dictionary operator name -> (callable taking the individuals, items processed per call)
+    """
+    size = len(individuals)
+    parents = selection.sel_best(fitness, max(2, size // 10))
+    parents_fitness = [fitness[i] for i in parents]
+    objectives = np.column_stack((fitness, 1 - fitness))
+    mutate = {"str": mutate_str, "permutation": mutate_permutation}.get(representation)
+    cases = {
+        "breed.breed_uniform": (lambda ind: breed.breed_uniform(ind, parents, size, 0.5), size),
+        "breed.breed_roulette": (lambda ind: breed.breed_roulette(ind, parents, parents_fitness, size, 0.5), size),
+        "breed.breed_uniform_one_point": (lambda ind: breed.breed_uniform_one_point(ind, parents, size), size),
+        "breed.breed_unique": (lambda ind: breed.breed_unique(ind, parents), len(parents) // 2),
+        "breed.breed_copy": (lambda ind: breed.breed_copy(ind, parents), len(parents)),
+        "crossover.co_uniform": (lambda ind: _pairwise(ind, crossover.co_uniform, 0.5), size // 2),
+        "crossover.co_one_point": (lambda ind: _pairwise(ind, crossover.co_one_point), size // 2),
+        "evolve.evolve_best": (lambda ind: evolve.evolve_best(ind, fitness, len(parents), mutate), size),
+        "evolve.evolve_tournament": (lambda ind: evolve.evolve_tournament(ind, fitness, len(parents), 3, mutate),
+                                     size),
+        "evolve.evolve_roulette": (lambda ind: evolve.evolve_roulette(ind, fitness, len(parents), mutate), size),
+        "evolve.evolve_breed_roulette": (lambda ind: evolve.evolve_breed_roulette(ind, fitness, len(parents), mutate),
+                                         size),
+        "evolve.evolve_sus": (lambda ind: evolve.evolve_sus(ind, fitness, len(parents), mutate), size),
+        "evolve.evolve_adaptive": (lambda ind: evolve.evolve_adaptive(ind, fitness, len(parents), adaptive.Control()),
+                                   size),
+        "evolve.evolve_delta": (lambda ind: evolve.evolve_delta(ind, fitness, len(parents), parent_fitness), size),
+        "evolve.evolve_nsga2": (lambda ind: evolve.evolve_nsga2(ind, objectives, len(parents), mutate), size),
+        "steady_state.SteadyState.step": (lambda ind: steady_state.SteadyState(ind, fitness, zero_fitness,
+                                                                               n_offspring=len(parents),
+                                                                               batch=True).step(), len(parents)),
+    }
+    if representation in ("list", "ndarray"):
+        cases["mutation.mut_uniform"] = (lambda ind: _each(ind, mutation.mut_uniform, 0.01, 1., 0.), size)
+        cases["mutation.mut_gauss"] = (lambda ind: _each(ind, mutation.mut_gauss, 0.01), size)
+    if representation in ("list", "binary"):
+        cases["mutation.mut_flip"] = (lambda ind: _each(ind, mutation.mut_flip, 0.01), size)
+    if representation == "chars":
+        cases["mutation.mut_reset"] = (lambda ind: _each(ind, mutation.mut_reset, 0.01), size)
+    if representation == "permutation":
+        cases["crossover.co_order"] = (lambda ind: _pairwise(ind, crossover.co_order), size // 2)
+        cases["crossover.co_pmx"] = (lambda ind: _pairwise(ind, crossover.co_pmx), size // 2)
+        cases["crossover.co_cycle"] = (lambda ind: _pairwise(ind, crossover.co_cycle), size // 2)
+        cases["crossover.co_edge"] = (lambda ind: _pairwise(ind, crossover.co_edge), size // 2)
+        cases["mutation.mut_swap"] = (lambda ind: _each(ind, mutation.mut_swap, 0.01), size)
+        cases["mutation.mut_inversion"] = (lambda ind: _each(ind, mutation.mut_inversion), size)
+        cases["mutation.mut_scramble"] = (lambda ind: _each(ind, mutation.mut_scramble), size)
+    return cases
+
+
+def copy_individuals(individuals):
+    if population.is_population(individuals):
+        return individuals.copy()
+    return [ind if isinstance(ind, str) else list(ind) for ind in individuals]
+
+
+def time_call(function, repeat, setup=None):
+    """
+    :param function: Callable, called with the result of setup (if any)
+    :param repeat: Integer, number of timed calls
+    :param setup: Optional callable run before each call, not timed
+    :return: List of seconds per call
+    """
+    seconds = []
+    for _ in range(repeat):
+        argument = setup() if setup is not None else None
+        start = time.perf_counter()
+        function(argument) if setup is not None else function()
+        seconds.append(time.perf_counter() - start)
+    return seconds
+
+
+def record(operator, representation, pop_size, genome_length, seconds, items):
+    best = min(seconds)
+    return {
+        "operator": operator,
+        "kind": KINDS[operator.split(".")[0]],
+        "representation": representation,
+        "pop_size": pop_size,
+        "genome_length": genome_length,
+        "seconds": seconds,
+        "best": best,
+        "mean": sum(seconds) / len(seconds),
+        "items_per_second": items / best if best > 0 else None,
+    }
+
+
+def run(pop_sizes, genome_lengths, representations, repeat=3, seed=0, operators=None):
+    """
+    Run the benchmark sweep.
+    :param pop_sizes: List of integers
+    :param genome_lengths: List of integers
+    :param representations: List of strings, any of 'list', 'ndarray', 'str', 'chars', 'binary' and 'permutation'
+    :param repeat: Integer, number of timed calls per case
+    :param seed: Integer, seed of the random generators
+    :param operators: Optional list of strings, only operators whose name contains one of them are timed
+    :return: Dictionary with the run metadata and the list of results
+    """
+    random.seed(seed)
+    np.random.seed(seed)
+    rng.seed(seed)
+    results = []
+
+    def wanted(name):
+        return operators is None or any(op in name for op in operators)
+
+    for pop_size in pop_sizes:
+        fitness = np.random.random(pop_size) + 1e-9
+        for name, (function, items) in selection_cases(fitness).items():
+            if wanted(name):
+                results.append(record(name, None, pop_size, None, time_call(function, repeat), items))
+        for genome_length in genome_lengths:
+            for representation in representations:
+                individuals = make_individuals(representation, pop_size, genome_length)
+                for name, (function, items) in operator_cases(representation, individuals, fitness).items():
+                    if wanted(name):
+                        seconds = time_call(function, repeat, setup=lambda: copy_individuals(individuals))
+                        results.append(record(name, representation, pop_size, genome_length, seconds, items))
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "seed": seed,
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the genetic algorithm operators.")
+    parser.add_argument("--pop-sizes", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--genome-lengths", type=int, nargs="+", default=[10, 100])
+    parser.add_argument("--representations", nargs="+",
+                        default=["list", "ndarray", "str", "chars", "binary", "permutation"],
+                        choices=["list", "ndarray", "str", "chars", "binary", "permutation"])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--operators", nargs="+", default=None, help="Only time operators matching these names")
+    parser.add_argument("--output", default=None, help="JSON file to write, defaults to stdout")
+    args = parser.parse_args(argv)
+
+    report = run(args.pop_sizes, args.genome_lengths, args.representations, args.repeat, args.seed, args.operators)
+    if args.output is None:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,35 @@
-import random
 import string
 from typing import Tuple
 
+from tools import genome
 
-def get_fitness(candidate: str, target: str):
+
+def get_fitness(candidates, target):
+    """
+    :param candidates: CharPopulation or numpy array of character codes, one row per candidate (or a single candidate)
+    :param target: numpy array of the character codes of the target (see tools.genome.encode_chars)
+    :return: numpy array with the number of genes matching the target of each candidate (an integer for a single
+    candidate)
     """
-    :param candidate: A string of the chromosome or a list of genes in chromosome.
-    :param target: string target
+    genomes = candidates.genomes if isinstance(candidates, genome.CharPopulation) else candidates
+    return (genomes == target).sum(axis=-1)
+
+
+def get_fitness_delta(child, parent, parent_fitness: int, changed, target):
+    """
+    Fitness of a child from the fitness of its parent, only the changed genes are compared to the target.
+    See tools.evolve.evolve_delta.
+    :param child: Character codes of the child
+    :param parent: Character codes of the parent
+    :param parent_fitness: Integer, fitness of the parent
+    :param changed: Indexes of the genes where child and parent differ
+    :param target: numpy array of the character codes of the target
     :return: Integer of single candidate fitness.
     """
-    fitness = 0
-    for index, gene in enumerate(list(candidate)):  # enumerate returns current index and element in list
-        if gene == list(target)[index]:
-            fitness += 1
-    return fitness
+    return parent_fitness + int((child[changed] == target[changed]).sum() - (parent[changed] == target[changed]).sum())
+
 
-def get_population(pop_size: int, sample_space: list[str], target: str) -> Tuple:
+def get_population(pop_size: int, sample_space: str, target: str) -> Tuple:
     """
     Calculate an initial set of candidates and their fitness.
     Note element index in each list have to be preserved,
@@ -26,54 +40,27 @@ def get_population(pop_size: int, sample_space: list[str], target: str) -> Tuple
     :param pop_size: Number of candidates or individuals in population
     :param sample_space: Space of possible genes
     :param target: target string
-    :return: list of population and fitness
+    :return: CharPopulation and list of fitness
     """
-    candidate_size = len(target)
-    population, fitness = [], []
-    for individual in range(pop_size):
-        candidate = generate_chromosome(sample_space=sample_space, size=candidate_size)
-        population.append(candidate)
-        fitness.append(get_fitness(candidate, target))
-    return population, fitness
-
+    population = genome.CharPopulation.random(pop_size, len(target), sample_space)
+    return population, get_fitness(population, genome.encode_chars(target)).tolist()
 
-def generate_chromosome(sample_space, size):
-    """
-    Generate a random individual, each gene is drawn from sample_space with replacement.
-
-    :param sample_space: list of all characters to search from
-    :param size: integer determining the length of the chromosome or individual
-    :return: string representing a random chromosome or individual
-    """
-    return ''.join(random.choices(sample_space, k=size))
-
-def mutate(child: str):
-    """
-    Mutates chromosome of child with probability prob_mutation
-    :param child: string of chromosome
-    :return: mutated child as a string
-    """
-    prob_mutation = 0.05
-    for i, gene in enumerate(child):
-        if random.random() < prob_mutation:
-            child[i] = generate_chromosome(SAMPLE_SPACE, size=1)
 
 if __name__ == "__main__":
+    from tools import driver
     from tools import evolve
 
     TARGET = "Hello world"
 
-    SAMPLE_SPACE = list(string.printable)
+    SAMPLE_SPACE = string.printable
 
-    random.seed()  # Seed random generator
+    target_codes = genome.encode_chars(TARGET)
     population, fitness = get_population(pop_size=200, sample_space=SAMPLE_SPACE, target=TARGET)
 
-    generation = 0
-    print('Generation ', generation, '-', population[fitness.index(max(fitness))] + '.', ' Fitness: ', max(fitness))
-    while get_fitness(population[fitness.index(max(fitness))], TARGET) < len(TARGET):
-        generation += 1
-        population = evolve.evolve_best(population, fitness, 20, mutate)
-        for index, individual in enumerate(population):
-            fitness[index] = get_fitness(individual, TARGET)
-        print('Generation ', generation, '-', population[fitness.index(max(fitness))], ' Fitness: ', max(fitness))
-    print('Best fit: ', ''.join(population[fitness.index(max(fitness))]))
+    # The whole population is scored at once, the default mutation resets characters to the sample space
+    for snapshot in driver.iterate(population, lambda genomes: get_fitness(genomes, target_codes), evolve.evolve_best,
+                                   (20, None), stop=[driver.target_fitness(len(TARGET))], fitness=fitness, batch=True):
+        if snapshot.improved:
+            print('Generation ', snapshot.generation, '-', genome.decode_chars(snapshot.best), ' Fitness: ',
+                  snapshot.best_fitness)
+    print('Best fit: ', genome.decode_chars(snapshot.best))
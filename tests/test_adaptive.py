@@ -0,0 +1,173 @@
+import unittest
+
+import numpy as np
+
+from tools import adaptive
+from tools import evolve
+from tools import genome
+from tools import mutation as mut
+from tools import population
+from tools import rng
+
+
+class OneFifthRuleTest(unittest.TestCase):
+
+    def test_update(self):
+        step = adaptive.OneFifthRule(sigma=1., factor=0.5, target=0.2, min_sigma=0.3, max_sigma=3.)
+        # Grows above the target, stays at the target, shrinks below it, within the bounds
+        self.assertEqual([step.update(rate) for rate in (0.5, 0.5, 0.2, 0., 0., 0., 0.)],
+                         [2., 3., 3., 1.5, 0.75, 0.375, 0.3])
+        self.assertEqual(step.sigma, 0.3)
+
+
+class AdaptivePursuitTest(unittest.TestCase):
+
+    def setUp(self):
+        rng.seed(0)
+
+    def test_reward(self):
+        pursuit = adaptive.AdaptivePursuit(3, p_min=0.1, alpha=0.5, beta=0.5)
+        self.assertAlmostEqual(pursuit.p_max, 0.8)
+        np.testing.assert_allclose(pursuit.probabilities, [1 / 3] * 3)
+        # Arms 0 and 1 get a mean reward of 0.5, the estimate of the unused arm 2 is kept and is the best
+        pursuit.reward(np.array([0, 0, 1]), np.array([1., 0., 0.5]))
+        np.testing.assert_allclose(pursuit.quality, [0.75, 0.75, 1.])
+        np.testing.assert_allclose(pursuit.probabilities, [13 / 60, 13 / 60, 17 / 30])
+        for _ in range(50):
+            pursuit.reward(np.array([0, 1, 2]), np.array([1., 0., 0.]))
+        np.testing.assert_allclose(pursuit.probabilities, [0.8, 0.1, 0.1])
+        self.assertEqual(pursuit.probabilities.sum(), 1.)
+
+    def test_default_p_min(self):
+        self.assertEqual(adaptive.AdaptivePursuit(4).p_min, 0.05)
+        self.assertEqual(adaptive.AdaptivePursuit(40).p_min, 1 / 80)
+
+    def test_draw(self):
+        pursuit = adaptive.AdaptivePursuit(3)
+        pursuit.probabilities = np.array([0.7, 0.2, 0.1])
+        arms = pursuit.draw(20000)
+        np.testing.assert_allclose(np.bincount(arms, minlength=3) / len(arms), pursuit.probabilities, atol=0.01)
+
+
+class UCBTest(unittest.TestCase):
+
+    def test_draw(self):
+        ucb = adaptive.UCB(3, c=1.)
+        np.testing.assert_allclose(ucb.probabilities, [1 / 3] * 3)
+        # Untried operators come first
+        self.assertEqual(ucb.draw(3).tolist(), [0, 1, 2])
+        ucb.reward(np.array([0, 1, 2]), np.array([1., 0., 0.]))
+        # The best operator is drawn until the exploration term of the others, sqrt(ln(uses)), exceeds its bound
+        # 1 + sqrt(ln(uses) / its uses), i.e until 11 uses
+        self.assertEqual(ucb.draw(10).tolist(), [0] * 8 + [1, 2])
+        # Drawing does not count the uses
+        np.testing.assert_array_equal(ucb.counts, [1, 1, 1])
+
+    def test_reward(self):
+        ucb = adaptive.UCB(2)
+        ucb.reward(np.array([0, 0, 0, 1]), np.array([1., 0.5, 0., 1.]))
+        np.testing.assert_array_equal(ucb.counts, [3, 1])
+        np.testing.assert_array_equal(ucb.totals, [1.5, 1.])
+        np.testing.assert_allclose(ucb.probabilities, [0.75, 0.25])
+
+    def test_window(self):
+        ucb = adaptive.UCB(2, window=2)
+        ucb.reward(np.array([0, 0]), np.array([1., 1.]))
+        ucb.reward(np.array([1]), np.array([0.5]))
+        np.testing.assert_array_equal(ucb.counts, [1, 1])
+        np.testing.assert_array_equal(ucb.totals, [1, 0.5])
+
+
+class ControlTest(unittest.TestCase):
+
+    def setUp(self):
+        rng.seed(0)
+
+    def test_credit(self):
+        control = adaptive.Control(crossovers=[None, None], mutations=[None],
+                                   step=adaptive.OneFifthRule(sigma=1., factor=0.5))
+        self.assertIsNone(control.credit([1.]))
+        crossovers, mutations = control.assign(population.Population(np.zeros((5, 2))), 5)
+        self.assertEqual((len(crossovers), len(mutations)), (5, 5))
+        self.assertEqual(mutations.tolist(), [0] * 5)
+        control.remember(np.zeros(5), np.array([0, 0, 1, 1, 0]), mutations, start=1)
+        # Fitness of a generation of another size
+        self.assertIsNone(control.credit([1.] * 4))
+        control.remember(np.zeros(5), np.array([0, 0, 1, 1, 0]), mutations, start=1)
+        # The elite is not credited and a NaN fitness is no improvement: improvements 2, 1, -1 and 0, rewards 1, 0.5,
+        # 0 and 0, mean reward 0.5 for crossover 0 and 0.25 for crossover 1
+        record = control.credit([9., 2., 1., -1., np.nan])
+        self.assertEqual(record["success_rate"], 0.5)
+        self.assertEqual(record["sigma"], 2.)
+        np.testing.assert_allclose(control.crossover_selector.quality, [0.6, 0.4])
+        np.testing.assert_allclose(record["crossovers"], [0.86, 0.14])
+        self.assertEqual(record["mutations"], [1.])
+        self.assertEqual(control.history, [record])
+        # Credited once
+        self.assertIsNone(control.credit([9., 2., 1., -1., np.nan]))
+
+    def test_no_improvement(self):
+        control = adaptive.Control(crossovers=[None], mutations=[None], selector=adaptive.UCB)
+        control.assign(population.Population(np.zeros((3, 2))), 3)
+        control.remember([1., 1., 1.], np.zeros(3, dtype=np.intp), np.zeros(3, dtype=np.intp))
+        record = control.credit([0., 1., 1.])
+        self.assertEqual(record["success_rate"], 0.)
+        self.assertEqual(control.crossover_selector.totals.tolist(), [0.])
+
+    def test_default_operators(self):
+        control = adaptive.Control()
+        control.assign(population.Population(np.zeros((4, 10))), 4)
+        self.assertEqual(len(control.crossovers), 4)
+        self.assertEqual([operator.__name__ for operator in control.mutations], ["gauss(0.1)", "gauss(0.2)",
+                                                                                  "gauss(0.5)"])
+        bits = genome.BinaryPopulation.from_bits(np.zeros((4, 2), dtype=np.uint8))
+        self.assertEqual([operator.__name__ for operator in adaptive.default_mutations(bits)],
+                         ["flip(0.5)", "flip(1)", "flip(1)"])
+
+    def test_evolve_adaptive(self):
+        individuals = rng.get().normal(0., 1., (40, 5))
+        control = adaptive.Control()
+        best = []
+        for _ in range(30):
+            fitness = (-individuals ** 2).sum(axis=1)
+            best.append(fitness.max())
+            individuals = np.asarray(evolve.evolve_adaptive(individuals, fitness.tolist(), 10, control))
+        self.assertEqual(len(control.history), 29)
+        # Elitism keeps the best so far
+        self.assertTrue(all(later >= earlier for earlier, later in zip(best, best[1:])))
+        self.assertGreater(best[-1], best[0])
+        for record in control.history:
+            self.assertAlmostEqual(sum(record["crossovers"]), 1.)
+
+
+class StepSizesTest(unittest.TestCase):
+
+    def setUp(self):
+        rng.seed(0)
+
+    def test_round_trip(self):
+        individuals = np.arange(6, dtype=np.int64).reshape(2, 3)
+        pop = adaptive.with_step_sizes(individuals, sigma=0.5)
+        self.assertEqual(pop.genomes.dtype, float)
+        np.testing.assert_array_equal(pop.genomes[:, -1], [0.5, 0.5])
+        np.testing.assert_array_equal(adaptive.without_step_sizes(pop), individuals)
+        np.testing.assert_array_equal(adaptive.without_step_sizes(pop.genomes), individuals)
+        # A view: the genes seen by the fitness function are those of the population
+        self.assertTrue(np.shares_memory(adaptive.without_step_sizes(pop), pop.genomes))
+        self.assertEqual(adaptive.with_step_sizes([[1., 2.]]).genomes.tolist(), [[1., 2., 0.1]])
+
+    def test_self_adaptive_mutation(self):
+        pop = adaptive.with_step_sizes(np.zeros((100, 4)), sigma=1.)
+        mut.mut_self_adaptive(pop, mut_prob=1., min_sigma=0.5)
+        sigma = pop.genomes[:, -1]
+        self.assertTrue((sigma >= 0.5).all())
+        self.assertGreater(len(np.unique(sigma)), 50)
+        # Each row is perturbed with its own step size
+        genes = adaptive.without_step_sizes(pop)
+        self.assertTrue((genes != 0).all())
+        # Mean of |N(0, 1)| is sqrt(2 / pi)
+        self.assertAlmostEqual(np.mean(np.abs(genes) / sigma[:, None]), np.sqrt(2 / np.pi), delta=0.1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,136 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from tools import cache
+from tools import genome
+from tools import population
+
+
+class GenomeKeyTest(unittest.TestCase):
+
+    def test_numpy_keys(self):
+        genes = np.arange(6, dtype=np.int64)
+        self.assertEqual(cache.genome_key(genes), cache.genome_key(genes.copy()))
+        # Same bytes, different dtype or shape
+        self.assertNotEqual(cache.genome_key(genes), cache.genome_key(genes.view(np.float64)))
+        self.assertNotEqual(cache.genome_key(genes.view(np.int32)), cache.genome_key(genes.view(np.uint32)))
+        self.assertNotEqual(cache.genome_key(genes.reshape(2, 3)), cache.genome_key(genes.reshape(3, 2)))
+        self.assertNotEqual(cache.genome_key(genes), cache.genome_key(genes.reshape(1, 6)))
+        # Same values, different dtype
+        self.assertNotEqual(cache.genome_key(genes), cache.genome_key(genes.astype(np.int32)))
+        self.assertIsInstance(cache.genome_key(genes), bytes)
+
+    def test_sequence_keys(self):
+        self.assertEqual(cache.genome_key("abc"), cache.genome_key(["a", "b", "c"]))
+        self.assertEqual(cache.genome_key((1, 2)), cache.genome_key([1, 2]))
+        self.assertNotEqual(cache.genome_key([1, 2]), cache.genome_key(np.array([1, 2])))
+
+    def test_compact_genome_keys(self):
+        bits = np.array([1, 0, 1, 1, 0], dtype=np.uint8)
+        binary = genome.BinaryGenome.from_bits(bits)
+        self.assertEqual(cache.genome_key(binary), cache.genome_key(binary.packed))
+        self.assertEqual(cache.genome_key(binary), cache.genome_key(genome.BinaryGenome.from_bits(bits)))
+        integer = genome.IntegerGenome([1, 2, 3])
+        self.assertEqual(cache.genome_key(integer), cache.genome_key(integer.genes))
+
+
+class FitnessCacheTest(unittest.TestCase):
+
+    def test_lru_eviction(self):
+        fitness_cache = cache.FitnessCache(maxsize=3)
+        for i in range(3):
+            fitness_cache.put([i], float(i))
+        # Using [0] makes [1] the least recently used genome
+        self.assertEqual(fitness_cache.get([0]), 0.)
+        fitness_cache.put([3], 3.)
+        self.assertEqual(len(fitness_cache), 3)
+        self.assertNotIn([1], fitness_cache)
+        self.assertIn([0], fitness_cache)
+        # Overwriting a genome also makes it the most recently used one
+        fitness_cache.put([2], 20.)
+        fitness_cache.put([4], 4.)
+        self.assertNotIn([0], fitness_cache)
+        self.assertEqual(list(fitness_cache._fitness), [(3,), (2,), (4,)])
+        self.assertEqual(fitness_cache.get([2]), 20.)
+
+    def test_unbounded(self):
+        fitness_cache = cache.FitnessCache(maxsize=None)
+        for i in range(1000):
+            fitness_cache.put([i], i)
+        self.assertEqual(len(fitness_cache), 1000)
+
+    def test_hits_and_misses(self):
+        fitness_cache = cache.FitnessCache()
+        self.assertEqual(fitness_cache.hit_rate, 0.)
+        self.assertIsNone(fitness_cache.get([1]))
+        self.assertEqual(fitness_cache.get([1], -1), -1)
+        fitness_cache.put([1], 5.)
+        self.assertEqual(fitness_cache.get([1]), 5.)
+        # Membership tests do not count as lookups
+        self.assertIn([1], fitness_cache)
+        self.assertEqual((fitness_cache.hits, fitness_cache.misses), (1, 2))
+        self.assertAlmostEqual(fitness_cache.hit_rate, 1 / 3)
+        fitness_cache.clear()
+        self.assertEqual((len(fitness_cache), fitness_cache.hits, fitness_cache.misses), (0, 0, 0))
+
+    def test_wrap(self):
+        calls = []
+
+        def fitness(individual):
+            calls.append(list(individual))
+            return float(sum(individual))
+
+        fitness_cache = cache.FitnessCache()
+        cached = fitness_cache.wrap(fitness)
+        self.assertEqual([cached([1, 2]), cached([1, 2]), cached((1, 2)), cached([3])], [3., 3., 3., 3.])
+        self.assertEqual(calls, [[1, 2], [3]])
+        self.assertEqual((fitness_cache.hits, fitness_cache.misses), (2, 2))
+
+    def test_evaluate(self):
+        scored = []
+
+        def fitness(genomes):
+            scored.append(np.asarray(genomes).copy())
+            return np.asarray(genomes).sum(axis=1).tolist()
+
+        fitness_cache = cache.FitnessCache()
+        fitness_cache.put(np.array([9, 9]), 0.)
+        individuals = np.array([[1, 2], [9, 9], [1, 2], [3, 4]])
+        self.assertEqual(fitness_cache.evaluate(individuals, fitness, batch=True), [3, 0., 3, 7])
+        # The duplicate and the cached genome are not scored
+        np.testing.assert_array_equal(scored[0], [[1, 2], [3, 4]])
+        self.assertEqual(fitness_cache.evaluate(population.Population(individuals), fitness, batch=True),
+                         [3, 0., 3, 7])
+        self.assertEqual(len(scored), 1)
+
+    def test_save_load(self):
+        fitness_cache = cache.FitnessCache(maxsize=3)
+        genomes = [np.array([1., 2.]), "abc", genome.BinaryGenome.from_bits(np.array([1, 0, 1], dtype=np.uint8)), [4]]
+        for i, individual in enumerate(genomes):
+            fitness_cache.put(individual, float(i))
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "fitness.pkl")
+            with self.assertRaises(ValueError):
+                fitness_cache.save()
+            fitness_cache.save(path)
+            self.assertFalse(os.path.exists(path + ".tmp"))
+            loaded = cache.FitnessCache(maxsize=3, path=path)
+            self.assertEqual(list(loaded._fitness.items()), list(fitness_cache._fitness.items()))
+            self.assertEqual(loaded.get(["a", "b", "c"]), 1.)
+            self.assertNotIn(genomes[0], loaded)
+            # Loading into a smaller cache keeps the most recently used genomes
+            small = cache.FitnessCache(maxsize=1)
+            small.load(path)
+            self.assertEqual(small.get([4]), 3.)
+            self.assertEqual(len(small), 1)
+            # Saving without a path uses the path given at construction
+            loaded.put([5], 5.)
+            loaded.save()
+            self.assertIn([5], cache.FitnessCache(path=path))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,36 @@
+import tempfile
+import unittest
+
+import numpy as np
+
+from tools import checkpoint
+from tools import genome
+from tools import rng
+
+
+class CheckpointTest(unittest.TestCase):
+
+    def setUp(self):
+        rng.seed(0)
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def test_char_population(self):
+        pop = genome.CharPopulation.random(6, 5, "acgt")
+        path = checkpoint.save(self.directory.name + "/char", pop, [1.] * 6, 3)
+        state = checkpoint.load(path)
+        self.assertIsInstance(state.population, genome.CharPopulation)
+        self.assertEqual(genome.decode_chars(state.population.alphabet), "acgt")
+        np.testing.assert_array_equal(state.population.genomes, pop.genomes)
+        self.assertEqual(state.generation, 3)
+
+    def test_binary_population(self):
+        pop = genome.BinaryPopulation.from_bits(rng.get().integers(0, 2, (4, 13)))
+        state = checkpoint.load(checkpoint.save(self.directory.name + "/binary", pop, [0.] * 4, 1))
+        self.assertIsInstance(state.population, genome.BinaryPopulation)
+        self.assertEqual(state.population.n_bits, 13)
+        np.testing.assert_array_equal(state.population.genomes, pop.genomes)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import unittest
+
+import numpy as np
+
+from tools import crossover
+from tools import genome
+from tools import population
+from tools import rng
+
+OPERATORS = (crossover.co_order, crossover.co_pmx, crossover.co_cycle, crossover.co_edge)
+
+
+class PermutationCrossoverTest(unittest.TestCase):
+
+    def setUp(self):
+        rng.seed(0)
+        self.parents1 = np.argsort(rng.get().random((40, 9)), axis=1)
+        self.parents2 = np.argsort(rng.get().random((40, 9)), axis=1)
+
+    def check_permutations(self, children, genes):
+        rows = np.asarray([list(child) for child in children])
+        np.testing.assert_array_equal(np.sort(rows, axis=1), np.tile(np.sort(genes), (len(rows), 1)))
+
+    def test_lists(self):
+        for operator in OPERATORS:
+            for row1, row2 in zip(self.parents1.tolist(), self.parents2.tolist()):
+                child1, child2 = operator(row1, row2)
+                self.assertIsInstance(child1, list)
+                self.check_permutations([child1, child2], row1)
+
+    def test_arrays_and_genomes(self):
+        for operator in OPERATORS:
+            for row1, row2 in zip(self.parents1, self.parents2):
+                child1, child2 = operator(row1, row2)
+                self.assertIsInstance(child1, np.ndarray)
+                self.check_permutations([child1, child2], row1)
+                child1, child2 = operator(genome.IntegerGenome(row1), genome.IntegerGenome(row2))
+                self.assertIsInstance(child1, genome.IntegerGenome)
+                self.check_permutations([child1.genes, child2.genes], row1)
+
+    def test_populations(self):
+        for operator in OPERATORS:
+            children1, children2 = operator(population.Population(self.parents1), population.Population(self.parents2))
+            self.assertIsInstance(children1, population.Population)
+            self.check_permutations(children1.genomes, self.parents1[0])
+            self.check_permutations(children2.genomes, self.parents1[0])
+            # Genes other than 0..n-1, e.g city labels
+            labels = np.array([3, 8, 10, 15, 21, 22, 40, 41, 99])
+            children1, children2 = operator(labels[self.parents1], labels[self.parents2])
+            self.assertIsInstance(children1, np.ndarray)
+            self.check_permutations(children1, labels)
+            self.check_permutations(children2, labels)
+
+    def test_identical_parents(self):
+        parent = self.parents1[0].tolist()
+        for operator in (crossover.co_order, crossover.co_pmx, crossover.co_cycle):
+            self.assertEqual(operator(parent, parent), (parent, parent))
+            children1, _ = operator(self.parents1, self.parents1)
+            np.testing.assert_array_equal(children1, self.parents1)
+        # The only edges are those of the tour, followed in one direction or the other
+        child = crossover.co_edge(parent, parent)[0]
+        self.assertIn(child, (parent, [parent[0]] + parent[:0:-1]))
+
+    def test_cycle_genes_keep_a_parent_position(self):
+        children1, children2 = crossover.co_cycle(self.parents1, self.parents2)
+        self.assertTrue(np.all((children1 == self.parents1) | (children1 == self.parents2)))
+        self.assertTrue(np.all((children2 == self.parents1) | (children2 == self.parents2)))
+
+    def test_batch_cycle_matches_list(self):
+        # The pointer doubling of the batch cycle crossover gives the cycles found by walking them
+        for size in (1, 2, 3, 8, 33, 64, 100):
+            parents1 = np.argsort(rng.get().random((30, size)), axis=1)
+            parents2 = np.argsort(rng.get().random((30, size)), axis=1)
+            children1, children2 = crossover.co_cycle(parents1, parents2)
+            for i in range(30):
+                expected1, expected2 = crossover.co_cycle(parents1[i].tolist(), parents2[i].tolist())
+                self.assertEqual(children1[i].tolist(), expected1)
+                self.assertEqual(children2[i].tolist(), expected2)
+
+
+if __name__ == "__main__":
+    unittest.main()
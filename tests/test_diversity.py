@@ -0,0 +1,134 @@
+import itertools
+import unittest
+
+import numpy as np
+
+from tools import diversity
+from tools import genome
+from tools import population
+from tools import rng
+
+
+def brute_centroid(genomes):
+    # Hamming distance to the majority genome, the most frequent value of every gene
+    majority = [max(set(column), key=column.count) for column in genomes.T.tolist()]
+    return float(np.mean([(row != majority).sum() for row in genomes]))
+
+
+def brute_pairwise(genomes, distance):
+    pairs = list(itertools.permutations(range(len(genomes)), 2))
+    return float(np.mean([distance(genomes[i], genomes[j]) for i, j in pairs]))
+
+
+class DistanceTest(unittest.TestCase):
+
+    def setUp(self):
+        rng.seed(0)
+
+    def test_centroid_distance(self):
+        floats = rng.get().random((30, 4))
+        expected = np.linalg.norm(floats - floats.mean(axis=0), axis=1).mean()
+        self.assertAlmostEqual(diversity.centroid_distance(floats), expected)
+        integers = rng.get().integers(0, 3, size=(25, 6))
+        self.assertAlmostEqual(diversity.centroid_distance(integers), brute_centroid(integers))
+        bits = rng.get().integers(0, 2, size=(25, 70))
+        self.assertAlmostEqual(diversity.centroid_distance(genome.BinaryPopulation.from_bits(bits)),
+                               brute_centroid(bits))
+        self.assertEqual(diversity.centroid_distance(np.ones((5, 3))), 0.)
+        self.assertEqual(diversity.centroid_distance(np.empty((0, 3))), 0.)
+
+    def test_pairwise_distance(self):
+        integers = rng.get().integers(0, 3, size=(12, 5))
+        hamming = brute_pairwise(integers, lambda a, b: (a != b).sum())
+        self.assertAlmostEqual(diversity.pairwise_distance(integers), hamming)
+        bits = rng.get().integers(0, 2, size=(12, 70))
+        binary = genome.BinaryPopulation.from_bits(bits)
+        self.assertAlmostEqual(diversity.pairwise_distance(binary), brute_pairwise(bits, lambda a, b: (a != b).sum()))
+        # The sampled estimates are close to the exact means
+        self.assertAlmostEqual(diversity.pairwise_distance(binary, n_pairs=20000),
+                               diversity.pairwise_distance(binary), delta=0.5)
+        floats = rng.get().random((12, 3))
+        euclidean = brute_pairwise(floats, lambda a, b: np.linalg.norm(a - b))
+        self.assertAlmostEqual(diversity.pairwise_distance(floats, n_pairs=20000), euclidean, delta=0.02)
+        self.assertEqual(diversity.pairwise_distance(floats[:1]), 0.)
+
+
+class GenomeIndexTest(unittest.TestCase):
+
+    def test_add_and_contains(self):
+        index = diversity.GenomeIndex(np.array([[1, 2], [3, 4]]))
+        self.assertIn(np.array([1, 2]), index)
+        self.assertFalse(index.add(np.array([1, 2])))
+        self.assertTrue(index.add(np.array([2, 1])))
+        np.testing.assert_array_equal(index.add_rows(np.array([[5, 6], [5, 6], [3, 4]])), [True, False, False])
+        index.discard(np.array([5, 6]))
+        self.assertNotIn(np.array([5, 6]), index)
+        self.assertEqual(len(index), 3)
+
+    def test_lru_eviction(self):
+        index = diversity.GenomeIndex(maxsize=2)
+        index.add([1])
+        index.add([2])
+        index.add([1])  # [1] becomes the most recently used
+        index.add([3])
+        self.assertIn([1], index)
+        self.assertNotIn([2], index)
+        self.assertEqual(len(index), 2)
+
+
+class EliminateDuplicatesTest(unittest.TestCase):
+
+    def setUp(self):
+        rng.seed(1)
+
+    def check_unique(self, children):
+        rows = population.genomes(children)
+        self.assertEqual(len(np.unique(rows, axis=0)), len(rows))
+
+    def test_float_children(self):
+        children = population.Population(np.repeat(rng.get().random((2, 20)), 10, axis=0))
+        elite = children.genomes[0].copy()
+        self.assertEqual(diversity.eliminate_duplicates(children, start=1), 0)
+        self.check_unique(children)
+        np.testing.assert_array_equal(children.genomes[0], elite)
+
+    def test_index_of_previous_genomes(self):
+        previous = rng.get().random((3, 5))
+        index = diversity.GenomeIndex(previous)
+        children = population.Population(previous.copy())
+        self.assertEqual(diversity.eliminate_duplicates(children, index), 0)
+        self.assertFalse(np.any((children.genomes[:, None] == previous[None]).all(axis=2)))
+
+    def test_bool_genes_are_flipped(self):
+        # Swaps only move the single True to 3 distinct genomes, 5 unique children need flips
+        children = population.Population(np.tile([True, False, False], (5, 1)))
+        self.assertEqual(diversity.eliminate_duplicates(children, max_attempts=50), 0)
+        self.check_unique(children)
+
+    def test_permutations_stay_permutations(self):
+        children = population.Population(np.tile(np.arange(8), (10, 1)))
+        self.assertEqual(diversity.eliminate_duplicates(children, max_attempts=20), 0)
+        self.check_unique(children)
+        np.testing.assert_array_equal(np.sort(children.genomes, axis=1), np.tile(np.arange(8), (10, 1)))
+
+    def test_binary_and_char_populations(self):
+        binary = genome.BinaryPopulation.from_bits(np.zeros((8, 40), dtype=np.uint8))
+        self.assertEqual(diversity.eliminate_duplicates(binary), 0)
+        self.check_unique(binary)
+        chars = genome.CharPopulation.from_strings(["aaaaaa"] * 8, "abc")
+        self.assertEqual(diversity.eliminate_duplicates(chars, max_attempts=20), 0)
+        self.check_unique(chars)
+        self.assertTrue(set("".join(chars.tolist())) <= set("abc"))
+
+    def test_custom_mutation(self):
+        children = np.zeros((4, 3))
+
+        def bump(row):
+            row[rng.get().integers(0, 3)] += 1.
+
+        self.assertEqual(diversity.eliminate_duplicates(children, mutation=bump, max_attempts=20), 0)
+        self.check_unique(children)
+
+
+if __name__ == "__main__":
+    unittest.main()
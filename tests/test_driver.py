@@ -0,0 +1,68 @@
+import math
+import unittest
+
+import numpy as np
+
+from tools import driver
+from tools import evolve
+from tools import rng
+
+
+def sphere(individual):
+    return -float(np.sum(np.asarray(individual) ** 2))
+
+
+def sequence_strategy(values):
+    # Strategy ignoring the individuals, the fitness function reads the generation from the first gene
+    def strategy(individuals, fitness):
+        return np.full_like(individuals, values.pop(0))
+    return strategy
+
+
+class TrackerTest(unittest.TestCase):
+
+    def setUp(self):
+        rng.seed(0)
+
+    def test_run(self):
+        individuals = rng.get().random((20, 4))
+        snapshot = driver.run(individuals, sphere, evolve.evolve_best, (5, None),
+                              stop=[driver.max_generations(10)])
+        self.assertEqual(snapshot.generation, 10)
+        self.assertEqual(snapshot.stop_reason, "max_generations")
+        self.assertEqual(snapshot.evaluations, 11 * 20)
+        self.assertGreaterEqual(snapshot.best_fitness, max(sphere(row) for row in individuals))
+        self.assertEqual(sphere(snapshot.best), snapshot.best_fitness)
+
+    def test_nan_fitness(self):
+        def fitness_function(individual):
+            value = individual[0]
+            return math.nan if value < 0 else value
+
+        individuals = np.array([[-1.], [0.5]])
+        strategy = sequence_strategy([-1., 1., 2.])
+        snapshots = list(driver.iterate(individuals, fitness_function, strategy,
+                                        stop=[driver.target_fitness(2.), driver.stagnation(5)]))
+        # Generation 1 is all NaN: no improvement, the next generations improve and reach the target
+        self.assertEqual(snapshots[0].best_fitness, 0.5)
+        self.assertEqual(snapshots[1].generation_best, -math.inf)
+        self.assertFalse(snapshots[1].improved)
+        self.assertEqual(snapshots[1].best_fitness, 0.5)
+        self.assertTrue(snapshots[2].improved)
+        self.assertEqual(snapshots[-1].best_fitness, 2.)
+        self.assertEqual(snapshots[-1].stop_reason, "target_fitness")
+
+    def test_nan_first_generation(self):
+        def fitness_function(individual):
+            return math.nan if individual[0] < 0 else individual[0]
+
+        strategy = sequence_strategy([1., 3.])
+        snapshots = list(driver.iterate(np.full((3, 1), -1.), fitness_function, strategy,
+                                        stop=[driver.target_fitness(3.)]))
+        self.assertEqual(snapshots[0].best_fitness, -math.inf)
+        self.assertTrue(snapshots[1].improved)
+        self.assertEqual(snapshots[-1].stop_reason, "target_fitness")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+import unittest
+
+import numpy as np
+
+from tools import breed
+from tools import evolve
+from tools import lazy
+from tools import mutation
+from tools import population
+from tools import rng
+
+
+class IntegerListTest(unittest.TestCase):
+    """
+    The list API on integer genomes, e.g binary or order encodings, keeps working with the default mutation.
+    """
+
+    def setUp(self):
+        rng.seed(0)
+        self.individuals = [rng.get().permutation(8).tolist() for _ in range(20)]
+        self.fitness = [float(-abs(ind[0] - 3)) for ind in self.individuals]
+
+    def check(self, children):
+        self.assertIsInstance(children, list)
+        self.assertEqual(len(children), len(self.individuals))
+        for child in children:
+            self.assertEqual(len(child), 8)
+            self.assertTrue(all(isinstance(gene, int) for gene in child))
+
+    def test_evolve_strategies(self):
+        self.check(evolve.evolve_best(self.individuals, self.fitness, 5, None))
+        self.check(evolve.evolve_tournament(self.individuals, self.fitness, 5, 3, None))
+        self.check(evolve.evolve_sus(self.individuals, [f + 10 for f in self.fitness], 5, None))
+        self.check(evolve.evolve_roulette(self.individuals, [f + 10 for f in self.fitness], 5, None))
+        self.check(evolve.evolve_breed_roulette(self.individuals, [f + 10 for f in self.fitness], 5, None))
+
+    def test_binary_genes(self):
+        individuals = rng.get().integers(0, 2, size=(20, 16)).tolist()
+        children = evolve.evolve_best(individuals, [float(sum(ind)) for ind in individuals], 5, None)
+        self.assertTrue(set(np.ravel(children).tolist()) <= {0, 1})
+
+    def test_default_mutation_kinds(self):
+        bits = rng.get().integers(0, 2, size=(50, 16))
+        mutated = mutation.mut_default(population.Population(bits.copy()), 0.2).genomes
+        # Bit flips change the number of ones, swaps could not
+        self.assertFalse(np.array_equal(mutated.sum(axis=1), bits.sum(axis=1)))
+        self.assertTrue(set(np.ravel(mutated).tolist()) <= {0, 1})
+        permutations = np.argsort(rng.get().random((50, 8)), axis=1)
+        mutated = mutation.mut_default(population.Population(permutations.copy()), 0.2).genomes
+        np.testing.assert_array_equal(np.sort(mutated, axis=1), np.sort(permutations, axis=1))
+        self.assertFalse(np.array_equal(mutated, permutations))
+        counts = rng.get().integers(-3, 4, size=(50, 8))
+        mutated = mutation.mut_default(population.Population(counts.copy()), 0.2).genomes
+        self.assertEqual((mutated.min(), mutated.max()), (-3, 3))
+        self.assertFalse(np.array_equal(mutated, counts))
+
+    def test_ragged_individuals(self):
+        individuals = [[1, 2, 3], [1, 2], [3, 2, 1]]
+        with self.assertRaises(ValueError):
+            evolve.evolve_best(individuals, [1., 2., 3.], 2, None)
+
+
+class LazyMutationTest(unittest.TestCase):
+
+    def test_default_mutation_keeps_children_lazy(self):
+        rng.seed(0)
+        pop = population.Population(rng.get().random((20, 30)))
+        children = breed.breed_uniform(pop, list(range(5)), 20, 0.5, lazy=True)
+        evolve._mutate(children, None)
+        self.assertTrue(lazy.is_lazy(children))
+
+
+class DeltaTest(unittest.TestCase):
+    """
+    The incremental fitness of evolve_delta stays equal to a full rescore generation after generation.
+    """
+
+    def setUp(self):
+        rng.seed(0)
+        self.weights = rng.get().normal(0., 1., 12)
+        self.calls = 0
+
+    def full_fitness(self, genomes):
+        return np.asarray(genomes, dtype=float) @ self.weights
+
+    def delta_fitness(self, child, parent, parent_fitness, changed):
+        self.calls += 1
+        # Every gene differing from the parent is reported
+        self.assertTrue(np.isin(np.flatnonzero(child != parent), changed).all())
+        changed = np.unique(changed)
+        return parent_fitness + float(self.weights[changed] @ (child[changed] - parent[changed]))
+
+    def evolve(self, individuals, mutation=None):
+        fitness = self.full_fitness(individuals).tolist()
+        for _ in range(20):
+            individuals, fitness = evolve.evolve_delta(individuals, fitness, 10, self.delta_fitness, mutation)
+            genomes = population.genomes(individuals)
+            np.testing.assert_allclose(fitness, self.full_fitness(genomes), rtol=1e-9, atol=1e-9)
+        # The elite and the children equal to their parent are not scored
+        self.assertLess(self.calls, 20 * len(genomes))
+
+    def test_float_genomes(self):
+        self.evolve(rng.get().random((40, 12)))
+
+    def test_permutation_genomes(self):
+        individuals = np.array([rng.get().permutation(12) for _ in range(40)])
+        self.evolve(individuals, lambda children: mutation.mut_swap(children, 0.05, return_changed=True)[1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+import asyncio
+import math
+import unittest
+
+from tools import fitness as fit
+
+
+class StubServer:
+    """
+    Local fitness server: each request is a line 'delay value', answered with 'value' after 'delay' seconds, or
+    closed without answer if value is negative. Records the largest number of requests served at once.
+    """
+
+    def __init__(self):
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.port = None
+        self._server = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            delay, value = (float(token) for token in (await reader.readline()).split())
+            await asyncio.sleep(delay)
+            if value >= 0:
+                writer.write("{}\n".format(value).encode())
+                await writer.drain()
+        finally:
+            self.in_flight -= 1
+            writer.close()
+
+    async def fitness(self, individual):
+        reader, writer = await asyncio.open_connection("127.0.0.1", self.port)
+        try:
+            writer.write("{} {}\n".format(*individual).encode())
+            await writer.drain()
+            return float(await reader.readline())
+        finally:
+            writer.close()
+
+
+class AsyncEvaluatorTest(unittest.TestCase):
+
+    def evaluate(self, individuals, **kwargs):
+        server = StubServer()
+
+        async def run():
+            await server.start()
+            try:
+                evaluator = fit.AsyncEvaluator(server.fitness, **kwargs)
+                return evaluator, await evaluator.aevaluate(individuals)
+            finally:
+                await server.stop()
+
+        evaluator, fitness = asyncio.run(run())
+        return server, evaluator, fitness
+
+    def test_concurrency(self):
+        individuals = [(0.02, i) for i in range(12)]
+        server, evaluator, fitness = self.evaluate(individuals, concurrency=3)
+        self.assertEqual(fitness, [float(i) for i in range(12)])
+        self.assertEqual(server.max_in_flight, 3)
+        self.assertEqual((evaluator.failures, evaluator.timeouts), (0, 0))
+
+    def test_timeout(self):
+        individuals = [(0., 1.), (1., 2.), (0., 3.)]
+        _, evaluator, fitness = self.evaluate(individuals, timeout=0.2, penalty=-1.)
+        self.assertEqual(fitness, [1., -1., 3.])
+        self.assertEqual((evaluator.failures, evaluator.timeouts), (0, 1))
+
+    def test_failure(self):
+        individuals = [(0., 1.), (0., -1.)]
+        _, evaluator, fitness = self.evaluate(individuals)
+        self.assertEqual(fitness[0], 1.)
+        self.assertEqual(fitness[1], -math.inf)
+        self.assertEqual((evaluator.failures, evaluator.timeouts), (1, 0))
+        self.assertIsInstance(evaluator.last_error, ValueError)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,36 @@
+import unittest
+
+import numpy as np
+
+from tools import genome
+
+
+class BinaryGenomeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.bits = [1, 0, 1, 1, 0, 0, 1, 0, 1, 1]
+        self.genome = genome.BinaryGenome.from_bits(self.bits)
+
+    def test_negative_index(self):
+        self.assertEqual(self.genome[-1], self.bits[-1])
+        self.genome[-1] = 0
+        self.assertEqual(self.genome[9], 0)
+
+    def test_out_of_range(self):
+        for index in (10, 64, -11):
+            with self.assertRaises(IndexError):
+                self.genome[index]
+            with self.assertRaises(IndexError):
+                self.genome[index] = 1
+        # The padding bits stay zero
+        self.assertFalse(self.genome.packed[2:].any())
+
+    def test_slice(self):
+        np.testing.assert_array_equal(self.genome[2:7], self.bits[2:7])
+        self.genome[::2] = [0] * 5
+        self.bits[::2] = [0] * 5
+        np.testing.assert_array_equal(self.genome.to_bits(), self.bits)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+import unittest
+
+import numpy as np
+
+from tools import breed
+from tools import evolve
+from tools import lazy
+from tools import population
+from tools import rng
+
+
+class LazyChildrenTest(unittest.TestCase):
+
+    def setUp(self):
+        rng.seed(0)
+        self.pop = population.Population(rng.get().random((30, 13)))
+
+    def breed(self, seed, n_children=50, lazy_children=True):
+        rng.seed(seed)
+        return breed.breed_uniform(self.pop, list(range(10)), n_children, 0.3, lazy=lazy_children)
+
+    def test_uniform_matches_eager(self):
+        # More children than a block of the packed mask, with a number of genes which is not a multiple of 8
+        n_children = 2 * breed._BLOCK + 37
+        children = self.breed(1, n_children)
+        self.assertTrue(lazy.is_lazy(children))
+        self.assertIsNotNone(children.mask)
+        eager = self.breed(1, n_children, lazy_children=False)
+        self.assertFalse(lazy.is_lazy(eager))
+        np.testing.assert_array_equal(children.genomes, eager.genomes)
+
+    def test_one_point_matches_eager(self):
+        rng.seed(2)
+        children = breed.breed_uniform_one_point(self.pop, list(range(10)), 50, lazy=True)
+        self.assertTrue(lazy.is_lazy(children))
+        self.assertIsNotNone(children.co_points)
+        rng.seed(2)
+        eager = breed.breed_uniform_one_point(self.pop, list(range(10)), 50)
+        np.testing.assert_array_equal(children.genomes, eager.genomes)
+
+    def test_packed_mask(self):
+        n_rows = breed._BLOCK + 5
+        rng.seed(3)
+        mask = breed._packed_mask(n_rows, 13, 0.3)
+        self.assertEqual(mask.shape, (n_rows, 2))
+        rng.seed(3)
+        np.testing.assert_array_equal(mask, np.packbits(rng.get().random((n_rows, 13)) < 0.3, axis=1))
+
+    def test_deltas(self):
+        children = self.breed(4)
+        eager = self.breed(4, lazy_children=False).genomes
+        rows, genes = np.array([0, 3, 3, 7]), np.array([1, 2, 2, 12])
+        children.add(rows, genes, np.array([1., 2., 3., 4.]))
+        children.set(np.array([7, 8]), np.array([12, 0]), np.array([-1., -2.]))
+        children.add(np.array([8]), np.array([0]), np.array([0.5]))
+        self.assertTrue(lazy.is_lazy(children))
+        # Repeated genes add up and the deltas apply in order
+        np.add.at(eager, (rows, genes), [1., 2., 3., 4.])
+        eager[[7, 8], [12, 0]] = [-1., -2.]
+        eager[8, 0] += 0.5
+        # Building some rows, repeated and out of order, or a single row keeps the children lazy
+        index = [8, 3, 3, 0, 29]
+        taken = children.take(index)
+        self.assertFalse(lazy.is_lazy(taken))
+        np.testing.assert_array_equal(taken.genomes, eager[index])
+        np.testing.assert_array_equal(children[7], eager[7])
+        self.assertTrue(lazy.is_lazy(children))
+        np.testing.assert_array_equal(children.genomes, eager)
+        self.assertFalse(lazy.is_lazy(children))
+        # Materialized children are changed in place
+        children.add(np.array([0, 0]), np.array([0, 0]), np.array([1., 1.]))
+        children.set(np.array([1]), np.array([1]), np.array([5.]))
+        eager[0, 0] += 2.
+        eager[1, 1] = 5.
+        np.testing.assert_array_equal(children.genomes, eager)
+
+    def test_copy_rows(self):
+        children = self.breed(5)
+        eager = self.breed(5, lazy_children=False).genomes
+        children.add(np.array([0, 1, 2]), np.array([0, 0, 0]), np.array([1., 1., 1.]))
+        children.set(np.array([1, 4]), np.array([3, 3]), np.array([9., 9.]))
+        children.copy_rows(np.array([0, 1]), np.array([20, 21]))
+        self.assertTrue(lazy.is_lazy(children))
+        # The copies drop their crossover and mutations, the other children keep them
+        eager[:2] = self.pop.genomes[[20, 21]]
+        eager[2, 0] += 1.
+        eager[4, 3] = 9.
+        np.testing.assert_array_equal(children.take([0, 1]).genomes, self.pop.genomes[[20, 21]])
+        np.testing.assert_array_equal(children.genomes, eager)
+        # The recipe is released with the parents
+        self.assertIsNone(children.source)
+        with self.assertRaises(ValueError):
+            children.copy_rows(np.array([0]), np.array([0]))
+
+    def test_population_interface(self):
+        children = self.breed(6)
+        self.assertEqual((len(children), children.n_genes, children.dtype), (50, 13, self.pop.dtype))
+        self.assertIn("materialized=False", repr(children))
+        self.assertTrue(lazy.supports(self.pop))
+        self.assertTrue(lazy.supports(children))
+        self.assertFalse(lazy.is_lazy(self.pop))
+        children.genomes = np.zeros((2, 3))
+        self.assertEqual((len(children), children.n_genes), (2, 3))
+
+    def test_evolve(self):
+        fitness = self.pop.genomes.sum(axis=1).tolist()
+        children = evolve.evolve_best(self.pop, fitness, 10, None, lazy=True)
+        # Elitism copies the best individual without materializing the children
+        self.assertTrue(lazy.is_lazy(children))
+        np.testing.assert_array_equal(children[0], self.pop.genomes[np.argmax(fitness)])
+        self.assertEqual(np.asarray(children.genomes).shape, self.pop.genomes.shape)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+import unittest
+
+import numpy as np
+
+from tools import evolve
+from tools import population
+from tools import rng
+from tools import selection
+
+
+def brute_fronts(objectives):
+    # Peel the fronts: the individuals dominated by no other remaining individual form the next front
+    objectives = np.asarray(objectives, dtype=float)
+    dominates = (objectives[:, None] >= objectives[None]).all(axis=2) & (objectives[:, None] > objectives[None]).any(
+        axis=2)
+    fronts = np.full(len(objectives), -1)
+    front = 0
+    while (fronts < 0).any():
+        remaining = fronts < 0
+        current = remaining & ~(dominates[remaining].any(axis=0))
+        fronts[current] = front
+        front += 1
+    return fronts
+
+
+class NonDominatedSortTest(unittest.TestCase):
+
+    def setUp(self):
+        rng.seed(0)
+
+    def test_matches_brute_force(self):
+        for n_objectives in (1, 2, 3, 4):
+            for n in (1, 2, 10, 60):
+                # Few distinct values: many ties and duplicated points
+                objectives = rng.get().integers(0, 4, size=(n, n_objectives))
+                np.testing.assert_array_equal(selection.non_dominated_sort(objectives), brute_fronts(objectives))
+                objectives = rng.get().random((n, n_objectives))
+                np.testing.assert_array_equal(selection.non_dominated_sort(objectives), brute_fronts(objectives))
+
+    def test_single_objective_vector(self):
+        np.testing.assert_array_equal(selection.non_dominated_sort([3., 1., 3., 2.]), [0, 2, 0, 1])
+        self.assertEqual(len(selection.non_dominated_sort(np.empty((0, 2)))), 0)
+
+
+class CrowdingDistanceTest(unittest.TestCase):
+
+    def test_boundary_points(self):
+        objectives = np.array([[0., 4.], [1., 3.], [2., 1.], [4., 0.]])
+        fronts = selection.non_dominated_sort(objectives)
+        distance = selection.crowding_distance(objectives, fronts)
+        self.assertTrue(np.isinf(distance[[0, 3]]).all())
+        # Neighbour gaps normalized by the range of each objective
+        self.assertAlmostEqual(distance[1], 2 / 4 + 3 / 4)
+        self.assertAlmostEqual(distance[2], 3 / 4 + 3 / 4)
+
+    def test_duplicate_points(self):
+        objectives = np.array([[1., 1.], [1., 1.], [1., 1.]])
+        distance = selection.crowding_distance(objectives, selection.non_dominated_sort(objectives))
+        # A single point repeated: the extremes are infinite and the range is 0
+        self.assertEqual(np.isinf(distance).sum(), 2)
+        self.assertFalse(np.isnan(distance).any())
+        objectives = np.array([[0., 2.], [1., 1.], [1., 1.], [2., 0.]])
+        distance = selection.crowding_distance(objectives, selection.non_dominated_sort(objectives))
+        self.assertTrue(np.isinf(distance[[0, 3]]).all())
+        self.assertTrue(np.isfinite(distance[[1, 2]]).all())
+
+    def test_fronts_are_separate(self):
+        objectives = np.array([[0., 2.], [1., 1.], [2., 0.], [0., 0.], [-1., -1.]])
+        distance = selection.crowding_distance(objectives, selection.non_dominated_sort(objectives))
+        # Individuals alone in their front are both extremes of it
+        self.assertTrue(np.isinf(distance[[3, 4]]).all())
+        self.assertAlmostEqual(distance[1], 2.)
+
+
+class SelNsga2Test(unittest.TestCase):
+
+    def test_ranking(self):
+        objectives = np.array([[0., 0.], [0., 3.], [1., 2.], [2., 1.], [3., 0.], [1., 1.]])
+        # Front 0 by crowding distance (extremes first), then front 1
+        ranking = selection.sel_nsga2(objectives, 6)
+        self.assertEqual(sorted(ranking[:2]), [1, 4])
+        self.assertEqual(sorted(ranking[2:4]), [2, 3])
+        self.assertEqual(ranking[4:], [5, 0])
+        self.assertEqual(selection.sel_nsga2(objectives, 3), ranking[:3])
+
+    def test_evolve_nsga2(self):
+        rng.seed(3)
+        genomes = rng.get().random((40, 5))
+        objectives = np.column_stack((genomes.sum(axis=1), -genomes.sum(axis=1) ** 2))
+        children = evolve.evolve_nsga2(population.Population(genomes.copy()), objectives, 10, None)
+        self.assertEqual(children.genomes.shape, genomes.shape)
+        # The best 5% by NSGA-II ranking are copied unchanged to the first rows
+        elite = selection.sel_nsga2(objectives, 2)
+        np.testing.assert_array_equal(children.genomes[:2], genomes[elite])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+import io
+import json
+import os
+import tempfile
+import tracemalloc
+import unittest
+
+import numpy as np
+
+from tools import evolve
+from tools import genome
+from tools import profiling
+from tools import rng
+
+
+class MetricsTest(unittest.TestCase):
+
+    def setUp(self):
+        rng.seed(0)
+
+    def evolve(self, metrics, generations=3):
+        individuals = rng.get().random((20, 5))
+        for _ in range(generations):
+            fitness = (-individuals ** 2).sum(axis=1).tolist()
+            individuals = evolve.evolve_best(individuals, fitness, 5, None, metrics=metrics)
+
+    def test_stage_totals_and_generations(self):
+        stages = []
+        metrics = profiling.Metrics(on_stage=lambda name, record: stages.append(name))
+        self.evolve(metrics)
+        self.assertEqual(stages, ["select", "breed", "mutate", "elitism"] * 3)
+        for name in ("select", "breed", "mutate", "elitism"):
+            self.assertEqual(metrics.totals[name]["calls"], 3)
+            expected = sum(record["stages"][name]["seconds"] for record in metrics.generations)
+            self.assertAlmostEqual(metrics.totals[name]["seconds"], expected)
+        self.assertEqual([record["generation"] for record in metrics.generations], [0, 1, 2])
+        first = metrics.generations[0]
+        self.assertGreaterEqual(first["best"], first["mean"])
+        self.assertGreater(first["diversity"], 0.)
+        self.assertEqual(set(metrics.to_dict()), {"stages", "generations"})
+
+    def test_write_jsonl(self):
+        metrics = profiling.Metrics(population_stats=False)
+        self.evolve(metrics, generations=2)
+        file = io.StringIO()
+        metrics.write_jsonl(file)
+        records = [json.loads(line) for line in file.getvalue().splitlines()]
+        self.assertEqual(records, metrics.generations)
+        self.assertNotIn("best", records[0])
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "metrics.jsonl")
+            metrics.write_jsonl(path)
+            with open(path) as handle:
+                self.assertEqual(handle.read(), file.getvalue())
+
+    def test_trace_allocations(self):
+        metrics = profiling.Metrics(trace_allocations=True)
+        metrics.start_generation(genome.BinaryPopulation.from_bits(np.eye(4, dtype=np.uint8)), [1., 2., 3., 4.])
+        with metrics.stage("allocate"):
+            kept = [object() for _ in range(1000)]
+        record = metrics.generations[0]["stages"]["allocate"]
+        self.assertGreaterEqual(record["alloc_blocks"], 1000)
+        self.assertGreater(record["alloc_bytes"], 0)
+        self.assertGreaterEqual(record["peak_bytes"], record["alloc_bytes"])
+        # The metrics started tracing, they stopped it
+        self.assertFalse(tracemalloc.is_tracing())
+        # One bit differs from the majority genome in every individual
+        self.assertEqual(metrics.generations[0]["diversity"], 1.)
+        self.assertEqual(len(kept), 1000)
+
+    def test_tracing_started_by_caller(self):
+        tracemalloc.start()
+        try:
+            metrics = profiling.Metrics(trace_allocations=True)
+            with metrics.stage("empty"):
+                pass
+            self.assertTrue(tracemalloc.is_tracing())
+        finally:
+            tracemalloc.stop()
+
+    def test_profile(self):
+        with self.assertRaises(ValueError):
+            profiling.Metrics().profile_stats()
+        metrics = profiling.Metrics(profile=True)
+        self.evolve(metrics, generations=1)
+        self.assertTrue(metrics.profile_stats().stats)
+
+    def test_no_metrics(self):
+        with profiling.stage(None, "select"):
+            pass
+
+
+if __name__ == "__main__":
+    unittest.main()
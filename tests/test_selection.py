@@ -0,0 +1,157 @@
+import itertools
+import unittest
+
+import numpy as np
+
+from tools import extra
+from tools import rng
+from tools import selection
+
+
+def baseline_tournament_first(fitness, tour_size, generator):
+    # Winner of the first tournament as selected before the vectorized selection: the lowest index among the
+    # individuals sharing the best fitness drawn
+    best = max(fitness[i] for i in generator.integers(0, len(fitness), size=tour_size).tolist())
+    return fitness.index(best)
+
+
+class RankingTest(unittest.TestCase):
+
+    def setUp(self):
+        rng.seed(0)
+        self.fitness = rng.get().integers(0, 4, size=40).astype(float).tolist()
+
+    def test_ties_match_sorting(self):
+        # Ties are ordered as by sorting (fitness, index) pairs, as extra.sort_lists does
+        descending = extra.sort_lists(self.fitness, list(range(40)), descending=True)[1]
+        ascending = extra.sort_lists(self.fitness, list(range(40)), descending=False)[1]
+        view = selection.FitnessView(self.fitness)
+        for size in (0, 1, 7, 39, 40):
+            self.assertEqual(selection.sel_best(self.fitness, size), descending[:size])
+            self.assertEqual(selection.sel_worst(self.fitness, size), ascending[:size])
+            self.assertEqual(selection.sel_best(view, size), descending[:size])
+            self.assertEqual(selection.sel_worst(view, size), ascending[:size])
+
+
+class TournamentTest(unittest.TestCase):
+
+    def setUp(self):
+        rng.seed(0)
+
+    def test_unique_winners(self):
+        fitness = rng.get().integers(0, 5, size=30).astype(float).tolist()
+        for tournaments in (1, 10, 30):
+            winners = selection.sel_tournament(fitness, tournaments, 3)
+            self.assertEqual(len(winners), tournaments)
+            self.assertEqual(len(set(winners)), tournaments)
+        self.assertEqual(sorted(selection.sel_tournament(fitness, 30, 3)), list(range(30)))
+        with self.assertRaises(IndexError):
+            selection.sel_tournament(fitness, 31, 3)
+
+    def test_tie_winner(self):
+        # The tournament of every individual is won by the lowest index of the best fitness
+        fitness = [1., 3., 2., 3., 3.]
+        self.assertEqual(selection.sel_tournament(fitness, 1, 200), [1])
+        self.assertEqual(selection.sel_tournament(fitness, 3, 200), [1, 3, 4])
+
+    def test_distribution_matches_baseline(self):
+        fitness = [2., 5., 5., 1., 3., 4.]
+        n = 20000
+        winners = np.bincount(selection.sel_tournament(fitness, n, 2, replace=True), minlength=6) / n
+        generator = np.random.default_rng(1)
+        baseline = np.bincount([baseline_tournament_first(fitness, 2, generator) for _ in range(n)], minlength=6) / n
+        np.testing.assert_allclose(winners, baseline, atol=0.02)
+        first = np.bincount([selection.sel_tournament(fitness, 2, 2)[0] for _ in range(n)], minlength=6) / n
+        np.testing.assert_allclose(first, baseline, atol=0.02)
+
+
+class FitnessProportionateTest(unittest.TestCase):
+
+    def setUp(self):
+        rng.seed(0)
+
+    def test_negative_fitness(self):
+        fitness = [-1., 2., 3., 0.5]
+        with self.assertRaises(ValueError):
+            selection.sel_roulette(fitness, 2)
+        with self.assertRaises(ValueError):
+            selection.sel_roulette(fitness, 2, replace=True)
+        with self.assertRaises(ValueError):
+            selection.sel_sus(fitness, 2)
+        with self.assertRaises(ValueError):
+            selection.WeightedSampler(fitness)
+        with self.assertRaises(ValueError):
+            selection.sel_sus(selection.FitnessView(fitness), 2)
+
+    def test_zero_fitness(self):
+        with self.assertRaises(ValueError):
+            selection.sel_roulette([0.] * 5, 2)
+        with self.assertRaises(ValueError):
+            selection.sel_sus(np.zeros(5), 2)
+
+    def test_scaled_negative_fitness(self):
+        view = selection.FitnessView([-3., -1., -2., -10.], "window")
+        self.assertNotIn(3, selection.sel_roulette(view, 3))
+        self.assertNotIn(3, selection.sel_sus(view, 4))
+        first, second = selection.WeightedSampler(view).sample_pairs(50)
+        self.assertFalse(np.any(first == second))
+        constant = selection.FitnessView([-2.] * 4, "window")
+        self.assertEqual(sorted(selection.sel_roulette(constant, 4)), [0, 1, 2, 3])
+
+
+class SamplingTest(unittest.TestCase):
+
+    def setUp(self):
+        rng.seed(0)
+        self.weights = np.array([1., 4., 2., 0., 3.])
+        self.proportions = self.weights / self.weights.sum()
+
+    def test_roulette_without_replacement(self):
+        for size in (1, 3, 4):
+            for _ in range(200):
+                selected = selection.sel_roulette(self.weights, size)
+                self.assertEqual(len(set(selected)), size)
+        with self.assertRaises(IndexError):
+            selection.sel_roulette(self.weights, 6)
+
+    def test_roulette_distribution(self):
+        n = 20000
+        first = np.bincount([selection.sel_roulette(self.weights, 2)[0] for _ in range(n)], minlength=5) / n
+        np.testing.assert_allclose(first, self.proportions, atol=0.015)
+        drawn = np.bincount(selection.sel_roulette(self.weights, n, replace=True), minlength=5) / n
+        np.testing.assert_allclose(drawn, self.proportions, atol=0.015)
+
+    def test_roulette_pairs_match_sequential_draws(self):
+        # Drawing one individual at a time and removing it from the wheel
+        n = 20000
+        pairs = [tuple(selection.sel_roulette(self.weights, 2)) for _ in range(n)]
+        total = self.weights.sum()
+        for i, j in itertools.permutations(range(5), 2):
+            expected = self.weights[i] / total * self.weights[j] / (total - self.weights[i])
+            self.assertAlmostEqual(pairs.count((i, j)) / n, expected, delta=0.012)
+
+    def test_sus(self):
+        size = 20
+        expected = size * self.proportions
+        for _ in range(200):
+            counts = np.bincount(selection.sel_sus(self.weights, size), minlength=5)
+            # Minimal spread: every individual is selected the floor or the ceiling of its expected count
+            self.assertTrue(np.all(counts >= np.floor(expected)) and np.all(counts <= np.ceil(expected)))
+        n = 2000
+        counts = np.bincount(np.concatenate([selection.sel_sus(self.weights, 7) for _ in range(n)]), minlength=5)
+        np.testing.assert_allclose(counts / (7 * n), self.proportions, atol=0.01)
+
+    def test_sample_pairs(self):
+        n = 40000
+        first, second = selection.WeightedSampler(self.weights).sample_pairs(n)
+        self.assertFalse(np.any(first == second))
+        np.testing.assert_allclose(np.bincount(first, minlength=5) / n, self.proportions, atol=0.01)
+        total = self.weights.sum()
+        pairs = np.bincount(first * 5 + second, minlength=25) / n
+        for i, j in itertools.permutations(range(5), 2):
+            expected = self.weights[i] / total * self.weights[j] / (total - self.weights[i])
+            self.assertAlmostEqual(pairs[i * 5 + j], expected, delta=0.01)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,143 @@
+import gc
+import os
+import pickle
+import subprocess
+import sys
+import unittest
+
+import numpy as np
+
+from tools import genome
+from tools import shared
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Creates a shared population scored by worker processes attached to it, prints its segment names and exits
+# without closing it, raising if asked to
+OWNER_SCRIPT = """
+import sys
+import numpy as np
+from tools import fitness, shared
+pop = shared.SharedPopulation.from_individuals(np.arange(12.).reshape(4, 3))
+print(pop.handle.genomes_name, pop.handle.fitness_name, flush=True)
+with fitness.Evaluator(sum, processes=2, chunksize=1) as evaluator:
+    print(evaluator.evaluate(pop), flush=True)
+if sys.argv[1] == "raise":
+    raise RuntimeError("uncaught")
+"""
+
+
+def segment_exists(name):
+    try:
+        segment = shared._open(name)
+    except FileNotFoundError:
+        return False
+    segment.close()
+    return True
+
+
+class SharedPopulationTest(unittest.TestCase):
+
+    def tearDown(self):
+        for pop in list(shared._attached.values()):
+            pop.close()
+        shared._attached.clear()
+
+    def test_create(self):
+        with shared.SharedPopulation.create(5, 3, dtype=np.int32) as pop:
+            self.assertEqual(pop.genomes.shape, (5, 3))
+            self.assertEqual(pop.dtype, np.int32)
+            self.assertTrue(np.isnan(pop.fitness).all())
+            self.assertTrue(pop.owner)
+            self.assertFalse(pop.closed)
+            names = pop.handle.genomes_name, pop.handle.fitness_name
+            self.assertTrue(all(segment_exists(name) for name in names))
+        self.assertTrue(pop.closed)
+        self.assertIsNone(pop.genomes)
+        self.assertFalse(any(segment_exists(name) for name in names))
+        # Closing twice does nothing
+        pop.close()
+
+    def test_empty(self):
+        with shared.SharedPopulation.create(0, 3) as pop:
+            self.assertEqual(pop.genomes.shape, (0, 3))
+            self.assertEqual(len(pop.fitness), 0)
+
+    def test_from_individuals(self):
+        individuals = np.arange(6.).reshape(2, 3)
+        with shared.SharedPopulation.from_individuals(individuals, fitness=[1., 2.]) as pop:
+            np.testing.assert_array_equal(pop.genomes, individuals)
+            np.testing.assert_array_equal(pop.fitness, [1., 2.])
+            with shared.SharedPopulation.like(pop) as spare:
+                self.assertEqual((spare.genomes.shape, spare.dtype), (pop.genomes.shape, pop.dtype))
+                self.assertNotEqual(spare.handle.genomes_name, pop.handle.genomes_name)
+        with self.assertRaises(ValueError):
+            shared.SharedPopulation.from_individuals(genome.BinaryPopulation.from_bits(np.eye(3, dtype=np.uint8)))
+
+    def test_attach(self):
+        with shared.SharedPopulation.from_individuals(np.zeros((3, 2))) as pop:
+            other = shared.SharedPopulation.attach(pop.handle)
+            self.assertFalse(other.owner)
+            other.genomes[1] = 7.
+            other.fitness[2] = 3.
+            np.testing.assert_array_equal(pop.genomes[1], [7., 7.])
+            self.assertEqual(pop.fitness[2], 3.)
+            pop.genomes[0, 0] = -1.
+            self.assertEqual(other.genomes[0, 0], -1.)
+            # Closing an attached population leaves the segments to their owner
+            other.close()
+            self.assertTrue(segment_exists(pop.handle.genomes_name))
+            self.assertEqual(pop.genomes[1, 0], 7.)
+        with self.assertRaises(FileNotFoundError):
+            shared.SharedPopulation.attach(pop.handle)
+
+    def test_pickle(self):
+        with shared.SharedPopulation.from_individuals(np.arange(4.).reshape(2, 2)) as pop:
+            data = pickle.dumps(pop)
+            # The handle is sent, not the genomes
+            self.assertLess(len(data), 1000)
+            copy = pickle.loads(data)
+            self.assertFalse(copy.owner)
+            np.testing.assert_array_equal(copy.genomes, pop.genomes)
+            copy.fitness[:] = 5.
+            np.testing.assert_array_equal(pop.fitness, [5., 5.])
+            # Unpickling again reuses the mapping
+            self.assertIs(pickle.loads(data), copy)
+            self.assertEqual(pickle.loads(pickle.dumps(pop.handle)).genomes_name, pop.handle.genomes_name)
+
+    def test_attached_cache(self):
+        pops = [shared.SharedPopulation.create(1, 1) for _ in range(shared._MAX_ATTACHED + 1)]
+        try:
+            first = shared.attached(pops[0].handle)
+            for pop in pops[1:]:
+                shared.attached(pop.handle)
+            # The least recently used mapping is closed
+            self.assertTrue(first.closed)
+            self.assertEqual(len(shared._attached), shared._MAX_ATTACHED)
+            self.assertTrue(segment_exists(pops[0].handle.genomes_name))
+        finally:
+            for pop in pops:
+                pop.close()
+
+    def test_garbage_collected(self):
+        pop = shared.SharedPopulation.create(2, 2)
+        name = pop.handle.genomes_name
+        del pop
+        gc.collect()
+        self.assertFalse(segment_exists(name))
+
+    def test_owner_exit(self):
+        for mode in ("exit", "raise"):
+            with self.subTest(mode=mode):
+                result = subprocess.run([sys.executable, "-c", OWNER_SCRIPT, mode], cwd=ROOT, capture_output=True,
+                                        text=True, timeout=60)
+                self.assertEqual(result.returncode != 0, mode == "raise", result.stderr)
+                lines = result.stdout.splitlines()
+                self.assertEqual(lines[1], "[3.0, 12.0, 21.0, 30.0]")
+                # The segments are unlinked at exit, the resource tracker has nothing left to clean up
+                self.assertFalse(any(segment_exists(name) for name in lines[0].split()))
+                self.assertNotIn("leaked", result.stderr)
+
+
+if __name__ == "__main__":
+    unittest.main()
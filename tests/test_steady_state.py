@@ -0,0 +1,34 @@
+import unittest
+
+import numpy as np
+
+from tools import rng
+from tools.steady_state import SteadyState
+
+
+class SteadyStateTest(unittest.TestCase):
+
+    def setUp(self):
+        rng.seed(0)
+
+    def test_integer_genomes(self):
+        engine = SteadyState([[1, 2, 3, 4, 5, 6]] * 10, [0.] * 10, sum)
+        for _ in range(20):
+            engine.step()
+        self.assertTrue(np.issubdtype(engine.population.dtype, np.integer))
+        self.assertEqual(sorted(engine.best_individual.tolist()), [1, 2, 3, 4, 5, 6])
+
+    def test_nan_fitness(self):
+        fitness = [1., np.nan, 3., np.nan, 2.]
+        engine = SteadyState(np.zeros((5, 3)), fitness, lambda individual: float(individual.sum()))
+        self.assertEqual(engine.worst()[1], -np.inf)
+        self.assertEqual(engine.best(), (2, 3.))
+        self.assertIsNone(engine.insert(np.ones(3), np.nan))
+        self.assertIn(engine.insert(np.ones(3), 0.), (1, 3))
+        self.assertEqual(engine.worst()[1], -np.inf)
+        self.assertIsNotNone(engine.insert(np.ones(3), 0.5))
+        self.assertEqual(engine.worst()[1], 0.)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,106 @@
+import unittest
+
+import numpy as np
+
+from tools import driver
+from tools import evolve
+from tools import rng
+from tools import surrogate
+
+
+def sphere(individual):
+    return -float(np.sum((np.asarray(individual) - 0.3) ** 2))
+
+
+class Optimistic:
+    """
+    Model predicting a fitness far above any true fitness.
+    """
+
+    def fit(self, features, fitness):
+        pass
+
+    def predict(self, features):
+        return np.full(len(features), 1e9)
+
+
+class ModelTest(unittest.TestCase):
+
+    def setUp(self):
+        rng.seed(0)
+
+    def test_ridge_primal(self):
+        features = rng.get().random((200, 4))
+        fitness = np.array([sphere(row) for row in features])
+        model = surrogate.RidgeModel(alpha=1e-6)
+        model.fit(features, fitness)
+        test = rng.get().random((20, 4))
+        np.testing.assert_allclose(model.predict(test), [sphere(row) for row in test], atol=1e-4)
+
+    def test_ridge_dual(self):
+        # Fewer samples than features: the dual system is solved, the training values are still fitted
+        features = rng.get().random((5, 30))
+        fitness = np.array([sphere(row) for row in features])
+        model = surrogate.RidgeModel(alpha=1e-6)
+        model.fit(features, fitness)
+        np.testing.assert_allclose(model.predict(features), fitness, atol=1e-3)
+        self.assertTrue(np.isfinite(model.predict(rng.get().random((3, 30)))).all())
+
+    def test_knn(self):
+        features = rng.get().random((3, 2))
+        fitness = np.array([1., 2., 3.])
+        # k larger than the history uses every genome
+        model = surrogate.KNNModel(k=10)
+        model.fit(features, fitness)
+        np.testing.assert_allclose(model.predict(features), fitness, atol=1e-6)
+        prediction = model.predict(np.array([[5., 5.]]))[0]
+        self.assertTrue(1. < prediction < 3.)
+
+
+class SurrogateTest(unittest.TestCase):
+
+    def setUp(self):
+        rng.seed(1)
+
+    def test_warmup_and_screening(self):
+        screening = surrogate.Surrogate(sphere, fraction=0.25, exploration=0., warmup=40)
+        individuals = rng.get().random((40, 3))
+        fitness = screening.evaluate(individuals)
+        # Not enough history yet: every individual is scored
+        self.assertEqual(screening.last_evaluations, 40)
+        self.assertFalse(screening.estimated.any())
+        self.assertEqual(fitness, [sphere(row) for row in individuals])
+        children = np.vstack((individuals[:4], rng.get().random((36, 3))))
+        fitness = screening.evaluate(children)
+        # The copies get their true fitness from the cache, a quarter of the new children is scored
+        self.assertEqual(fitness[:4], [sphere(row) for row in individuals[:4]])
+        self.assertEqual(screening.last_evaluations, 9)
+        self.assertEqual(int(screening.estimated.sum()), 27)
+        scored = ~screening.estimated
+        np.testing.assert_allclose(np.asarray(fitness)[scored], [sphere(row) for row in children[scored]])
+        self.assertEqual(len(screening.accuracy), 1)
+        self.assertAlmostEqual(screening.saved, 27 / 76)
+
+    def test_non_finite_fitness_left_out_of_history(self):
+        def failing(individual):
+            return -np.inf if individual[0] > 0.5 else sphere(individual)
+
+        screening = surrogate.Surrogate(failing, warmup=1000)
+        screening.evaluate(rng.get().random((50, 2)))
+        self.assertTrue(np.isfinite(screening._fitness[:screening._size]).all())
+        self.assertLess(screening._size, 50)
+
+    def test_driver_ignores_predictions(self):
+        # A model predicting far better than the true fitness: the run must neither record a prediction as the best
+        # nor stop on it
+        screening = surrogate.Surrogate(sphere, model=Optimistic(), fraction=0.2, warmup=20)
+        individuals = rng.get().random((20, 3))
+        snapshot = driver.run(individuals, None, evolve.evolve_best, (5, None),
+                              stop=[driver.target_fitness(1.), driver.max_generations(8)], evaluator=screening)
+        self.assertEqual(snapshot.stop_reason, "max_generations")
+        self.assertLessEqual(snapshot.best_fitness, 0.)
+        self.assertEqual(sphere(snapshot.best), snapshot.best_fitness)
+
+
+if __name__ == "__main__":
+    unittest.main()
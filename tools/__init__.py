@@ -1 +1,3 @@
-__all__ = ["breed", "crossover", "evolve", "extra", "mutation", "selection"]
+__all__ = ["adaptive", "breed", "cache", "checkpoint", "crossover", "diversity", "driver", "evolve", "extra", "fitness",
+           "genome", "island", "lazy", "mutation", "population", "profiling", "rng", "selection", "shared",
+           "steady_state", "surrogate"]
@@ -0,0 +1,338 @@
+import math
+from typing import Callable, Optional
+
+import numpy as np
+
+from tools import crossover
+from tools import genome
+from tools import mutation as mut
+from tools import population
+from tools import rng
+
+"""
+Parameter control.
+
+Instead of tuning the mutation step size, the mutation probability and the crossover for every problem, the
+parameters are adapted during the run from the outcome of the previous generations:
+
+One fifth success rule (Rechenberg): the step size sigma of the Gaussian mutation grows when more than a fifth of the
+children improve on their parent, and shrinks when fewer do.
+Self-adaptation (Schwefel): every individual carries its own step size as its last gene and mutates it before its
+other genes (see mutation.mut_self_adaptive), selection keeps the step sizes of the surviving children.
+Operator selection with credit assignment: each child is bred with a crossover and a mutation drawn from lists of
+operators, and an operator is credited with the improvement of its children over their parents. AdaptivePursuit
+moves the draw probabilities towards the operator of best estimated reward, UCB draws the operators of best upper
+confidence bound of their mean reward (a multi-armed bandit).
+
+evolve.evolve_adaptive evolves a generation with a Control holding these adaptive parameters. The fitness of the
+children it breeds is only known at the next call, which credits the operators and updates the step size before
+breeding again. Each generation costs a few numpy operations on the fitness list, and Control.history records the
+success rate, the step size and the operator probabilities of every generation:
+
+control = adaptive.Control()
+for generation in range(generations):
+    fitness = ...
+    individuals = evolve.evolve_adaptive(individuals, fitness, n_parents, control)
+"""
+
+
+class OneFifthRule:
+    """
+    Step size control by the one fifth success rule.
+    """
+
+    def __init__(self, sigma=0.1, factor=0.85, target=0.2, min_sigma=1e-10, max_sigma=math.inf):
+        """
+        :param sigma: Float, initial step size
+        :param factor: Float in (0, 1), the step size is multiplied by factor when too few children improve on their
+        parent and divided by factor when too many do
+        :param target: Float, target success rate
+        :param min_sigma: Float
+        :param max_sigma: Float
+        """
+        self.sigma = sigma
+        self.factor = factor
+        self.target = target
+        self.min_sigma = min_sigma
+        self.max_sigma = max_sigma
+
+    def update(self, success_rate):
+        """
+        :param success_rate: Float, fraction of the children better than their parent
+        :return: Float, the new step size
+        """
+        if success_rate > self.target:
+            self.sigma = min(self.sigma / self.factor, self.max_sigma)
+        elif success_rate < self.target:
+            self.sigma = max(self.sigma * self.factor, self.min_sigma)
+        return self.sigma
+
+
+class AdaptivePursuit:
+    """
+    Adaptive pursuit operator selection (Thierens): the estimated reward of each operator follows its recent rewards,
+    and the draw probabilities pursue the operator of best estimate, every operator keeping at least p_min.
+    """
+
+    def __init__(self, n_arms, p_min: Optional[float] = None, alpha=0.8, beta=0.8):
+        """
+        :param n_arms: Integer, number of operators
+        :param p_min: Float, minimum probability of an operator, defaults to min(0.05, 1 / (2 n_arms))
+        :param alpha: Float in (0, 1], adaptation rate of the reward estimates
+        :param beta: Float in (0, 1], adaptation rate of the probabilities
+        """
+        self.p_min = min(0.05, 1 / (2 * n_arms)) if p_min is None else p_min
+        self.p_max = 1 - (n_arms - 1) * self.p_min
+        self.alpha = alpha
+        self.beta = beta
+        self.quality = np.ones(n_arms)
+        self.probabilities = np.full(n_arms, 1 / n_arms)
+
+    def draw(self, size):
+        """
+        :param size: Integer
+        :return: numpy array of 'size' operator indexes
+        """
+        return rng.get().choice(len(self.probabilities), size=size, p=self.probabilities)
+
+    def reward(self, arms, rewards):
+        """
+        Credit the operators with the rewards of their uses.
+        :param arms: numpy array of operator indexes
+        :param rewards: numpy array of rewards in [0, 1], one per use
+        """
+        used, mean = _mean_rewards(len(self.quality), arms, rewards)
+        self.quality[used] += self.alpha * (mean[used] - self.quality[used])
+        best = np.zeros(len(self.quality), dtype=bool)
+        best[np.argmax(self.quality)] = True
+        self.probabilities += self.beta * (np.where(best, self.p_max, self.p_min) - self.probabilities)
+        self.probabilities /= self.probabilities.sum()
+
+
+class UCB:
+    """
+    UCB1 multi-armed bandit: each use goes to the operator maximizing its mean reward plus c sqrt(ln(uses) / uses of
+    the operator). The operators of a generation are drawn one after the other as if each use was already counted.
+    """
+
+    def __init__(self, n_arms, c=math.sqrt(2), window: Optional[int] = None):
+        """
+        :param n_arms: Integer, number of operators
+        :param c: Float, weight of the exploration term
+        :param window: Optional integer, number of generations after which the past rewards are forgotten (the
+        totals decay by (window - 1) / window per generation), to follow a changing landscape
+        """
+        self.c = c
+        self.window = window
+        self.counts = np.zeros(n_arms)
+        self.totals = np.zeros(n_arms)
+
+    @property
+    def probabilities(self):
+        # Share of the uses of each operator
+        total = self.counts.sum()
+        return self.counts / total if total else np.full(len(self.counts), 1 / len(self.counts))
+
+    def draw(self, size):
+        """
+        :param size: Integer
+        :return: numpy array of 'size' operator indexes
+        """
+        counts = self.counts.copy()
+        means = np.divide(self.totals, counts, out=np.ones(len(counts)), where=counts > 0)
+        arms = np.empty(size, dtype=np.intp)
+        for i in range(size):
+            total = max(1., counts.sum())
+            with np.errstate(divide="ignore", invalid="ignore"):
+                bounds = means + self.c * np.sqrt(math.log(total) / counts)
+            arms[i] = np.argmax(np.where(counts > 0, bounds, np.inf))
+            counts[arms[i]] += 1
+        return arms
+
+    def reward(self, arms, rewards):
+        """
+        Credit the operators with the rewards of their uses.
+        :param arms: numpy array of operator indexes
+        :param rewards: numpy array of rewards in [0, 1], one per use
+        """
+        if self.window is not None:
+            decay = (self.window - 1) / self.window
+            self.counts *= decay
+            self.totals *= decay
+        self.counts += np.bincount(arms, minlength=len(self.counts))
+        self.totals += np.bincount(arms, weights=rewards, minlength=len(self.totals))
+
+
+class Control:
+    """
+    Adaptive parameters of evolve.evolve_adaptive: the crossover and mutation operators and the mutation step size.
+    """
+
+    def __init__(self, crossovers: Optional[list] = None, mutations: Optional[list] = None,
+                 selector: Callable = AdaptivePursuit, step: Optional[OneFifthRule] = None):
+        """
+        :param crossovers: List of callables crossover(parents1, parents2) -> Population of one child per row pair.
+        Defaults to uniform crossover with co_prob 0.1, 0.3 and 0.5, and one point crossover.
+        :param mutations: List of callables mutation(children, sigma) mutating the Population of children in place.
+        Defaults to Gaussian mutation of 1, 2 or 5 genes per child on average with step size sigma (bit flip for a
+        BinaryPopulation, random resetting for a CharPopulation, swaps for integer genes).
+        :param selector: Callable selector(n_arms) returning the operator selection, e.g AdaptivePursuit or UCB
+        :param step: OneFifthRule adapting the step size sigma, defaults to OneFifthRule()
+        """
+        self.crossovers = crossovers
+        self.mutations = mutations
+        self.selector = selector
+        self.step = OneFifthRule() if step is None else step
+        self.crossover_selector = None
+        self.mutation_selector = None
+        self.history = []
+        self._pending = None
+
+    @property
+    def sigma(self):
+        return self.step.sigma
+
+    def assign(self, pop, n_children):
+        """
+        Draw the crossover and the mutation of every child.
+        :param pop: Population, the current generation, which sets the default operators
+        :param n_children: Integer
+        :return: Tuple of numpy arrays (crossover index, mutation index) of every child
+        """
+        if self.crossovers is None:
+            self.crossovers = default_crossovers()
+        if self.mutations is None:
+            self.mutations = default_mutations(pop)
+        if self.crossover_selector is None:
+            self.crossover_selector = self.selector(len(self.crossovers))
+            self.mutation_selector = self.selector(len(self.mutations))
+        return self.crossover_selector.draw(n_children), self.mutation_selector.draw(n_children)
+
+    def remember(self, parent_fitness, crossovers, mutations, start=0):
+        """
+        Keep the origin of the children until their fitness is known.
+        :param parent_fitness: numpy array, fitness of the first parent of every child
+        :param crossovers: numpy array, crossover index of every child
+        :param mutations: numpy array, mutation index of every child
+        :param start: Integer, the children before start (e.g the elite) are not credited
+        """
+        self._pending = (np.asarray(parent_fitness, dtype=float), crossovers, mutations, start)
+
+    def credit(self, fitness):
+        """
+        Credit the operators and update the step size with the fitness of the children bred since 'remember'.
+        The reward of a child is its improvement over its parent, relative to the largest improvement of the
+        generation.
+        :param fitness: List of fitness values of the children
+        :return: Dictionary of the statistics of the generation, or None if there were no children to credit
+        """
+        if self._pending is None or len(self._pending[0]) != len(fitness):
+            return None
+        parent_fitness, crossovers, mutations, start = self._pending
+        self._pending = None
+        improvement = np.asarray(fitness, dtype=float)[start:] - parent_fitness[start:]
+        crossovers, mutations = crossovers[start:], mutations[start:]
+        improvement = np.where(np.isfinite(improvement), improvement, 0.)
+        gain = np.maximum(improvement, 0.)
+        rewards = gain / gain.max() if gain.max() > 0 else gain
+        success_rate = float(np.mean(improvement > 0)) if len(improvement) else 0.
+        self.step.update(success_rate)
+        self.crossover_selector.reward(crossovers, rewards)
+        self.mutation_selector.reward(mutations, rewards)
+        record = {
+            "success_rate": success_rate,
+            "sigma": self.step.sigma,
+            "crossovers": self.crossover_selector.probabilities.tolist(),
+            "mutations": self.mutation_selector.probabilities.tolist(),
+        }
+        self.history.append(record)
+        return record
+
+
+def default_crossovers():
+    """
+    :return: List of crossovers, uniform with co_prob 0.1, 0.3 and 0.5 and one point
+    """
+    return [_uniform(0.1), _uniform(0.3), _uniform(0.5), _one_point]
+
+
+def default_mutations(pop):
+    """
+    :param pop: Population
+    :return: List of mutations mutating 1, 2 or 5 genes of each child on average, Gaussian for float genes, bit flip
+    for a BinaryPopulation, random resetting for a CharPopulation and swaps for other genes
+    """
+    n_genes = max(1, pop.n_genes)
+    probabilities = [min(1., genes / n_genes) for genes in (1, 2, 5)]
+    if isinstance(pop, genome.BinaryPopulation):
+        return [_flip(mut_prob) for mut_prob in probabilities]
+    if isinstance(pop, genome.CharPopulation):
+        return [_reset(mut_prob) for mut_prob in probabilities]
+    if np.issubdtype(pop.dtype, np.floating):
+        return [_gauss(mut_prob) for mut_prob in probabilities]
+    return [_swap(mut_prob) for mut_prob in probabilities]
+
+
+def with_step_sizes(individuals, sigma=0.1):
+    """
+    Append the step size gene of mutation.mut_self_adaptive to every individual.
+    :param individuals: List of individuals, 2-D numpy array or Population of floats
+    :param sigma: Float, initial step size
+    :return: Population with one more gene
+    """
+    genomes = population.as_population(individuals).genomes.astype(float)
+    return population.Population(np.hstack((genomes, np.full((len(genomes), 1), sigma))))
+
+
+def without_step_sizes(individuals):
+    """
+    :param individuals: 2-D numpy array or Population of individuals with a step size gene
+    :return: numpy array, view of the genome matrix without the step sizes, e.g for the fitness function
+    """
+    return population.genomes(individuals)[:, :-1]
+
+
+def _mean_rewards(n_arms, arms, rewards):
+    # Operators used in the generation and mean reward of each operator
+    counts = np.bincount(arms, minlength=n_arms)
+    totals = np.bincount(arms, weights=rewards, minlength=n_arms)
+    return counts > 0, np.divide(totals, counts, out=np.zeros(n_arms), where=counts > 0)
+
+
+def _uniform(co_prob):
+    def uniform(parents1, parents2):
+        return crossover.co_uniform(parents1, parents2, co_prob, modify_in_place=True)[0]
+    uniform.__name__ = "uniform({})".format(co_prob)
+    return uniform
+
+
+def _one_point(parents1, parents2):
+    return crossover.co_one_point(parents1, parents2)[0]
+
+
+def _gauss(mut_prob):
+    def gauss(children, sigma):
+        mut.mut_gauss(children, mut_prob, sigma=sigma)
+    gauss.__name__ = "gauss({:.3g})".format(mut_prob)
+    return gauss
+
+
+def _flip(mut_prob):
+    def flip(children, sigma):
+        mut.mut_flip(children, mut_prob)
+    flip.__name__ = "flip({:.3g})".format(mut_prob)
+    return flip
+
+
+def _reset(mut_prob):
+    def reset(children, sigma):
+        mut.mut_reset(children, mut_prob)
+    reset.__name__ = "reset({:.3g})".format(mut_prob)
+    return reset
+
+
+def _swap(mut_prob):
+    def swap(children, sigma):
+        mut.mut_swap(children, mut_prob)
+    swap.__name__ = "swap({:.3g})".format(mut_prob)
+    return swap
@@ -1,12 +1,31 @@
-import random
-
 import numpy as np
 
 from tools import crossover
+from tools import genome
+from tools import lazy as lz
+from tools import population
+from tools import rng
 from tools import selection
 
+"""
+Breeding is the process of pairing parents and crossing them to produce the children of the next generation.
+
+Every method accepts either a list of individuals or a Population. Given a Population, all parent pairs are drawn
+at once, their genomes are gathered into two parent matrices and crossed in a single vectorized crossover call.
+The children are then returned as a Population instead of a tuple of lists.
+
+Given a DoubleBuffer (see tools.population) the children are written directly into its 'next' population, block of
+rows by block of rows, using the preallocated scratch space of the buffer instead of new parent matrices.
+
+Only child1 of each pair is kept, the second child is never computed. With lazy=True the children are returned as
+LazyChildren (see tools.lazy), recording their parents and crossover until their genomes are read.
+"""
+
+# Rows of the uniform crossover mask drawn and packed at once for LazyChildren, bounding the size of the boolean mask
+_BLOCK = 1024
 
-def breed_uniform(individuals: list, parents, n_children, co_prob):
+
+def breed_uniform(individuals: list, parents, n_children, co_prob, buffer=None, return_changed=False, lazy=False):
     """
     Parents are chosen in a uniform matter to produce children for the next generation.
     Note a pair of parents produce only one child (child1).
@@ -14,18 +33,39 @@ def breed_uniform(individuals: list, parents, n_children, co_prob):
     :param parents: List of integers (index of individuals to mate)
     :param n_children: Integer
     :param co_prob: Float
-    :return: Tuple of lists
+    :param buffer: Optional DoubleBuffer receiving the children (individuals must be a Population)
+    :param return_changed: Boolean, also return for each child the index of its first parent and the genes where the
+    child differs from it
+    :return: Tuple of lists, or a Population if individuals is a Population. If return_changed, a tuple
+    (children, numpy array of first parents, changed) where changed is a list of numpy arrays of gene indexes (one per
+    child), or the (rows, genes) numpy arrays for a Population.
+    :param lazy: Boolean, return LazyChildren if individuals is a plain Population (ignored with a buffer or
+    return_changed)
     """
-    children = ()
-    sample_size = 2
-    for i in range(n_children):
-        parent1, parent2 = random.sample(parents, sample_size)
-        child1, child2 = crossover.co_uniform(individuals[parent1], individuals[parent2], co_prob)
-        children += (child1,)
-    return children
+    if population.is_population(individuals):
+        parents1, parents2 = _pair_uniform(parents, n_children)
+        if buffer is not None:
+            children = _cross_into(individuals, parents1, parents2, buffer, co_prob=co_prob,
+                                   return_changed=return_changed)
+            return (children[0], parents1, children[1]) if return_changed else children
+        if isinstance(individuals, genome.BinaryPopulation):
+            children = crossover.co_uniform(individuals.take(parents1), individuals.take(parents2), co_prob,
+                                            modify_in_place=True, return_changed=return_changed)
+            return (children[0], parents1, children[2]) if return_changed else children[0]
+        children = _cross(individuals, parents1, parents2, co_prob=co_prob, lazy=lazy, return_changed=return_changed)
+        return (children[0], parents1, children[1]) if return_changed else children
+    children, changed = [], []
+    parents1, parents2 = _pair_uniform(parents, n_children)
+    for parent1, parent2 in zip(parents1.tolist(), parents2.tolist()):
+        child = crossover.co_uniform(individuals[parent1], individuals[parent2], co_prob,
+                                     return_changed=return_changed)
+        children.append(child[0])
+        if return_changed:
+            changed.append(child[2])
+    return (tuple(children), parents1, changed) if return_changed else tuple(children)
 
 
-def breed_roulette(individuals, parents, parents_fitness, n_children, co_prob):
+def breed_roulette(individuals, parents, parents_fitness, n_children, co_prob, buffer=None, lazy=False):
     """
     Parents are chosen in a roulette fashion to produce children for the next generation.
     Note a pair of parents produce only one child (child1).
@@ -34,33 +74,80 @@ def breed_roulette(individuals, parents, parents_fitness, n_children, co_prob):
     :param parents_fitness: List of floats
     :param n_children: Integer
     :param co_prob: Float
-    :return: Tuple of lists
+    :param buffer: Optional DoubleBuffer receiving the children (individuals must be a Population)
+    :param lazy: Boolean, return LazyChildren if individuals is a plain Population (ignored with a buffer)
+    :return: Tuple of lists, or a Population if individuals is a Population
     """
-    children = ()
-    sample_size = 2
-    for i in range(n_children):
-        index = selection.sel_roulette(parents_fitness, sample_size)  # Select parent index through roulette selection
-        parent1, parent2 = parents[index[0]], parents[index[1]]
+    # Every pair of parents drawn at once through roulette selection, without replacement within a pair
+    index1, index2 = selection.WeightedSampler(parents_fitness).sample_pairs(n_children)
+    parents = np.asarray(parents, dtype=np.intp)
+    parents1, parents2 = parents[index1], parents[index2]
+    if population.is_population(individuals):
+        if buffer is not None:
+            return _cross_into(individuals, parents1, parents2, buffer, co_prob=co_prob)
+        if isinstance(individuals, genome.BinaryPopulation):
+            child1, child2 = crossover.co_uniform(individuals.take(parents1), individuals.take(parents2), co_prob,
+                                                  modify_in_place=True)
+            return child1
+        return _cross(individuals, parents1, parents2, co_prob=co_prob, lazy=lazy)
+    children = []
+    for parent1, parent2 in zip(parents1.tolist(), parents2.tolist()):
         child1, child2 = crossover.co_uniform(individuals[parent1], individuals[parent2], co_prob)
-        children += (child1,)
-    return children
+        children.append(child1)
+    return tuple(children)
 
 
-def breed_uniform_one_point(individuals, parents, n_children):
+def breed_uniform_one_point(individuals, parents, n_children, buffer=None, lazy=False):
     """
     Parents selected uniformly and uses one point crossover to produce children for the next generation.
     :param individuals: List of floats
     :param parents: List of integers (index of individuals to mate)
     :param n_children: Integer
-    :return: Tuple of lists
+    :param buffer: Optional DoubleBuffer receiving the children (individuals must be a Population)
+    :param lazy: Boolean, return LazyChildren if individuals is a plain Population (ignored with a buffer)
+    :return: Tuple of lists, or a Population if individuals is a Population
     """
-    children = ()
-    sample_size = 2
-    for i in range(n_children):
-        parent1, parent2 = random.sample(parents, sample_size)
+    if population.is_population(individuals):
+        parents1, parents2 = _pair_uniform(parents, n_children)
+        if buffer is None and isinstance(individuals, genome.BinaryPopulation):
+            child1, child2 = crossover.co_one_point(individuals.take(parents1), individuals.take(parents2))
+            return child1
+        # pick crossover point between first and last element
+        co_points = rng.get().integers(1, individuals.n_genes - 1, size=n_children)
+        if buffer is not None:
+            return _cross_into(individuals, parents1, parents2, buffer, co_points=co_points)
+        return _cross(individuals, parents1, parents2, co_points=co_points, lazy=lazy)
+    children = []
+    for parent1, parent2 in zip(*(pair.tolist() for pair in _pair_uniform(parents, n_children))):
         child1, child2 = crossover.co_one_point(individuals[parent1], individuals[parent2])
-        children += (child1,)
-    return children
+        children.append(child1)
+    return tuple(children)
+
+
+def breed_operators(individuals, parents, n_children, operators, choice, buffer=None):
+    """
+    Parents are chosen in a uniform matter as in breed_uniform, and each pair is crossed by its own crossover.
+    Note a pair of parents produce only one child (child1).
+    :param individuals: Population
+    :param parents: List of integers (index of individuals to mate)
+    :param n_children: Integer
+    :param operators: List of callables crossover(parents1, parents2) -> Population of child1 of every row pair
+    :param choice: numpy array of integers, index in operators of the crossover of each child
+    :param buffer: Optional DoubleBuffer receiving the children
+    :return: Tuple (Population of children, numpy array of the first parent of each child)
+    """
+    parents1, parents2 = _pair_uniform(parents, n_children)
+    if buffer is not None:
+        children = buffer.next if n_children == len(buffer.next) \
+            else population.Population(buffer.next.genomes[:n_children])
+        np.take(individuals.genomes, parents1, axis=0, out=children.genomes)
+    else:
+        children = individuals.take(parents1)
+    for operator in np.unique(choice).tolist():
+        rows = np.flatnonzero(choice == operator)
+        crossed = operators[operator](individuals.take(parents1[rows]), individuals.take(parents2[rows]))
+        children.genomes[rows] = population.genomes(crossed)
+    return children, parents1
 
 
 def breed_unique(individuals, parents):
@@ -72,13 +159,20 @@ def breed_unique(individuals, parents):
     """
     if len(parents) % 2 != 0:
         print("The number of parents are not even")
-    children = ()
+    if population.is_population(individuals):
+        half = len(parents) // 2
+        parents = np.asarray(parents, dtype=np.intp)
+        child1, child2 = crossover.co_uniform(individuals.take(parents[:half]),
+                                              individuals.take(parents[::-1][:half]), co_prob=0.5,
+                                              modify_in_place=True)
+        return child1
+    children = []
     for i, parent in enumerate(parents):
         if i < np.floor(len(parents) / 2):
             child1, child2 = crossover.co_uniform(individuals[parents[i]], individuals[parents[-i-1]], co_prob=0.5)
-            children += (child1,)
+            children.append(child1)
 
-    return children
+    return tuple(children)
 
 
 def breed_copy(individuals, parents):
@@ -86,9 +180,103 @@ def breed_copy(individuals, parents):
     Copy the parents
     :param individuals: List
     :param parents: List of integers (indexes)
-    :return: List
+    :return: List, or a Population if individuals is a Population
+    """
+    if population.is_population(individuals):
+        return individuals.take(parents)
+    return tuple(list(individuals[parent]) for parent in parents)
+
+
+def _pair_uniform(parents, n_children):
+    """
+    Draw 'n_children' pairs of distinct parents uniformly, same as calling random.sample(parents, 2) for each child.
+    :param parents: List of integers (index of individuals to mate)
+    :param n_children: Integer
+    :return: Two numpy arrays of indexes
+    """
+    parents = np.asarray(parents, dtype=np.intp)
+    generator = rng.get()
+    first = generator.integers(0, len(parents), size=n_children)
+    # Draw the second parent among the remaining ones and shift past the first to keep the pair distinct
+    second = generator.integers(0, len(parents) - 1, size=n_children)
+    second += second >= first
+    return parents[first], parents[second]
+
+
+def _cross(pop, parents1, parents2, co_prob=None, co_points=None, lazy=False, return_changed=False):
+    """
+    Cross the parent pairs into child1 of each pair, the second child is never built.
+    Uniform crossover if co_prob is given, otherwise one point crossover at co_points.
+    :param pop: Population holding the parents (not a BinaryPopulation)
+    :param parents1: numpy array of indexes
+    :param parents2: numpy array of indexes
+    :param co_prob: Float
+    :param co_points: numpy array with the crossover point of each pair
+    :param lazy: Boolean, return LazyChildren recording the crossover if pop supports it (see tools.lazy)
+    :param return_changed: Boolean, also return the (rows, genes) where the children differ from parents1
+    :return: Population of the children, and the changed (rows, genes) if return_changed
+    """
+    if lazy and not return_changed and lz.supports(pop):
+        if co_prob is not None:
+            return lz.LazyChildren(pop, parents1, parents2, mask=_packed_mask(len(parents1), pop.n_genes, co_prob))
+        return lz.LazyChildren(pop, parents1, parents2, co_points=co_points)
+    if co_prob is not None:
+        tail = rng.get().random((len(parents1), pop.n_genes)) < co_prob
+    else:
+        tail = np.arange(pop.n_genes) >= co_points[:, None]
+    children = pop.take(parents1)
+    other = pop.genomes[parents2]
+    changed = np.nonzero(tail & (children.genomes != other)) if return_changed else None
+    np.copyto(children.genomes, other, where=tail)
+    return (children, changed) if return_changed else children
+
+
+def _packed_mask(n_rows, n_genes, co_prob):
+    """
+    Uniform crossover mask packed along the genes (np.packbits), drawn block of rows by block of rows. The random
+    numbers are drawn in the same order as the unpacked mask of an eager crossover, hence both give the same children.
+    :return: numpy array of uint8, (n_rows, ceil(n_genes / 8))
+    """
+    mask = np.empty((n_rows, -(-n_genes // 8)), dtype=np.uint8)
+    for start in range(0, n_rows, _BLOCK):
+        stop = min(n_rows, start + _BLOCK)
+        mask[start:stop] = np.packbits(rng.get().random((stop - start, n_genes)) < co_prob, axis=1)
+    return mask
+
+
+def _cross_into(pop, parents1, parents2, buffer, co_prob=None, co_points=None, return_changed=False):
+    """
+    Cross the parent pairs and write child1 of each pair to the next population of the buffer.
+    Uniform crossover if co_prob is given, otherwise one point crossover at co_points.
+    :param pop: Population holding the parents
+    :param parents1: numpy array of indexes
+    :param parents2: numpy array of indexes
+    :param buffer: DoubleBuffer
+    :param co_prob: Float
+    :param co_points: numpy array with the crossover point of each pair
+    :param return_changed: Boolean, also return the (rows, genes) where the children differ from parents1
+    :return: Population, view of the children in buffer.next, and the changed (rows, genes) if return_changed
     """
-    children = ()
-    for parent in parents:
-        children += (list(individuals[parent]),)
+    n_children = len(parents1)
+    children = buffer.next.genomes[:n_children]
+    changed = []
+    if co_points is not None:
+        genes = np.arange(pop.n_genes)
+    for start, stop in buffer.blocks(n_children):
+        rows = children[start:stop]
+        np.take(pop.genomes, parents1[start:stop], axis=0, out=rows)
+        other = buffer.rows(stop - start)
+        np.take(pop.genomes, parents2[start:stop], axis=0, out=other)
+        if co_points is not None:
+            tail = np.greater_equal(genes, co_points[start:stop, None], out=buffer.mask(stop - start))
+        else:
+            tail = buffer.random_mask(stop - start, co_prob)
+        if return_changed:
+            block_rows, block_genes = np.nonzero(tail & (rows != other))
+            changed.append((block_rows + start, block_genes))
+        np.copyto(rows, other, where=tail)
+    children = buffer.next if n_children == len(buffer.next) else population.Population(children)
+    if return_changed:
+        return children, (np.concatenate([rows for rows, _ in changed] or [np.empty(0, dtype=np.intp)]),
+                          np.concatenate([genes for _, genes in changed] or [np.empty(0, dtype=np.intp)]))
     return children
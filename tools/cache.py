@@ -0,0 +1,191 @@
+import hashlib
+import os
+import pickle
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from tools import extra
+from tools import fitness as fit
+from tools import genome as genome_types
+from tools import population
+
+"""
+Fitness cache.
+
+Elitism and low mutation rates mean that many children of a generation are identical to a genome that has already
+been scored. The FitnessCache remembers the fitness of the most recently seen genomes so those children are not scored
+again.
+
+Genomes are identified by a stable key:
+numpy arrays: a digest of the dtype, shape and raw bytes of the array.
+compact genomes (see tools.genome): the digest of their packed bits or array of genes.
+lists, tuples and strings: the tuple of genes, hence the string "abc" and the list ['a', 'b', 'c'] share a key.
+Both kinds of keys are independent of the Python process, so a cache can be saved to disk and reused by later runs.
+"""
+
+
+def genome_key(genome):
+    """
+    Return a hashable key identifying the genes of a genome.
+    :param genome: List, tuple, string, numpy array or compact genome
+    :return: Bytes (numpy arrays and compact genomes) or tuple
+    """
+    if isinstance(genome, genome_types.BinaryGenome):
+        return genome_key(genome.packed)
+    if isinstance(genome, genome_types.ArrayGenome):
+        return genome_key(genome.genes)
+    if extra.is_numpy(genome):
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(genome.dtype.str.encode())
+        digest.update(repr(genome.shape).encode())
+        digest.update(genome.tobytes())
+        return digest.digest()
+    return tuple(genome)
+
+
+class FitnessCache:
+    """
+    Bounded mapping from genome to fitness with least recently used (LRU) eviction.
+    """
+
+    def __init__(self, maxsize: Optional[int] = 100000, path: Optional[str] = None):
+        """
+        :param maxsize: Integer, maximum number of genomes to remember. None means unbounded.
+        :param path: Optional file the cache is loaded from (if it exists) and saved to
+        """
+        self.maxsize = maxsize
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._fitness = OrderedDict()
+        if path is not None and os.path.exists(path):
+            self.load(path)
+
+    def __len__(self):
+        return len(self._fitness)
+
+    def __contains__(self, genome):
+        return genome_key(genome) in self._fitness
+
+    @property
+    def hit_rate(self):
+        """
+        :return: Float, fraction of lookups answered from the cache
+        """
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.
+
+    def get(self, genome, default=None):
+        """
+        Look up the fitness of a genome and count the hit or miss.
+        :param genome: List, string or numpy array
+        :param default: Value returned on a miss
+        :return: Fitness value or default
+        """
+        return self._get(genome_key(genome), default)
+
+    def put(self, genome, value):
+        """
+        Remember the fitness of a genome, evicting the least recently used genome if the cache is full.
+        :param genome: List, string or numpy array
+        :param value: Fitness value
+        """
+        self._put(genome_key(genome), value)
+
+    def clear(self):
+        self._fitness.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def wrap(self, fitness_function: Callable) -> Callable:
+        """
+        Return a scalar fitness function that answers from the cache and only calls fitness_function on a miss.
+        :param fitness_function: Callable, scalar fitness function
+        :return: Callable
+        """
+        def cached_fitness(genome):
+            key = genome_key(genome)
+            value = self._get(key, _MISSING)
+            if value is _MISSING:
+                value = fitness_function(genome)
+                self._put(key, value)
+            return value
+        return cached_fitness
+
+    def evaluate(self, individuals, fitness_function: Callable, batch=False, evaluator=None) -> list:
+        """
+        Evaluate the fitness of every individual, scoring only the genomes missing from the cache.
+        Identical genomes within the population are scored once.
+        :param individuals: List of individuals, 2-D numpy array or Population
+        :param fitness_function: Callable, scalar or batch fitness function (ignored if evaluator is given)
+        :param batch: Boolean, True if fitness_function scores a whole genome matrix at once
+        :param evaluator: Optional tools.fitness.Evaluator used to score the misses
+        :return: List of fitness values, index aligned with individuals
+        """
+        keys = [genome_key(individual) for individual in individuals]
+        values = [self._get(key, _MISSING) for key in keys]
+        # Index of the first occurrence of every missing genome
+        missing = {}
+        for i, value in enumerate(values):
+            if value is _MISSING:
+                missing.setdefault(keys[i], i)
+        if missing:
+            index = list(missing.values())
+            if population.is_population(individuals):
+                unknown = individuals.take(index)
+            elif extra.is_numpy(individuals):
+                unknown = individuals[index]
+            else:
+                unknown = [individuals[i] for i in index]
+            if evaluator is not None:
+                scores = evaluator.evaluate(unknown)
+            else:
+                scores = fit.evaluate(unknown, fitness_function, batch)
+            for i, score in zip(index, scores):
+                self._put(keys[i], score)
+            new = dict(zip(missing.keys(), scores))
+            values = [new[keys[i]] if value is _MISSING else value for i, value in enumerate(values)]
+        return values
+
+    def save(self, path: Optional[str] = None):
+        """
+        Write the cache to disk. The file is written next to its destination and renamed, so an interrupted save
+        never leaves a truncated cache behind.
+        :param path: Destination file, defaults to the path given at construction
+        """
+        path = path if path is not None else self.path
+        if path is None:
+            raise ValueError("No path given to save the fitness cache to")
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as file:
+            pickle.dump(list(self._fitness.items()), file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    def load(self, path: Optional[str] = None):
+        """
+        Add the genomes stored in a file written by 'save' to the cache.
+        :param path: Source file, defaults to the path given at construction
+        """
+        path = path if path is not None else self.path
+        with open(path, "rb") as file:
+            for key, value in pickle.load(file):
+                self._put(key, value)
+
+    def _get(self, key, default):
+        try:
+            value = self._fitness[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self._fitness.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def _put(self, key, value):
+        self._fitness[key] = value
+        self._fitness.move_to_end(key)
+        if self.maxsize is not None and len(self._fitness) > self.maxsize:
+            self._fitness.popitem(last=False)
+
+
+_MISSING = object()
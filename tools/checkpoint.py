@@ -0,0 +1,266 @@
+import json
+import os
+import random
+import shutil
+import uuid
+
+import numpy as np
+
+from tools import genome
+from tools import population
+from tools import rng
+
+"""
+Checkpoint and resume of a run.
+
+A checkpoint holds the full state of a run: the genome matrix, the fitness of every individual, the generation
+number, an optional archive of elite individuals and the state of the random generators (tools.rng and the random
+module), so that a resumed run draws the same random numbers as an uninterrupted one.
+
+Each checkpoint is a directory of .npy files and a small JSON file:
+genomes.npy: genome matrix (packed bits for a BinaryPopulation)
+fitness.npy: fitness values
+archive.npy, archive_fitness.npy: elite archive, if any
+state.json: generation number, population type (with the number of bits of a BinaryPopulation or the alphabet of a
+CharPopulation), random generator states and user metadata
+
+The arrays are written with np.save, i.e raw bytes without pickling, at the speed of the disk. On resume the genome
+matrices are memory mapped copy-on-write (np.load with mmap_mode='c'): opening a multi-GB population takes about as
+long as opening the file, its pages are only read from disk when the genomes are touched, and modifying the genomes
+in place never writes to the checkpoint.
+
+A checkpoint is written to a temporary directory in the same directory, synced to disk and renamed. The 'latest' file
+naming the newest checkpoint is replaced the same way, hence a run killed while saving leaves the previous checkpoint
+intact.
+
+Example:
+checkpointer = checkpoint.Checkpointer("checkpoints", every=10)
+state = checkpointer.resume()
+generation = 0
+if state is not None:
+    pop, fitness, generation = state.population, state.fitness, state.generation
+while generation < generations:
+    pop = evolve.evolve_best(pop, fitness, n_parents, mutation)
+    fitness = ...
+    generation += 1
+    checkpointer.maybe_save(generation, pop, fitness)
+"""
+
+LATEST = "latest"
+_PREFIX = "generation-"
+
+
+class Checkpoint:
+    """
+    State of a run loaded from a checkpoint.
+    """
+    __slots__ = ("population", "fitness", "generation", "archive", "archive_fitness", "metadata", "path")
+
+    def __init__(self, population, fitness, generation, archive=None, archive_fitness=None, metadata=None,
+                 path=None):
+        """
+        :param population: Population of the saved type (e.g BinaryPopulation for binary runs), genomes memory mapped
+        if loaded with mmap
+        :param fitness: List of fitness values
+        :param generation: Integer
+        :param archive: Optional Population of elite individuals
+        :param archive_fitness: Optional list of fitness values of the archive
+        :param metadata: Optional dictionary saved with the checkpoint
+        :param path: Directory of the checkpoint
+        """
+        self.population = population
+        self.fitness = fitness
+        self.generation = generation
+        self.archive = archive
+        self.archive_fitness = archive_fitness
+        self.metadata = metadata
+        self.path = path
+
+    def __repr__(self):
+        return "Checkpoint(generation={}, population={!r}, path={!r})".format(self.generation, self.population,
+                                                                              self.path)
+
+
+def save(path, individuals, fitness, generation, archive=None, archive_fitness=None, metadata=None):
+    """
+    Write a checkpoint to the directory 'path', replacing it atomically if it exists.
+    :param path: Directory of the checkpoint
+    :param individuals: List of individuals, 2-D numpy array or Population (not of Python objects)
+    :param fitness: List of fitness values
+    :param generation: Integer, generation number of the individuals
+    :param archive: Optional list of individuals, 2-D numpy array or Population, archive of elite individuals
+    :param archive_fitness: Optional list of fitness values of the archive
+    :param metadata: Optional dictionary written as JSON with the checkpoint
+    :return: path
+    """
+    path = os.path.abspath(path)
+    parent = os.path.dirname(path)
+    os.makedirs(parent, exist_ok=True)
+    pop = population.as_population(individuals)
+    state = {
+        "generation": generation,
+        "population": _kind(pop),
+        "n_bits": getattr(pop, "n_bits", None),
+        "alphabet": pop.alphabet.tolist() if isinstance(pop, genome.CharPopulation) else None,
+        "archive": archive is not None,
+        "rng": rng.get_state(),
+        "random": random.getstate(),
+        "metadata": metadata,
+    }
+    tmp_path = os.path.join(parent, ".tmp-" + uuid.uuid4().hex)
+    os.mkdir(tmp_path)
+    try:
+        _write_array(os.path.join(tmp_path, "genomes.npy"), pop.genomes)
+        _write_array(os.path.join(tmp_path, "fitness.npy"), np.asarray(fitness))
+        if archive is not None:
+            _write_array(os.path.join(tmp_path, "archive.npy"), population.as_population(archive).genomes)
+            _write_array(os.path.join(tmp_path, "archive_fitness.npy"), np.asarray(archive_fitness))
+        with open(os.path.join(tmp_path, "state.json"), "w") as file:
+            json.dump(state, file)
+            file.flush()
+            os.fsync(file.fileno())
+        if os.path.exists(path):
+            # A directory can not be renamed over a non empty one, move the old checkpoint out of the way first
+            old_path = os.path.join(parent, ".tmp-" + uuid.uuid4().hex)
+            os.replace(path, old_path)
+            os.replace(tmp_path, path)
+            shutil.rmtree(old_path, ignore_errors=True)
+        else:
+            os.replace(tmp_path, path)
+    except BaseException:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
+    _sync_directory(parent)
+    return path
+
+
+def load(path, mmap=True, restore_rng=True):
+    """
+    Load a checkpoint written by 'save'.
+    :param path: Directory of the checkpoint
+    :param mmap: Boolean, memory map the genome matrices (copy-on-write) instead of reading them into memory
+    :param restore_rng: Boolean, restore the state of tools.rng and of the random module
+    :return: Checkpoint
+    """
+    with open(os.path.join(path, "state.json")) as file:
+        state = json.load(file)
+    mmap_mode = "c" if mmap else None
+    pop = _population(np.load(os.path.join(path, "genomes.npy"), mmap_mode=mmap_mode), state)
+    fitness = np.load(os.path.join(path, "fitness.npy")).tolist()
+    archive = archive_fitness = None
+    if state["archive"]:
+        archive = _population(np.load(os.path.join(path, "archive.npy"), mmap_mode=mmap_mode), state)
+        archive_fitness = np.load(os.path.join(path, "archive_fitness.npy")).tolist()
+    if restore_rng:
+        rng.set_state(state["rng"])
+        version, internal_state, gauss_next = state["random"]
+        random.setstate((version, tuple(internal_state), gauss_next))
+    return Checkpoint(pop, fitness, state["generation"], archive, archive_fitness, state["metadata"], path)
+
+
+class Checkpointer:
+    """
+    Save a checkpoint every 'every' generations into a directory, keeping the 'keep' most recent ones.
+    """
+
+    def __init__(self, directory, every=10, keep=2):
+        """
+        :param directory: Directory holding the checkpoints
+        :param every: Integer, number of generations between checkpoints
+        :param keep: Integer, number of checkpoints kept on disk (at least 1)
+        """
+        self.directory = directory
+        self.every = every
+        self.keep = max(1, keep)
+
+    def maybe_save(self, generation, individuals, fitness, archive=None, archive_fitness=None, metadata=None):
+        """
+        Save a checkpoint if 'generation' is a multiple of 'every'.
+        :return: Directory of the checkpoint, or None if no checkpoint was saved
+        """
+        if generation % self.every != 0:
+            return None
+        return self.save(generation, individuals, fitness, archive, archive_fitness, metadata)
+
+    def save(self, generation, individuals, fitness, archive=None, archive_fitness=None, metadata=None):
+        """
+        Save a checkpoint of the given generation (see 'save'), make it the latest one and delete the oldest ones.
+        :return: Directory of the checkpoint
+        """
+        name = "{}{:09d}".format(_PREFIX, generation)
+        path = save(os.path.join(self.directory, name), individuals, fitness, generation, archive, archive_fitness,
+                    metadata)
+        latest = os.path.join(self.directory, LATEST)
+        with open(latest + ".tmp", "w") as file:
+            file.write(name)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(latest + ".tmp", latest)
+        _sync_directory(self.directory)
+        self._prune(name)
+        return path
+
+    def latest(self):
+        """
+        :return: Directory of the latest checkpoint, or None if there is none
+        """
+        try:
+            with open(os.path.join(self.directory, LATEST)) as file:
+                name = file.read().strip()
+        except FileNotFoundError:
+            return None
+        path = os.path.join(self.directory, name)
+        return path if os.path.isdir(path) else None
+
+    def resume(self, mmap=True, restore_rng=True):
+        """
+        Load the latest checkpoint (see 'load').
+        :return: Checkpoint, or None if there is no checkpoint to resume from
+        """
+        path = self.latest()
+        if path is None:
+            return None
+        return load(path, mmap, restore_rng)
+
+    def _prune(self, latest):
+        # Delete the oldest checkpoints and the leftovers of interrupted saves
+        names = sorted(name for name in os.listdir(self.directory) if name.startswith(_PREFIX) and name != latest)
+        names = names[:max(0, len(names) - (self.keep - 1))]
+        names += [name for name in os.listdir(self.directory) if name.startswith(".tmp-")]
+        for name in names:
+            shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+
+
+def _write_array(path, array):
+    # np.save without pickling, synced to disk before the checkpoint is renamed into place
+    with open(path, "wb") as file:
+        np.save(file, array, allow_pickle=False)
+        file.flush()
+        os.fsync(file.fileno())
+
+
+def _kind(pop):
+    if isinstance(pop, genome.BinaryPopulation):
+        return "binary"
+    if isinstance(pop, genome.CharPopulation):
+        return "char"
+    return "matrix"
+
+
+def _sync_directory(path):
+    # The rename is only durable once the directory entry is on disk. Directories can not be opened on Windows.
+    if os.name == "nt":
+        return
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _population(genomes, state):
+    if state["population"] == "binary":
+        return genome.BinaryPopulation(genomes, state["n_bits"])
+    if state["population"] == "char":
+        return genome.CharPopulation(genomes, np.asarray(state["alphabet"], dtype=np.uint8))
+    return population.Population(genomes)
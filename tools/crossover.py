@@ -1,6 +1,9 @@
 import numpy as np
 
 from tools import extra
+from tools import genome
+from tools import population
+from tools import rng
 
 
 """
@@ -10,10 +13,26 @@ There exists many types of crossover methods. Below two of them have been implem
 Uniform crossover is the process of swapping genes between two individuals to produce two children.
 One point crossover is the process of picking a point in each individuals genome and swapping the tail after this point 
 between them.
+
+Both methods also accept a Population (or 2-D numpy array) for each parent, in which case row i of ind1 is mated
+with row i of ind2 and all pairs are crossed in a single vectorized operation.
+
+Compact genomes (see tools.genome) keep their type: IntegerGenome and FloatGenome are crossed as numpy arrays,
+binary genomes and populations are crossed on their packed bits, 64 bits at a time.
+
+Uniform and one point crossover duplicate genes of permutations (order encoding). The permutation operators below
+always produce valid permutations:
+Order crossover (OX): keep a segment of one parent, fill in the other genes in the order of the other parent.
+Partially mapped crossover (PMX): exchange a segment and repair the other genes through the segment mapping.
+Cycle crossover (CX): take alternate cycles of positions from each parent.
+Edge recombination (ERX): build the child from the edges (adjacent genes) of both parents.
+
+They run in linear time per pair using position-index arrays (the position of every gene), except for the pointer
+doubling of CX on a Population. Given a Population all the pairs are crossed at once.
 """
 
 
-def co_uniform(ind1: list, ind2: list, co_prob=0.5, modify_in_place=False) -> tuple[list, list]:
+def co_uniform(ind1: list, ind2: list, co_prob=0.5, modify_in_place=False, return_changed=False) -> tuple:
     """
     Uniform crossover. Each individual keep their length.
     Note that this method returns two individuals.
@@ -22,15 +41,25 @@ def co_uniform(ind1: list, ind2: list, co_prob=0.5, modify_in_place=False) -> tu
     :param ind2: individual of genome 2
     :param co_prob: Double
     :param modify_in_place: Boolean
-    :return: Two Lists
+    :param return_changed: Boolean, also return the indexes of the genes changed by the crossover
+    :return: Two Lists, or (child1, child2, changed indexes) if return_changed
     """
+    if genome.is_binary(ind1) and genome.is_binary(ind2):
+        return _co_uniform_binary(ind1, ind2, co_prob, modify_in_place, return_changed)
+    if population.is_matrix(ind1) and population.is_matrix(ind2):
+        return _co_uniform_matrix(ind1, ind2, co_prob, modify_in_place, return_changed)
+    if genome.is_array_genome(ind1) and genome.is_array_genome(ind2):
+        return _co_uniform_array(ind1, ind2, co_prob, modify_in_place, return_changed)
     size = min(len(ind1), len(ind2))
-    co_ind1, co_ind2 = [], []
+    co_ind1, co_ind2, changed = [], [], []
+    swap = (rng.random(size) < co_prob).tolist()
     # Iterate over the smallest individual
     for gene in range(size):
-        if np.random.random() < co_prob:
+        if swap[gene]:
             co_ind1.append(ind2[gene])
             co_ind2.append(ind1[gene])
+            if return_changed and ind1[gene] != ind2[gene]:
+                changed.append(gene)
         else:
             co_ind1.append(ind1[gene])
             co_ind2.append(ind2[gene])
@@ -39,22 +68,39 @@ def co_uniform(ind1: list, ind2: list, co_prob=0.5, modify_in_place=False) -> tu
         # This assignment works for both numpy arrays and lists
         ind1[:size] = co_ind1
         ind2[:size] = co_ind2
-        return ind1, ind2
+        co_ind1, co_ind2 = ind1, ind2
 
+    if return_changed:
+        return co_ind1, co_ind2, np.array(changed, dtype=np.intp)
     return co_ind1, co_ind2
 
 
-def co_one_point(ind1, ind2):
+def co_one_point(ind1, ind2, return_changed=False):
     """
     One point crossover.
     Pick a position in the chromosome for both individuals and swap their genes at that position.
     Note that if len(ind1) != len(ind2) then the length of the output arrays will be interchanged.
     :param ind1: List or numpy array
     :param ind2: List or numpy array
-    :return: Lists or numpy arrays
+    :param return_changed: Boolean, also return the indexes of the genes changed by the crossover
+    :return: Lists or numpy arrays, or (child1, child2, changed indexes) if return_changed
     """
+    if genome.is_binary(ind1) and genome.is_binary(ind2):
+        return _co_one_point_binary(ind1, ind2, return_changed)
+    if population.is_matrix(ind1) and population.is_matrix(ind2):
+        return _co_one_point_matrix(ind1, ind2, return_changed)
+    if genome.is_array_genome(ind1) and genome.is_array_genome(ind2):
+        size = min(len(ind1), len(ind2))
+        co_point = int(rng.get().integers(1, size - 1))  # pick crossover point between first and last element
+        co_ind1 = type(ind1)(np.concatenate((ind1.genes[:co_point], ind2.genes[co_point:])))
+        co_ind2 = type(ind2)(np.concatenate((ind2.genes[:co_point], ind1.genes[co_point:])))
+        if return_changed:
+            return co_ind1, co_ind2, co_point + np.flatnonzero(ind1.genes[co_point:size] != ind2.genes[co_point:size])
+        return co_ind1, co_ind2
     size = min(len(ind1), len(ind2))
-    co_point = np.random.randint(1, size - 1)  # pick crossover point between first and last element
+    co_point = int(rng.get().integers(1, size - 1))  # pick crossover point between first and last element
+    if return_changed:
+        changed = np.array([i for i in range(co_point, size) if ind1[i] != ind2[i]], dtype=np.intp)
     """ 
     Since numpy arrays are fixed in size we have to convert them to lists first.
     This is necessary since individuals 1 and 2 might be of different lengths.
@@ -67,4 +113,421 @@ def co_one_point(ind1, ind2):
         co_ind1, co_ind2 = ind1[:co_point] + ind2[co_point:], ind2[:co_point] + ind1[co_point:]
         ind1, ind2 = co_ind1, co_ind2
 
+    if return_changed:
+        return ind1, ind2, changed
     return ind1, ind2
+
+
+def _co_uniform_matrix(pop1, pop2, co_prob, modify_in_place, return_changed=False):
+    """
+    Uniform crossover of every row pair of two genome matrices using a single swap mask.
+    :param pop1: Population or 2-D numpy array
+    :param pop2: Population or 2-D numpy array, same shape as pop1
+    :param co_prob: Double
+    :param modify_in_place: Boolean
+    :param return_changed: Boolean
+    :return: Two Populations (or numpy arrays if numpy arrays were given), and the (rows, genes) changed if
+    return_changed
+    """
+    genomes1, genomes2 = population.genomes(pop1), population.genomes(pop2)
+    swap = rng.get().random(genomes1.shape) < co_prob
+    changed = np.nonzero(swap & (genomes1 != genomes2)) if return_changed else None
+    co_genomes1 = np.where(swap, genomes2, genomes1)
+    co_genomes2 = np.where(swap, genomes1, genomes2)
+    if modify_in_place:
+        genomes1[...] = co_genomes1
+        genomes2[...] = co_genomes2
+        return _children(pop1, pop2, changed)
+    return _children(population.restore_type(population.Population(co_genomes1), pop1),
+                     population.restore_type(population.Population(co_genomes2), pop2), changed)
+
+
+def _co_one_point_matrix(pop1, pop2, return_changed=False):
+    """
+    One point crossover of every row pair of two genome matrices, each pair with its own crossover point.
+    :param pop1: Population or 2-D numpy array
+    :param pop2: Population or 2-D numpy array, same shape as pop1
+    :param return_changed: Boolean
+    :return: Two Populations (or numpy arrays if numpy arrays were given), and the (rows, genes) changed if
+    return_changed
+    """
+    genomes1, genomes2 = population.genomes(pop1), population.genomes(pop2)
+    n_pairs, size = genomes1.shape
+    co_points = rng.get().integers(1, size - 1, size=n_pairs)  # pick crossover point between first and last element
+    head = np.arange(size) < co_points[:, None]
+    co_genomes1 = np.where(head, genomes1, genomes2)
+    co_genomes2 = np.where(head, genomes2, genomes1)
+    changed = np.nonzero(~head & (genomes1 != genomes2)) if return_changed else None
+    return _children(population.restore_type(population.Population(co_genomes1), pop1),
+                     population.restore_type(population.Population(co_genomes2), pop2), changed)
+
+
+def _co_uniform_array(ind1, ind2, co_prob, modify_in_place, return_changed=False):
+    """
+    Uniform crossover of two IntegerGenome or FloatGenome, swapping the masked genes of the shortest length.
+    :return: Two genomes of the types of ind1 and ind2, and the changed indexes if return_changed
+    """
+    size = min(len(ind1), len(ind2))
+    genes1, genes2 = ind1.genes[:size], ind2.genes[:size]
+    swap = rng.random(size) < co_prob
+    changed = np.flatnonzero(swap & (genes1 != genes2)) if return_changed else None
+    co_genes1, co_genes2 = np.where(swap, genes2, genes1), np.where(swap, genes1, genes2)
+    if modify_in_place:
+        genes1[...] = co_genes1
+        genes2[...] = co_genes2
+        return _children(ind1, ind2, changed)
+    return _children(type(ind1)(np.concatenate((co_genes1, ind1.genes[size:]))),
+                     type(ind2)(np.concatenate((co_genes2, ind2.genes[size:]))), changed)
+
+
+def _co_uniform_binary(ind1, ind2, co_prob, modify_in_place, return_changed=False):
+    """
+    Uniform crossover of two BinaryGenome or two BinaryPopulation. The bits to swap are drawn as a packed mask and
+    swapped 64 at a time with XOR on the 64 bit words.
+    :return: Two BinaryGenome or two BinaryPopulation, and the changed bits if return_changed
+    """
+    words1, words2 = ind1.words, ind2.words
+    mask = genome.random_bits(ind1.bit_shape, co_prob).view(np.uint64)
+    # Bits that differ between the parents and must be swapped
+    swap = (words1 ^ words2) & mask
+    changed = _changed_bits(swap, ind1.n_bits) if return_changed else None
+    if modify_in_place:
+        words1 ^= swap
+        words2 ^= swap
+        return _children(ind1, ind2, changed)
+    return _children(ind1.with_packed((words1 ^ swap).view(np.uint8)),
+                     ind2.with_packed((words2 ^ swap).view(np.uint8)), changed)
+
+
+def _co_one_point_binary(ind1, ind2, return_changed=False):
+    """
+    One point crossover of two BinaryGenome or two BinaryPopulation, with one crossover point per pair.
+    :return: Two BinaryGenome or two BinaryPopulation, and the changed bits if return_changed
+    """
+    shape = ind1.bit_shape
+    n_bits = shape[-1]
+    # pick crossover point between first and last element
+    co_points = rng.get().integers(1, n_bits - 1, size=shape[:-1] + (1,))
+    head = genome.pack_bits(np.arange(n_bits) < co_points).view(np.uint64)
+    words1, words2 = ind1.words, ind2.words
+    changed = _changed_bits((words1 ^ words2) & ~head, n_bits) if return_changed else None
+    return _children(ind1.with_packed(((words1 & head) | (words2 & ~head)).view(np.uint8)),
+                     ind2.with_packed(((words2 & head) | (words1 & ~head)).view(np.uint8)), changed)
+
+
+def _changed_bits(words, n_bits):
+    # Indexes of the bits set in packed 64 bit words, (rows, bits) for 2-D words
+    bits = genome.unpack_bits(words.view(np.uint8), n_bits)
+    return np.nonzero(bits) if bits.ndim == 2 else np.flatnonzero(bits)
+
+
+def _children(child1, child2, changed):
+    # The two children, followed by the changed indexes when they were asked for
+    if changed is None:
+        return child1, child2
+    return child1, child2, changed
+
+
+
+def co_order(ind1, ind2):
+    """
+    Order crossover (OX) of two permutations.
+    Each child keeps a random segment of one parent and gets the remaining genes in the order they appear in the other
+    parent, starting after the segment.
+    :param ind1: List, numpy array, IntegerGenome or Population (batch of permutations, row i mated with row i of ind2)
+    :param ind2: Same type and length as ind1
+    :return: Two permutations of the type of ind1 and ind2
+    """
+    if population.is_matrix(ind1) and population.is_matrix(ind2):
+        return _permutation_matrix(ind1, ind2, _co_order_codes)
+    if extra.is_numpy(ind1) or genome.is_array_genome(ind1):
+        return _permutation_single(ind1, ind2, _co_order_codes)
+    size = len(ind1)
+    start, stop = _segment(size)
+    return _order_child(ind1, ind2, start, stop), _order_child(ind2, ind1, start, stop)
+
+
+def co_pmx(ind1, ind2):
+    """
+    Partially mapped crossover (PMX) of two permutations.
+    A random segment is exchanged between the parents, the genes outside the segment are kept where possible and
+    otherwise replaced through the mapping defined by the segment.
+    :param ind1: List, numpy array, IntegerGenome or Population (batch of permutations, row i mated with row i of ind2)
+    :param ind2: Same type and length as ind1
+    :return: Two permutations of the type of ind1 and ind2
+    """
+    if population.is_matrix(ind1) and population.is_matrix(ind2):
+        return _permutation_matrix(ind1, ind2, _co_pmx_codes)
+    if extra.is_numpy(ind1) or genome.is_array_genome(ind1):
+        return _permutation_single(ind1, ind2, _co_pmx_codes)
+    size = len(ind1)
+    start, stop = _segment(size)
+    return _pmx_child(ind1, ind2, start, stop), _pmx_child(ind2, ind1, start, stop)
+
+
+def co_cycle(ind1, ind2):
+    """
+    Cycle crossover (CX) of two permutations.
+    The positions are split in the cycles of the parents, the children take every other cycle from each parent,
+    hence every gene keeps the position it has in one of the parents.
+    :param ind1: List, numpy array, IntegerGenome or Population (batch of permutations, row i mated with row i of ind2)
+    :param ind2: Same type and length as ind1
+    :return: Two permutations of the type of ind1 and ind2
+    """
+    if population.is_matrix(ind1) and population.is_matrix(ind2):
+        return _permutation_matrix(ind1, ind2, _co_cycle_codes)
+    if extra.is_numpy(ind1) or genome.is_array_genome(ind1):
+        return _permutation_single(ind1, ind2, _co_cycle_codes)
+    position = {gene: i for i, gene in enumerate(ind1)}
+    co_ind1, co_ind2 = list(ind1), list(ind2)
+    visited = [False] * len(ind1)
+    cycle = 0
+    for start in range(len(ind1)):
+        if visited[start]:
+            continue
+        i = start
+        while not visited[i]:
+            visited[i] = True
+            if cycle % 2:
+                co_ind1[i], co_ind2[i] = ind2[i], ind1[i]
+            i = position[ind2[i]]
+        cycle += 1
+    return co_ind1, co_ind2
+
+
+def co_edge(ind1, ind2):
+    """
+    Edge recombination crossover (ERX) of two permutations, read as tours (the last gene is adjacent to the first).
+    The children are built gene by gene, each time moving to the neighbour (in either parent) with the fewest
+    remaining neighbours, hence most of the edges of the children come from the parents.
+    The first child starts from the first gene of ind1, the second child from the first gene of ind2.
+    :param ind1: List, numpy array, IntegerGenome or Population (batch of permutations, row i mated with row i of ind2)
+    :param ind2: Same type and length as ind1
+    :return: Two permutations of the type of ind1 and ind2
+    """
+    if population.is_matrix(ind1) and population.is_matrix(ind2):
+        return _permutation_matrix(ind1, ind2, _co_edge_codes)
+    if extra.is_numpy(ind1) or genome.is_array_genome(ind1):
+        return _permutation_single(ind1, ind2, _co_edge_codes)
+    return _edge_child(ind1, ind2), _edge_child(ind2, ind1)
+
+
+def _segment(size):
+    """
+    :param size: Integer, length of the permutation
+    :return: start and stop (exclusive) of a random non empty segment
+    """
+    start, stop, _ = _segments(1, size)
+    return int(start[0]), int(stop[0])
+
+
+def _order_child(ind1, ind2, start, stop):
+    # Segment of ind1, then the other genes in the order of ind2 starting after the segment
+    size = len(ind1)
+    kept = set(ind1[start:stop])
+    fill = [gene for gene in (ind2[(stop + i) % size] for i in range(size)) if gene not in kept]
+    child = [None] * size
+    child[start:stop] = ind1[start:stop]
+    for i, gene in enumerate(fill):
+        child[(stop + i) % size] = gene
+    return child
+
+
+def _pmx_child(ind1, ind2, start, stop):
+    # Start from ind2 and move each gene of the segment of ind1 into place by swapping
+    child = list(ind2)
+    position = {gene: i for i, gene in enumerate(child)}
+    for i in range(start, stop):
+        gene, other = ind1[i], child[i]
+        j = position[gene]
+        child[i], child[j] = gene, other
+        position[gene], position[other] = i, j
+    return child
+
+
+def _edge_child(ind1, ind2):
+    size = len(ind1)
+    neighbours = {gene: set() for gene in ind1}
+    for parent in (ind1, ind2):
+        for i, gene in enumerate(parent):
+            neighbours[gene].update((parent[i - 1], parent[(i + 1) % size]))
+    # Genes not placed yet, swap removal keeps the random pick and the removal O(1)
+    remaining = list(ind1)
+    index = {gene: i for i, gene in enumerate(remaining)}
+    generator = rng.get()
+    child = []
+    gene = ind1[0]
+    while True:
+        child.append(gene)
+        last = remaining.pop()
+        if last != gene:
+            remaining[index[gene]] = last
+            index[last] = index[gene]
+        if not remaining:
+            return child
+        for neighbour in neighbours[gene]:
+            neighbours[neighbour].discard(gene)
+        candidates = neighbours.pop(gene)
+        if candidates:
+            fewest = min(len(neighbours[candidate]) for candidate in candidates)
+            candidates = [candidate for candidate in candidates if len(neighbours[candidate]) == fewest]
+            gene = candidates[int(generator.integers(len(candidates)))]
+        else:
+            gene = remaining[int(generator.integers(len(remaining)))]
+
+
+def _permutation_single(ind1, ind2, operator):
+    """
+    Cross two permutations given as 1-D numpy arrays or IntegerGenome with the batch operator.
+    """
+    genes1 = ind1.genes if genome.is_array_genome(ind1) else ind1
+    genes2 = ind2.genes if genome.is_array_genome(ind2) else ind2
+    co_genes1, co_genes2 = _permutation_matrix(genes1[None], genes2[None], operator)
+    co_ind1 = type(ind1)(co_genes1[0]) if genome.is_array_genome(ind1) else co_genes1[0]
+    co_ind2 = type(ind2)(co_genes2[0]) if genome.is_array_genome(ind2) else co_genes2[0]
+    return co_ind1, co_ind2
+
+
+def _permutation_matrix(pop1, pop2, operator):
+    """
+    Cross every row pair of two genome matrices of permutations.
+    The genes are first replaced with their rank among the genes of a row, i.e every row becomes a permutation of
+    0..n-1 (nothing to do if the genes already are), so that the operators can index arrays with the genes.
+    Every row must be a permutation of the same genes.
+    :param pop1: Population or 2-D numpy array
+    :param pop2: Population or 2-D numpy array, same shape as pop1
+    :param operator: Callable operator(codes1, codes2) -> (codes1, codes2) crossing 2-D arrays of codes
+    :return: Two Populations (or numpy arrays if numpy arrays were given)
+    """
+    genomes1, genomes2 = population.genomes(pop1), population.genomes(pop2)
+    size = genomes1.shape[1]
+    genes = np.sort(genomes1[0])
+    if np.issubdtype(genes.dtype, np.integer) and size and genes[0] == 0 and genes[-1] == size - 1:
+        co_genomes1, co_genomes2 = operator(genomes1.astype(np.intp), genomes2.astype(np.intp))
+        co_genomes1, co_genomes2 = co_genomes1.astype(genes.dtype), co_genomes2.astype(genes.dtype)
+    else:
+        co_genomes1, co_genomes2 = operator(np.searchsorted(genes, genomes1), np.searchsorted(genes, genomes2))
+        co_genomes1, co_genomes2 = genes[co_genomes1], genes[co_genomes2]
+    return population.restore_type(population.Population(co_genomes1), pop1), \
+        population.restore_type(population.Population(co_genomes2), pop2)
+
+
+def _segments(n_pairs, size):
+    """
+    :return: start, stop (exclusive) and mask of a random non empty segment per row
+    """
+    generator = rng.get()
+    start = generator.integers(0, size, size=n_pairs)
+    stop = generator.integers(0, size, size=n_pairs)
+    start, stop = np.minimum(start, stop), np.maximum(start, stop) + 1
+    genes = np.arange(size)
+    return start, stop, (start[:, None] <= genes) & (genes < stop[:, None])
+
+
+def _inverse(codes):
+    # Position of each code in its row
+    positions = np.empty_like(codes)
+    np.put_along_axis(positions, codes, np.broadcast_to(np.arange(codes.shape[1]), codes.shape), axis=1)
+    return positions
+
+
+def _co_order_codes(codes1, codes2):
+    n_pairs, size = codes1.shape
+    start, stop, segment = _segments(n_pairs, size)
+    # Positions starting after the segment, the first size - (stop - start) of them are outside the segment
+    rotation = (stop[:, None] + np.arange(size)) % size
+
+    def child(parent1, parent2):
+        kept = np.zeros(parent1.shape, dtype=bool)
+        np.put_along_axis(kept, parent1, segment, axis=1)
+        order = np.take_along_axis(parent2, rotation, axis=1)
+        # Stable sort moves the genes missing from the segment to the front, in the order of parent2
+        missing = np.argsort(np.take_along_axis(kept, order, axis=1), axis=1, kind="stable")
+        co_codes = np.empty_like(parent1)
+        np.put_along_axis(co_codes, rotation, np.take_along_axis(order, missing, axis=1), axis=1)
+        return np.where(segment, parent1, co_codes)
+
+    return child(codes1, codes2), child(codes2, codes1)
+
+
+def _co_pmx_codes(codes1, codes2):
+    n_pairs, size = codes1.shape
+    start, stop, segment = _segments(n_pairs, size)
+    rows = np.arange(n_pairs)
+
+    def child(parent1, parent2):
+        co_codes = parent2.copy()
+        positions = _inverse(co_codes)
+        # Swap each gene of the segment of parent1 into place, one column at a time for all the rows
+        for i in range(int(start.min()), int(stop.max())):
+            active = rows[segment[:, i]]
+            gene, other = parent1[active, i], co_codes[active, i]
+            j = positions[active, gene]
+            co_codes[active, i], co_codes[active, j] = gene, other
+            positions[active, gene], positions[active, other] = i, j
+        return co_codes
+
+    return child(codes1, codes2), child(codes2, codes1)
+
+
+def _co_cycle_codes(codes1, codes2):
+    n_pairs, size = codes1.shape
+    # Position i is followed in its cycle by the position in parent1 of the gene of parent2 at i
+    following = np.take_along_axis(_inverse(codes1), codes2, axis=1)
+    # Label each position with the first position of its cycle by pointer doubling, log2(size) steps
+    first = np.broadcast_to(np.arange(size), codes1.shape).copy()
+    for _ in range(max(1, int(np.ceil(np.log2(max(size, 1)))))):
+        first = np.minimum(first, np.take_along_axis(first, following, axis=1))
+        following = np.take_along_axis(following, following, axis=1)
+    # Number the cycles in order of their first position, odd cycles are swapped
+    starts = np.cumsum(first == np.arange(size), axis=1) - 1
+    swap = np.take_along_axis(starts, first, axis=1) % 2 == 1
+    return np.where(swap, codes2, codes1), np.where(swap, codes1, codes2)
+
+
+def _co_edge_codes(codes1, codes2):
+    n_pairs, size = codes1.shape
+    rows = np.arange(n_pairs)
+    # Neighbours of each gene in both parents, -1 marks a duplicated or removed neighbour
+    neighbours = np.empty((n_pairs, size, 4), dtype=np.intp)
+    for k, (parent, shift) in enumerate(((codes1, 1), (codes1, -1), (codes2, 1), (codes2, -1))):
+        neighbours[rows[:, None], parent, k] = np.roll(parent, shift, axis=1)
+    for k in range(1, 4):
+        duplicate = (neighbours[:, :, :k] == neighbours[:, :, k:k + 1]).any(axis=2)
+        neighbours[:, :, k][duplicate] = -1
+    counts = np.count_nonzero(neighbours >= 0, axis=2)
+    generator = rng.get()
+
+    def child(parent, neighbours, counts):
+        co_codes = np.empty_like(parent)
+        # Genes not placed yet, swap removal keeps the random pick and the removal O(1)
+        remaining = np.broadcast_to(np.arange(size), parent.shape).copy()
+        index = remaining.copy()
+        gene = parent[:, 0].copy()
+        for i in range(size):
+            co_codes[:, i] = gene
+            last = remaining[rows, size - 1 - i]
+            remaining[rows, index[rows, gene]] = last
+            index[rows, last] = index[rows, gene]
+            if i == size - 1:
+                break
+            # Remove the gene from the lists of its neighbours
+            candidates = neighbours[rows, gene]
+            for k in range(4):
+                valid = rows[candidates[:, k] >= 0]
+                lists = neighbours[valid, candidates[valid, k]]
+                found = lists == gene[valid, None]
+                lists[found] = -1
+                neighbours[valid, candidates[valid, k]] = lists
+                counts[valid, candidates[valid, k]] -= found.any(axis=1)
+            # Move to the neighbour with the fewest neighbours left (ties broken at random), else to a random gene
+            keys = np.where(candidates >= 0, counts[rows[:, None], np.maximum(candidates, 0)], size)
+            keys = keys + generator.random(keys.shape)
+            best = np.argmin(keys, axis=1)
+            stuck = candidates[rows, best] < 0
+            gene = candidates[rows, best]
+            picks = (generator.random(n_pairs) * (size - 1 - i)).astype(np.intp)
+            gene[stuck] = remaining[rows[stuck], picks[stuck]]
+        return co_codes
+
+    return child(codes1, neighbours.copy(), counts.copy()), child(codes2, neighbours, counts)
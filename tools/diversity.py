@@ -0,0 +1,229 @@
+from collections import OrderedDict
+from typing import Callable, Optional
+
+import numpy as np
+
+from tools import cache
+from tools import genome
+from tools import mutation as mut
+from tools import population
+from tools import rng
+
+"""
+Genotype diversity and duplicate elimination.
+
+Breeding from a few parents quickly fills the population with copies of the same genomes: the duplicates cost fitness
+evaluations without exploring anything and the population converges prematurely.
+
+Diversity measures, computed on the genome matrix without comparing every pair of individuals:
+centroid_distance: mean distance of the individuals to the centroid of the population, the Euclidean distance to the
+mean genome for float genomes and the Hamming distance to the majority genome (most frequent value of every gene)
+otherwise, O(n m) for floats and bits, O(n m log n) for other genes.
+pairwise_distance: mean distance between two individuals. Exact for discrete genomes, from the number of individuals
+sharing each value of each gene, and estimated from a sample of random pairs for float genomes or on request.
+
+A GenomeIndex is a hash set of genomes (keyed as by the fitness cache, see tools.cache.genome_key), telling in O(1)
+if a genome was seen before. 'eliminate_duplicates' uses it to re-mutate the children that duplicate another child or
+a genome of the index before they are scored. The evolve_* strategies run it as their 'deduplicate' stage when given
+an index:
+
+unique = diversity.GenomeIndex(maxsize=10 * len(individuals))
+individuals = evolve.evolve_best(individuals, fitness, n_parents, mutation, unique=unique)
+"""
+
+# Rows processed at once by the float distances, bounding the size of the temporary matrices
+_BLOCK = 1024
+
+
+def centroid_distance(individuals):
+    """
+    Mean distance of the individuals to the centroid of the population: the Euclidean distance to the mean genome for
+    float genomes, the Hamming distance to the majority genome for binary, integer or character genomes.
+    :param individuals: List of individuals, 2-D numpy array or Population
+    :return: Float, 0 if every individual is the centroid
+    """
+    pop = population.as_population(individuals)
+    n = len(pop)
+    if n == 0:
+        return 0.
+    if isinstance(pop, genome.BinaryPopulation):
+        ones = _bit_counts(pop)
+        return float(np.minimum(ones, n - ones).sum() / n)
+    genomes = pop.genomes
+    if _is_float(genomes):
+        centroid = genomes.mean(axis=0)
+        total = 0.
+        for start in range(0, n, _BLOCK):
+            total += np.sqrt(((genomes[start:start + _BLOCK] - centroid) ** 2).sum(axis=1)).sum()
+        return float(total / n)
+    max_counts, _ = _gene_counts(genomes)
+    return float((n - max_counts).sum() / n)
+
+
+def pairwise_distance(individuals, n_pairs: Optional[int] = None):
+    """
+    Mean distance between two distinct individuals, Hamming for discrete genomes and Euclidean for float genomes.
+    For discrete genomes the exact mean is computed from the counts of the values of every gene, unless n_pairs is
+    given. For float genomes it is estimated from n_pairs random pairs (1024 by default).
+    :param individuals: List of individuals, 2-D numpy array or Population
+    :param n_pairs: Optional integer, number of random pairs of the estimate
+    :return: Float
+    """
+    pop = population.as_population(individuals)
+    n = len(pop)
+    if n < 2:
+        return 0.
+    binary = isinstance(pop, genome.BinaryPopulation)
+    if n_pairs is None and binary:
+        ones = _bit_counts(pop)
+        return float((2 * ones * (n - ones)).sum() / (n * (n - 1)))
+    if n_pairs is None and not _is_float(pop.genomes):
+        _, squared_counts = _gene_counts(pop.genomes)
+        return float((n * n - squared_counts).sum() / (n * (n - 1)))
+    n_pairs = 1024 if n_pairs is None else n_pairs
+    generator = rng.get()
+    first = generator.integers(0, n, size=n_pairs)
+    # An offset in [1, n) makes the second individual of a pair different from the first
+    second = (first + generator.integers(1, n, size=n_pairs)) % n
+    total = 0.
+    for start in range(0, n_pairs, _BLOCK):
+        rows1 = pop.genomes[first[start:start + _BLOCK]]
+        rows2 = pop.genomes[second[start:start + _BLOCK]]
+        if binary:
+            total += np.bitwise_count(rows1 ^ rows2).sum(dtype=np.int64)
+        elif _is_float(rows1):
+            total += np.sqrt(((rows1 - rows2) ** 2).sum(axis=1)).sum()
+        else:
+            total += np.count_nonzero(rows1 != rows2)
+    return float(total / n_pairs)
+
+
+class GenomeIndex:
+    """
+    Hash set of genomes, optionally bounded with least recently used (LRU) eviction.
+    """
+
+    def __init__(self, individuals=None, maxsize: Optional[int] = None):
+        """
+        :param individuals: Optional list of individuals, 2-D numpy array or Population added to the index
+        :param maxsize: Integer, maximum number of genomes to remember. None means unbounded.
+        """
+        self.maxsize = maxsize
+        self._keys = OrderedDict()
+        if individuals is not None:
+            self.add_rows(individuals)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, genome):
+        return cache.genome_key(genome) in self._keys
+
+    def add(self, genome):
+        """
+        :param genome: List, string, numpy array or compact genome
+        :return: Boolean, True if the genome was not in the index
+        """
+        return self._add(cache.genome_key(genome))
+
+    def add_rows(self, individuals):
+        """
+        Add every individual to the index.
+        :param individuals: List of individuals, 2-D numpy array or Population
+        :return: numpy array of booleans, False for the individuals already in the index or equal to a previous
+        individual of 'individuals'
+        """
+        rows = individuals.genomes if population.is_population(individuals) else individuals
+        return np.fromiter((self._add(cache.genome_key(row)) for row in rows), dtype=bool, count=len(rows))
+
+    def discard(self, genome):
+        """
+        Remove a genome from the index if it is there.
+        :param genome: List, string, numpy array or compact genome
+        """
+        self._keys.pop(cache.genome_key(genome), None)
+
+    def clear(self):
+        self._keys.clear()
+
+    def _add(self, key):
+        if key in self._keys:
+            self._keys.move_to_end(key)
+            return False
+        self._keys[key] = None
+        if self.maxsize is not None and len(self._keys) > self.maxsize:
+            self._keys.popitem(last=False)
+        return True
+
+
+def eliminate_duplicates(children, index: Optional[GenomeIndex] = None, start=0, mutation: Optional[Callable] = None,
+                         max_attempts=5):
+    """
+    Re-mutate the children equal to another child or to a genome of the index, until they are unique or after
+    max_attempts mutations. The children are added to the index.
+    :param children: Population or 2-D numpy array (modified in place)
+    :param index: Optional GenomeIndex of the genomes to avoid, e.g those of previous generations. None only removes
+    the duplicates within the children.
+    :param start: Integer, the rows before start are added to the index unchanged, e.g the elite
+    :param mutation: Optional callable mutating a child in place, called with the child's row of the genome matrix.
+    Defaults to mutation.mut_default (e.g Gaussian for float genes, bit flip for binary genes, swaps for permutations)
+    of about two genes per child.
+    :param max_attempts: Integer, maximum number of mutations of a duplicate
+    :return: Integer, number of children still duplicated
+    """
+    pop = population.as_population(children)
+    index = GenomeIndex() if index is None else index
+    index.add_rows(pop.genomes[:start])
+    duplicates = np.flatnonzero(~index.add_rows(pop.genomes[start:])) + start
+    for _ in range(max_attempts):
+        if not len(duplicates):
+            break
+        _remutate(pop, duplicates, mutation)
+        duplicates = duplicates[~index.add_rows(pop.genomes[duplicates])]
+    return len(duplicates)
+
+
+def _remutate(pop, rows, mutation):
+    """
+    Mutate the rows 'rows' of the population in place.
+    """
+    if mutation is not None:
+        for row in rows:
+            mutation(pop[row])
+        return
+    duplicates = pop.take(rows)
+    mut.mut_default(duplicates, max(0.01, 2 / max(1, pop.n_genes)))
+    pop.genomes[rows] = duplicates.genomes
+
+
+def _is_float(genomes):
+    return np.issubdtype(genomes.dtype, np.floating)
+
+
+def _bit_counts(pop):
+    """
+    :return: numpy array, number of individuals with each bit set
+    """
+    ones = np.zeros(pop.n_bits, dtype=np.int64)
+    for start in range(0, len(pop), _BLOCK):
+        ones += genome.unpack_bits(pop.genomes[start:start + _BLOCK], pop.n_bits).sum(axis=0, dtype=np.int64)
+    return ones
+
+
+def _gene_counts(genomes):
+    """
+    Count the individuals sharing each value of each gene, by sorting every column.
+    :return: Tuple of numpy arrays, the largest count and the sum of the squared counts of every gene
+    """
+    n = len(genomes)
+    ordered = np.sort(genomes, axis=0)
+    new_value = np.ones(ordered.shape, dtype=bool)
+    new_value[1:] = ordered[1:] != ordered[:-1]
+    # Length of the run of equal values up to each row
+    rows = np.arange(n)[:, None]
+    run = rows - np.maximum.accumulate(np.where(new_value, rows, 0), axis=0) + 1
+    # The count of a value is the length of its run at its last row
+    last = np.ones(ordered.shape, dtype=bool)
+    last[:-1] = new_value[1:]
+    counts = np.where(last, run, 0)
+    return counts.max(axis=0), (counts.astype(np.int64) ** 2).sum(axis=0)
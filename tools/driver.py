@@ -0,0 +1,285 @@
+import asyncio
+import time
+from typing import Callable
+
+import numpy as np
+
+from tools import fitness as fit
+
+"""
+Generational driver.
+
+'iterate' runs the evolve loop around any evolve_* strategy and yields a Snapshot after every generation, so the
+caller decides what to do with it (log it, plot it, stop early) instead of writing the loop by hand:
+
+for snapshot in driver.iterate(individuals, fitness_function, evolve.evolve_best, (n_parents, mutation),
+                               stop=[driver.target_fitness(1.), driver.stagnation(50)]):
+    if snapshot.improved:
+        print(snapshot.generation, snapshot.best_fitness)
+
+'run' consumes the generator and returns the last snapshot, 'aiterate' and 'arun' are their asyncio counterparts:
+the evolve steps run in a worker thread so the event loop keeps serving other tasks, and coroutine fitness functions
+are awaited in the event loop with bounded concurrency (see tools.fitness.AsyncEvaluator).
+
+The best individual found so far is tracked incrementally: every generation the fitness list is scanned once for its
+maximum, and the best individual is only copied when it improves on the best so far. NaN fitness values (e.g failed
+evaluations) count as -inf. With a tools.surrogate.Surrogate as evaluator the fitness values it predicted (see
+Surrogate.estimated) are left out, so the best so far and the target_fitness policy only see true fitness values.
+
+Termination policies are callables policy(snapshot) -> Boolean, the loop stops after the first snapshot for which a
+policy returns True and snapshot.stop_reason names it:
+target_fitness: the best fitness reached a target.
+stagnation: the best fitness did not improve for a number of generations.
+time_budget: the wall clock time exceeded a budget.
+evaluation_budget: the number of fitness evaluations exceeded a budget (only the true evaluations with a
+tools.surrogate.Surrogate as evaluator).
+max_generations: a number of generations was reached.
+"""
+
+
+class Snapshot:
+    """
+    State of the run after a generation. The population and fitness are references, not copies, they are replaced by
+    the next generation.
+    """
+    __slots__ = ("generation", "population", "fitness", "generation_best", "best", "best_fitness", "improved",
+                 "last_improvement", "evaluations", "seconds", "stop_reason")
+
+    def __init__(self, generation, population, fitness, generation_best, best, best_fitness, improved,
+                 last_improvement, evaluations, seconds):
+        """
+        :param generation: Integer, 0 for the initial population
+        :param population: Individuals of the generation, of the type passed to 'iterate'
+        :param fitness: List of fitness values of the generation
+        :param generation_best: Float, best fitness of this generation (NaN values count as -inf, predicted values are
+        left out)
+        :param best: Copy of the best individual found so far
+        :param best_fitness: Float, fitness of 'best'
+        :param improved: Boolean, True if this generation improved on the best so far
+        :param last_improvement: Integer, generation of the best individual so far
+        :param evaluations: Integer, number of fitness evaluations so far
+        :param seconds: Float, wall clock time since the start of the run
+        """
+        self.generation = generation
+        self.population = population
+        self.fitness = fitness
+        self.generation_best = generation_best
+        self.best = best
+        self.best_fitness = best_fitness
+        self.improved = improved
+        self.last_improvement = last_improvement
+        self.evaluations = evaluations
+        self.seconds = seconds
+        self.stop_reason = None
+
+    def __repr__(self):
+        return "Snapshot(generation={}, best_fitness={}, evaluations={}, seconds={:.3f})".format(
+            self.generation, self.best_fitness, self.evaluations, self.seconds)
+
+
+def iterate(individuals, fitness_function: Callable, strategy: Callable, strategy_args=(), stop=(), fitness=None,
+            batch=False, evaluator=None, generation=0, checkpointer=None):
+    """
+    Evolve the individuals generation after generation, yielding a Snapshot after each one.
+    Without a stop policy the generator never ends.
+    :param individuals: List of individuals, 2-D numpy array or Population of the first generation
+    :param fitness_function: Callable, scalar, batch or coroutine fitness function (see tools.fitness)
+    :param strategy: Callable, an evolve_* function called as strategy(individuals, fitness, *strategy_args)
+    :param strategy_args: Tuple of the remaining arguments of strategy, e.g (n_parents, mutation) for evolve_best
+    :param stop: List of termination policies, callables policy(snapshot) -> Boolean
+    :param fitness: Optional list of fitness values of individuals, e.g when resuming from a checkpoint
+    :param batch: Boolean, True if fitness_function scores a whole genome matrix at once
+    :param evaluator: Optional object with an evaluate(individuals) method, e.g a tools.fitness.Evaluator or a
+    tools.surrogate.Surrogate, used instead of fitness_function
+    :param generation: Integer, number of the first generation, e.g when resuming from a checkpoint
+    :param checkpointer: Optional tools.checkpoint.Checkpointer saving the generations
+    :return: Generator of Snapshot
+    """
+    def evaluate(individuals):
+        if evaluator is not None:
+            return evaluator.evaluate(individuals)
+        return fit.evaluate(individuals, fitness_function, batch)
+
+    tracker = _Tracker(stop, generation, checkpointer)
+    if fitness is None:
+        fitness = tracker.evaluated(evaluate(individuals), evaluator)
+    while True:
+        snapshot = tracker.observe(individuals, fitness)
+        yield snapshot
+        if snapshot.stop_reason is not None:
+            return
+        individuals = strategy(individuals, fitness, *strategy_args)
+        fitness = tracker.evaluated(evaluate(individuals), evaluator)
+
+
+def run(individuals, fitness_function: Callable, strategy: Callable, strategy_args=(), stop=(), **kwargs):
+    """
+    Evolve the individuals until a termination policy stops the run, see 'iterate' for the arguments.
+    :return: Snapshot of the last generation
+    """
+    if not stop:
+        raise ValueError("run needs at least one termination policy")
+    snapshot = None
+    for snapshot in iterate(individuals, fitness_function, strategy, strategy_args, stop, **kwargs):
+        pass
+    return snapshot
+
+
+async def aiterate(individuals, fitness_function: Callable, strategy: Callable, strategy_args=(), stop=(),
+                   fitness=None, batch=False, evaluator=None, generation=0, checkpointer=None):
+    """
+    Asynchronous version of 'iterate'. The evolve step and synchronous fitness evaluation run in the default executor
+    of the event loop. An evaluator with an 'aevaluate' coroutine (e.g a tools.fitness.AsyncEvaluator, created for a
+    coroutine fitness function) is awaited directly in the event loop, the next evolve step starts once the whole
+    generation is scored.
+    :return: Asynchronous generator of Snapshot
+    """
+    loop = asyncio.get_running_loop()
+    if evaluator is None and asyncio.iscoroutinefunction(fitness_function):
+        evaluator = fit.AsyncEvaluator(fitness_function)
+
+    async def evaluate(individuals):
+        if hasattr(evaluator, "aevaluate"):
+            return await evaluator.aevaluate(individuals)
+        if evaluator is not None:
+            return await loop.run_in_executor(None, evaluator.evaluate, individuals)
+        return await loop.run_in_executor(None, fit.evaluate, individuals, fitness_function, batch)
+
+    tracker = _Tracker(stop, generation, checkpointer)
+    if fitness is None:
+        fitness = tracker.evaluated(await evaluate(individuals), evaluator)
+    while True:
+        snapshot = await loop.run_in_executor(None, tracker.observe, individuals, fitness)
+        yield snapshot
+        if snapshot.stop_reason is not None:
+            return
+        individuals = await loop.run_in_executor(None, _evolve, strategy, individuals, fitness, strategy_args)
+        fitness = tracker.evaluated(await evaluate(individuals), evaluator)
+
+
+async def arun(individuals, fitness_function: Callable, strategy: Callable, strategy_args=(), stop=(), **kwargs):
+    """
+    Asynchronous version of 'run'.
+    :return: Snapshot of the last generation
+    """
+    if not stop:
+        raise ValueError("arun needs at least one termination policy")
+    snapshot = None
+    async for snapshot in aiterate(individuals, fitness_function, strategy, strategy_args, stop, **kwargs):
+        pass
+    return snapshot
+
+
+def target_fitness(target):
+    """
+    :param target: Float
+    :return: Policy stopping once the best fitness is at least target
+    """
+    def target_fitness(snapshot):
+        return snapshot.best_fitness >= target
+    return target_fitness
+
+
+def stagnation(window):
+    """
+    :param window: Integer, number of generations
+    :return: Policy stopping once the best fitness did not improve for 'window' generations
+    """
+    def stagnation(snapshot):
+        return snapshot.generation - snapshot.last_improvement >= window
+    return stagnation
+
+
+def time_budget(seconds):
+    """
+    :param seconds: Float
+    :return: Policy stopping once the run took at least 'seconds'
+    """
+    def time_budget(snapshot):
+        return snapshot.seconds >= seconds
+    return time_budget
+
+
+def evaluation_budget(evaluations):
+    """
+    :param evaluations: Integer
+    :return: Policy stopping once at least 'evaluations' fitness evaluations were made
+    """
+    def evaluation_budget(snapshot):
+        return snapshot.evaluations >= evaluations
+    return evaluation_budget
+
+
+def max_generations(generations):
+    """
+    :param generations: Integer
+    :return: Policy stopping at generation 'generations'
+    """
+    def max_generations(snapshot):
+        return snapshot.generation >= generations
+    return max_generations
+
+
+def _copy(individual):
+    # Copy of an individual, rows of a genome matrix are views that the next generation overwrites
+    if isinstance(individual, (str, tuple)):
+        return individual
+    return individual.copy() if hasattr(individual, "copy") else list(individual)
+
+
+class _Tracker:
+    """
+    Best so far, evaluation count, checkpoints and termination policies of a run, shared by the sync and async loops.
+    """
+
+    def __init__(self, stop, generation, checkpointer):
+        self.stop = list(stop)
+        self.generation = generation
+        self.checkpointer = checkpointer
+        self.start = time.perf_counter()
+        self.evaluations = 0
+        self.estimated = None
+        self.snapshot = None
+
+    def evaluated(self, fitness, evaluator=None):
+        # Count the evaluations of a generation, an evaluator scoring only part of it (e.g a tools.surrogate.Surrogate)
+        # tells how many it made
+        self.evaluations += getattr(evaluator, "last_evaluations", len(fitness))
+        # Fitness values predicted instead of scored
+        self.estimated = getattr(evaluator, "estimated", None)
+        return fitness
+
+    def observe(self, individuals, fitness):
+        """
+        :return: Snapshot of the next generation, with its stop reason if a policy stops the run
+        """
+        previous = self.snapshot
+        if previous is not None:
+            self.generation += 1
+        values = np.asarray(fitness, dtype=float)
+        # NaN compares False with everything, a NaN best so far would never be improved on
+        values = np.where(np.isnan(values), -np.inf, values)
+        if self.estimated is not None and len(self.estimated) == len(values):
+            values[self.estimated] = -np.inf
+        best_index = int(np.argmax(values))
+        generation_best = float(values[best_index])
+        improved = previous is None or generation_best > previous.best_fitness
+        if improved:
+            best, best_fitness, last_improvement = _copy(individuals[best_index]), generation_best, self.generation
+        else:
+            best, best_fitness, last_improvement = previous.best, previous.best_fitness, previous.last_improvement
+        snapshot = Snapshot(self.generation, individuals, fitness, generation_best, best, best_fitness, improved,
+                            last_improvement, self.evaluations, time.perf_counter() - self.start)
+        # The first generation is not checkpointed, it was given by the caller
+        if self.checkpointer is not None and previous is not None:
+            self.checkpointer.maybe_save(self.generation, individuals, fitness)
+        for policy in self.stop:
+            if policy(snapshot):
+                snapshot.stop_reason = getattr(policy, "__name__", type(policy).__name__)
+                break
+        self.snapshot = snapshot
+        return snapshot
+
+
+def _evolve(strategy, individuals, fitness, strategy_args):
+    return strategy(individuals, fitness, *strategy_args)
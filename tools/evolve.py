@@ -1,7 +1,14 @@
 from typing import Callable, Optional
 
+import numpy as np
+
+from tools import adaptive
 from tools import breed
+from tools import diversity
+from tools import lazy as lz
 from tools import mutation as mut
+from tools import population
+from tools import profiling
 from tools import selection
 
 """
@@ -21,43 +28,76 @@ This function takes as candidate a particular solution and outputs the quality o
 Hence this fitness function makes it possible to evaluate candidate solutions. 
 Selection based on fitness is what evolves the candidate solutions towards the optimal solution each generation.
 
+Individuals can be given as a list of individuals, a 2-D numpy array or a Population (see tools.population).
+Internally every generation is evolved as a Population, i.e. a genome matrix, and returned as the type passed in.
+For long runs pass a DoubleBuffer: the children are written into its spare population, which is then swapped in,
+so the same two genome matrices are reused every generation:
+
+buffer = population.DoubleBuffer(individuals)
+for generation in range(generations):
+    fitness = ...  # fitness of buffer.current
+    evolve_best(buffer.current, fitness, n_parents, mutation, buffer=buffer)
+
+The fitness can also be given as a selection.FitnessView, e.g to select with linear ranking or sigma scaling when
+fitness values may be negative. Either way the selection and the elitism of a generation share a single FitnessView,
+hence the fitness is sorted once.
+
 Below are a few example of how to evolve a generation.
 """
 
 
-def evolve_best(individuals, fitness, n_parents, mutation: Callable):
+def evolve_best(individuals, fitness, n_parents, mutation: Callable, metrics: Optional[profiling.Metrics] = None,
+                buffer: Optional[population.DoubleBuffer] = None,
+                unique: Optional[diversity.GenomeIndex] = None, lazy=False):
     """
     Breed only the best individuals
     :param individuals: List of floats
     :param fitness: List of floats
     :param n_parents: Integer
     :param mutation: Callable representing the mutation function to use on the children of the new population.
+    :param metrics: Optional Metrics recording the time spent in each stage (see tools.profiling)
+    :param buffer: Optional DoubleBuffer, individuals must be buffer.current. The children are written to buffer.next
+    and the buffers swapped, i.e the returned population is the new buffer.current.
+    :param unique: Optional GenomeIndex (see tools.diversity), the children duplicating another child or a genome of
+    the index are re-mutated and the children are added to the index
+    :param lazy: Boolean, breed the children as LazyChildren (see tools.lazy), built from their parents when their
+    genomes are first read. Ignored with a buffer.
     :return: List
     """
+    pop = _current(individuals, buffer)
+    if metrics is not None:
+        metrics.start_generation(pop, fitness)
+
     # -- Select parents --
-    parents = selection.sel_best(fitness, n_parents)  # Indexes of the best individuals in descending order
+    with profiling.stage(metrics, "select"):
+        view = selection.as_fitness_view(fitness)
+        parents = selection.sel_best(view, n_parents)  # Indexes of the best individuals in descending order
 
     # -- Produce children --
-    children = breed.breed_uniform(individuals, parents, n_children=len(individuals), co_prob=0.5)
+    with profiling.stage(metrics, "breed"):
+        children = breed.breed_uniform(pop, parents, n_children=len(pop), co_prob=0.5, buffer=buffer,
+                                       lazy=lazy)
 
-    # -- Mutate children --
-    for child in children:
-        if mutation:
-            mutation(child)
-        else:
-            mut.mut_gauss(child, 0.01)
-
-    new_individuals = list(children)
+    # ------- Mutate children -------
+    with profiling.stage(metrics, "mutate"):
+        _mutate(children, mutation, buffer)
 
     # -- Elitism --
-    best_id = selection.sel_best(fitness, round(0.05 * len(fitness)))
-    for i, best in enumerate(best_id):
-        new_individuals[i] = list(individuals[best])
+    with profiling.stage(metrics, "elitism"):
+        best_id = _elitism(pop, view, children)
 
-    return new_individuals
+    # -- Duplicate elimination --
+    if unique is not None:
+        with profiling.stage(metrics, "deduplicate"):
+            diversity.eliminate_duplicates(children, unique, start=len(best_id), mutation=mutation)
 
+    return _next_generation(children, individuals, buffer)
 
-def evolve_tournament(individuals, fitness, tournaments, tour_size, mutation: Callable):
+
+def evolve_tournament(individuals, fitness, tournaments, tour_size, mutation: Callable,
+                      metrics: Optional[profiling.Metrics] = None,
+                      buffer: Optional[population.DoubleBuffer] = None,
+                      unique: Optional[diversity.GenomeIndex] = None, lazy=False):
     """
     Perform tournament selection and mutate children. Replace non-parents with children
     :param individuals: List of floats
@@ -65,64 +105,97 @@ def evolve_tournament(individuals, fitness, tournaments, tour_size, mutation: Ca
     :param tournaments: Integer
     :param tour_size: Integer
     :param mutation: Callable representing the mutation function to use on the children of the new population.
+    :param metrics: Optional Metrics recording the time spent in each stage (see tools.profiling)
+    :param buffer: Optional DoubleBuffer, individuals must be buffer.current. The children are written to buffer.next
+    and the buffers swapped, i.e the returned population is the new buffer.current.
+    :param unique: Optional GenomeIndex (see tools.diversity), the children duplicating another child or a genome of
+    the index are re-mutated and the children are added to the index
+    :param lazy: Boolean, breed the children as LazyChildren (see tools.lazy), built from their parents when their
+    genomes are first read. Ignored with a buffer.
     :return: List
     """
+    pop = _current(individuals, buffer)
+    if metrics is not None:
+        metrics.start_generation(pop, fitness)
+
     # ------- Tournament selection --------
-    parents = selection.sel_tournament(fitness, tournaments, tour_size, replace=False)
+    with profiling.stage(metrics, "select"):
+        view = selection.as_fitness_view(fitness)
+        parents = selection.sel_tournament(view, tournaments, tour_size, replace=False)
 
     # -- Perform Crossover --
-    children = breed.breed_uniform(individuals, parents, n_children=len(individuals), co_prob=0.5)
+    with profiling.stage(metrics, "breed"):
+        children = breed.breed_uniform(pop, parents, n_children=len(pop), co_prob=0.5, buffer=buffer,
+                                       lazy=lazy)
 
     # ------- Mutate children -------
-    for child in children:
-        if mutation:
-            mutation(child)
-        else:
-            mut.mut_gauss(child, 0.01)
-
-    new_individuals = list(children)
+    with profiling.stage(metrics, "mutate"):
+        _mutate(children, mutation, buffer)
 
     # -- Elitism --
-    best_id = selection.sel_best(fitness, round(0.05 * len(fitness)))
-    for i, best in enumerate(best_id):
-        new_individuals[i] = list(individuals[best])
+    with profiling.stage(metrics, "elitism"):
+        best_id = _elitism(pop, view, children)
+
+    # -- Duplicate elimination --
+    if unique is not None:
+        with profiling.stage(metrics, "deduplicate"):
+            diversity.eliminate_duplicates(children, unique, start=len(best_id), mutation=mutation)
 
-    return new_individuals
+    return _next_generation(children, individuals, buffer)
 
 
-def evolve_roulette(individuals, fitness, tournaments, mutation: Callable):
+def evolve_roulette(individuals, fitness, tournaments, mutation: Callable, metrics: Optional[profiling.Metrics] = None,
+                    buffer: Optional[population.DoubleBuffer] = None,
+                    unique: Optional[diversity.GenomeIndex] = None, lazy=False):
     """
     Breed a new population using roulette selection.
     :param individuals: List of floats
     :param fitness: List of floats
     :param tournaments: Integer
     :param mutation: Callable representing the mutation function to use on the children of the new population.
+    :param metrics: Optional Metrics recording the time spent in each stage (see tools.profiling)
+    :param buffer: Optional DoubleBuffer, individuals must be buffer.current. The children are written to buffer.next
+    and the buffers swapped, i.e the returned population is the new buffer.current.
+    :param unique: Optional GenomeIndex (see tools.diversity), the children duplicating another child or a genome of
+    the index are re-mutated and the children are added to the index
+    :param lazy: Boolean, breed the children as LazyChildren (see tools.lazy), built from their parents when their
+    genomes are first read. Ignored with a buffer.
     :return: List
     """
+    pop = _current(individuals, buffer)
+    if metrics is not None:
+        metrics.start_generation(pop, fitness)
+
     # -- Select parents --
-    parents = selection.sel_roulette(fitness, tournaments)
+    with profiling.stage(metrics, "select"):
+        view = selection.as_fitness_view(fitness)
+        parents = selection.sel_roulette(view, tournaments)
 
     # -- Perform Crossover --
-    children = breed.breed_uniform(individuals, parents, n_children=len(individuals), co_prob=0.5)
+    with profiling.stage(metrics, "breed"):
+        children = breed.breed_uniform(pop, parents, n_children=len(pop), co_prob=0.5, buffer=buffer,
+                                       lazy=lazy)
 
     # ------- Mutate children -------
-    for child in children:
-        if mutation:
-            mutation(child)
-        else:
-            mut.mut_gauss(child, 0.01)
-
-    new_individuals = list(children)
+    with profiling.stage(metrics, "mutate"):
+        _mutate(children, mutation, buffer)
 
     # -- Elitism --
-    best_id = selection.sel_best(fitness, round(0.05 * len(fitness)))
-    for i, best in enumerate(best_id):
-        new_individuals[i] = list(individuals[best])
+    with profiling.stage(metrics, "elitism"):
+        best_id = _elitism(pop, view, children)
+
+    # -- Duplicate elimination --
+    if unique is not None:
+        with profiling.stage(metrics, "deduplicate"):
+            diversity.eliminate_duplicates(children, unique, start=len(best_id), mutation=mutation)
 
-    return new_individuals
+    return _next_generation(children, individuals, buffer)
 
 
-def evolve_breed_roulette(individuals, fitness, tournaments, mutation: Callable):
+def evolve_breed_roulette(individuals, fitness, tournaments, mutation: Callable,
+                          metrics: Optional[profiling.Metrics] = None,
+                          buffer: Optional[population.DoubleBuffer] = None,
+                          unique: Optional[diversity.GenomeIndex] = None, lazy=False):
     """
     Breed a new population using breed_roulette.
 
@@ -136,33 +209,53 @@ def evolve_breed_roulette(individuals, fitness, tournaments, mutation: Callable)
     :param fitness: List of floats
     :param tournaments: Integer
     :param mutation: Callable representing the mutation function to use on the children of the new population.
+    :param metrics: Optional Metrics recording the time spent in each stage (see tools.profiling)
+    :param buffer: Optional DoubleBuffer, individuals must be buffer.current. The children are written to buffer.next
+    and the buffers swapped, i.e the returned population is the new buffer.current.
+    :param unique: Optional GenomeIndex (see tools.diversity), the children duplicating another child or a genome of
+    the index are re-mutated and the children are added to the index
+    :param lazy: Boolean, breed the children as LazyChildren (see tools.lazy), built from their parents when their
+    genomes are first read. Ignored with a buffer.
     :return: List
     """
+    pop = _current(individuals, buffer)
+    if metrics is not None:
+        metrics.start_generation(pop, fitness)
+
     # -- Select parents --
-    parents = selection.sel_random(list(range(len(fitness))), tournaments)
-    parents_fitness = [fitness[val] for val in parents]
+    with profiling.stage(metrics, "select"):
+        view = selection.as_fitness_view(fitness)
+        parents = selection.sel_random(list(range(len(fitness))), tournaments)
+        parents_fitness = view.weights[parents]
+        if not parents_fitness.any():
+            # Only weightless parents drawn, e.g the worst individuals under windowing: breed them uniformly
+            parents_fitness = np.ones(len(parents_fitness))
 
     # -- Perform Crossover --
-    children = breed.breed_roulette(individuals, parents, parents_fitness, n_children=len(individuals), co_prob=0.5)
+    with profiling.stage(metrics, "breed"):
+        children = breed.breed_roulette(pop, parents, parents_fitness, n_children=len(pop), co_prob=0.5, buffer=buffer,
+                                        lazy=lazy)
 
     # ------- Mutate children -------
-    for child in children:
-        if mutation:
-            mutation(child)
-        else:
-            mut.mut_gauss(child, 0.01)
-
-    new_individuals = list(children)
+    with profiling.stage(metrics, "mutate"):
+        _mutate(children, mutation, buffer)
 
     # -- Elitism --
-    best_id = selection.sel_best(fitness, round(0.05 * len(fitness)))
-    for i, best in enumerate(best_id):
-        new_individuals[i] = list(individuals[best])
+    with profiling.stage(metrics, "elitism"):
+        best_id = _elitism(pop, view, children)
 
-    return new_individuals
+    # -- Duplicate elimination --
+    if unique is not None:
+        with profiling.stage(metrics, "deduplicate"):
+            diversity.eliminate_duplicates(children, unique, start=len(best_id), mutation=mutation)
 
+    return _next_generation(children, individuals, buffer)
 
-def evolve_sus(individuals: list, fitness: list, n_parents: int, mutation: Optional[Callable]) -> list:
+
+def evolve_sus(individuals: list, fitness: list, n_parents: int, mutation: Optional[Callable],
+               metrics: Optional[profiling.Metrics] = None,
+               buffer: Optional[population.DoubleBuffer] = None,
+               unique: Optional[diversity.GenomeIndex] = None, lazy=False) -> list:
     """
     Breed a new population using Stochastic Universal Sampling (SUS).
     Individuals represent the generation to evolve through the genetic algorithm process.
@@ -172,26 +265,293 @@ def evolve_sus(individuals: list, fitness: list, n_parents: int, mutation: Optio
     :param fitness: list of fitness values for each individual.
     :param n_parents: how many individuals survive to reproduce from this population
     :param mutation: Callable representing the mutation function to use on the children of the new population.
+    :param metrics: Optional Metrics recording the time spent in each stage (see tools.profiling)
+    :param buffer: Optional DoubleBuffer, individuals must be buffer.current. The children are written to buffer.next
+    and the buffers swapped, i.e the returned population is the new buffer.current.
+    :param unique: Optional GenomeIndex (see tools.diversity), the children duplicating another child or a genome of
+    the index are re-mutated and the children are added to the index
+    :param lazy: Boolean, breed the children as LazyChildren (see tools.lazy), built from their parents when their
+    genomes are first read. Ignored with a buffer.
     :return: List
     """
+    pop = _current(individuals, buffer)
+    if metrics is not None:
+        metrics.start_generation(pop, fitness)
+
     # -- Select parents --
-    parents = selection.sel_sus(fitness, n_parents)
+    with profiling.stage(metrics, "select"):
+        view = selection.as_fitness_view(fitness)
+        parents = selection.sel_sus(view, n_parents)
 
     # -- Perform crossover --
-    children = breed.breed_uniform(individuals, parents, n_children=len(individuals), co_prob=0.5)
+    with profiling.stage(metrics, "breed"):
+        children = breed.breed_uniform(pop, parents, n_children=len(pop), co_prob=0.5, buffer=buffer,
+                                       lazy=lazy)
+
+    # ------- Mutate children -------
+    with profiling.stage(metrics, "mutate"):
+        _mutate(children, mutation, buffer)
+
+    # -- Elitism --
+    with profiling.stage(metrics, "elitism"):
+        best_id = _elitism(pop, view, children)
+
+    # -- Duplicate elimination --
+    if unique is not None:
+        with profiling.stage(metrics, "deduplicate"):
+            diversity.eliminate_duplicates(children, unique, start=len(best_id), mutation=mutation)
+
+    return _next_generation(children, individuals, buffer)
+
+
+def evolve_adaptive(individuals, fitness, n_parents, control: adaptive.Control,
+                    metrics: Optional[profiling.Metrics] = None,
+                    buffer: Optional[population.DoubleBuffer] = None,
+                    unique: Optional[diversity.GenomeIndex] = None):
+    """
+    Breed only the best individuals, each child with a crossover and a mutation drawn by the adaptive control, which
+    also sets the mutation step size (see tools.adaptive). The fitness of the individuals first credits the operators
+    that bred them in the previous call with the same control.
+    :param individuals: List of individuals, 2-D numpy array or Population
+    :param fitness: List of floats
+    :param n_parents: Integer
+    :param control: adaptive.Control, kept from one generation to the next
+    :param metrics: Optional Metrics recording the time spent in each stage (see tools.profiling)
+    :param buffer: Optional DoubleBuffer, individuals must be buffer.current. The children are written to buffer.next
+    and the buffers swapped, i.e the returned population is the new buffer.current.
+    :param unique: Optional GenomeIndex (see tools.diversity), the children duplicating another child or a genome of
+    the index are re-mutated and the children are added to the index
+    :return: List
+    """
+    pop = _current(individuals, buffer)
+    if metrics is not None:
+        metrics.start_generation(pop, fitness)
+
+    # -- Credit the operators of the previous generation --
+    with profiling.stage(metrics, "adapt"):
+        control.credit(fitness)
+
+    # -- Select parents --
+    with profiling.stage(metrics, "select"):
+        view = selection.as_fitness_view(fitness)
+        parents = selection.sel_best(view, n_parents)  # Indexes of the best individuals in descending order
+
+    # -- Produce children --
+    with profiling.stage(metrics, "breed"):
+        crossovers, mutations = control.assign(pop, len(pop))
+        children, parents1 = breed.breed_operators(pop, parents, len(pop), control.crossovers, crossovers,
+                                                   buffer=buffer)
 
     # ------- Mutate children -------
-    for child in children:
+    with profiling.stage(metrics, "mutate"):
+        for operator in np.unique(mutations).tolist():
+            rows = np.flatnonzero(mutations == operator)
+            mutated = children.take(rows)
+            control.mutations[operator](mutated, control.sigma)
+            children.genomes[rows] = mutated.genomes
+
+    # -- Elitism --
+    with profiling.stage(metrics, "elitism"):
+        best_id = _elitism(pop, view, children)
+        control.remember(np.asarray(fitness, dtype=float)[parents1], crossovers, mutations, start=len(best_id))
+
+    # -- Duplicate elimination --
+    if unique is not None:
+        with profiling.stage(metrics, "deduplicate"):
+            diversity.eliminate_duplicates(children, unique, start=len(best_id))
+
+    return _next_generation(children, individuals, buffer)
+
+
+def evolve_delta(individuals, fitness, n_parents, delta_fitness: Callable, mutation: Optional[Callable] = None,
+                 metrics: Optional[profiling.Metrics] = None,
+                 buffer: Optional[population.DoubleBuffer] = None):
+    """
+    Breed only the best individuals, as evolve_best, and score the children incrementally from their parents.
+    Every child is compared to its first parent: delta_fitness(child, parent, parent_fitness, changed) is called with
+    the indexes of the genes where the child differs from the parent (after crossover and mutation) and returns the
+    fitness of the child. For an additively separable objective it only has to rescore the changed genes.
+    Children equal to their parent, e.g the elite, get the fitness of the parent without a call.
+    :param individuals: List of individuals, 2-D numpy array or Population
+    :param fitness: List of floats
+    :param n_parents: Integer
+    :param delta_fitness: Callable delta_fitness(child, parent, parent_fitness, changed) -> fitness of the child,
+    changed being a numpy array of gene indexes
+    :param mutation: Optional callable mutating the Population of children in place and returning the mutated
+    (rows, genes), e.g lambda children: mut.mut_swap(children, 0.01, return_changed=True)[1].
+    Defaults to mutation.mut_default (Gaussian for float genes, swaps for permutations...) with probability 0.01.
+    :param metrics: Optional Metrics recording the time spent in each stage (see tools.profiling)
+    :param buffer: Optional DoubleBuffer, individuals must be buffer.current. The children are written to buffer.next
+    and the buffers swapped, i.e the returned population is the new buffer.current.
+    :return: Tuple (children, List of fitness values of the children)
+    """
+    pop = _current(individuals, buffer)
+    if metrics is not None:
+        metrics.start_generation(pop, fitness)
+
+    # -- Select parents --
+    with profiling.stage(metrics, "select"):
+        view = selection.as_fitness_view(fitness)
+        parents = selection.sel_best(view, n_parents)  # Indexes of the best individuals in descending order
+
+    # -- Produce children --
+    with profiling.stage(metrics, "breed"):
+        children, first_parents, crossed = breed.breed_uniform(pop, parents, n_children=len(pop), co_prob=0.5,
+                                                               buffer=buffer, return_changed=True)
+
+    # ------- Mutate children -------
+    with profiling.stage(metrics, "mutate"):
         if mutation is not None:
-            mutation(child)
+            mutated = mutation(children)
         else:
-            mut.mut_gauss(child, 0.01)
+            mutated = mut.mut_default(children, 0.01, buffer=buffer, return_changed=True)[1]
 
-    new_individuals = list(children)
+    # -- Elitism --
+    with profiling.stage(metrics, "elitism"):
+        best_id = _elitism(pop, view, children)
+        first_parents[:len(best_id)] = best_id
+
+    # -- Score children from their parent --
+    with profiling.stage(metrics, "evaluate"):
+        children_fitness = []
+        for i, changed in enumerate(_changed_per_child(children, len(best_id), crossed, mutated)):
+            parent = first_parents[i]
+            if len(changed):
+                children_fitness.append(delta_fitness(children[i], pop[parent], fitness[parent], changed))
+            else:
+                children_fitness.append(fitness[parent])
+
+    return _next_generation(children, individuals, buffer), children_fitness
+
+
+def evolve_nsga2(individuals, objectives, n_parents, mutation: Optional[Callable],
+                 metrics: Optional[profiling.Metrics] = None,
+                 buffer: Optional[population.DoubleBuffer] = None,
+                 unique: Optional[diversity.GenomeIndex] = None):
+    """
+    Multi-objective evolution: breed the best individuals by NSGA-II ranking, i.e by non-dominated front, then by
+    crowding distance (see selection.sel_nsga2). The best 5% of the population by the same ranking are copied unchanged.
+    For (mu + lambda) survival score the children and keep the best of parents and children with selection.sel_nsga2.
+    :param individuals: List of individuals, 2-D numpy array or Population
+    :param objectives: 2-D array like (n_individuals, n_objectives), every objective is maximized
+    :param n_parents: Integer
+    :param mutation: Callable representing the mutation function to use on the children of the new population.
+    :param metrics: Optional Metrics recording the time spent in each stage (see tools.profiling), without population
+    statistics since there is no single fitness
+    :param buffer: Optional DoubleBuffer, individuals must be buffer.current. The children are written to buffer.next
+    and the buffers swapped, i.e the returned population is the new buffer.current.
+    :param unique: Optional GenomeIndex (see tools.diversity), the children duplicating another child or a genome of
+    the index are re-mutated and the children are added to the index
+    :return: List
+    """
+    pop = _current(individuals, buffer)
+    if metrics is not None:
+        metrics.start_generation(pop, ())
+
+    # -- Select parents --
+    with profiling.stage(metrics, "select"):
+        n_elite = round(0.05 * len(pop))
+        ranking = selection.sel_nsga2(objectives, max(n_parents, n_elite))
+        parents = ranking[:n_parents]
+
+    # -- Produce children --
+    with profiling.stage(metrics, "breed"):
+        children = breed.breed_uniform(pop, parents, n_children=len(pop), co_prob=0.5, buffer=buffer)
+
+    # ------- Mutate children -------
+    with profiling.stage(metrics, "mutate"):
+        _mutate(children, mutation, buffer)
 
     # -- Elitism --
+    with profiling.stage(metrics, "elitism"):
+        _copy_elite(pop, ranking[:n_elite], children)
+
+    # -- Duplicate elimination --
+    if unique is not None:
+        with profiling.stage(metrics, "deduplicate"):
+            diversity.eliminate_duplicates(children, unique, start=n_elite, mutation=mutation)
+
+    return _next_generation(children, individuals, buffer)
+
+
+def _changed_per_child(children, n_elite, *changed):
+    """
+    Merge the (rows, genes) changed by successive operators into the sorted changed genes of each child.
+    The first n_elite children were overwritten by elitism and have no changed genes.
+    :param children: Population
+    :param n_elite: Integer
+    :param changed: (rows, genes) tuples of numpy arrays
+    :return: List of numpy arrays of gene indexes, one per child
+    """
+    rows = np.concatenate([np.asarray(c[0], dtype=np.intp) for c in changed])
+    genes = np.concatenate([np.asarray(c[1], dtype=np.intp) for c in changed])
+    keep = rows >= n_elite
+    # One key per (row, gene) pair, unique sorts them by row then gene
+    keys = np.unique(rows[keep] * children.n_genes + genes[keep])
+    rows, genes = np.divmod(keys, children.n_genes)
+    return np.split(genes, np.searchsorted(rows, np.arange(1, len(children))))
+
+
+def _current(individuals, buffer):
+    """
+    :param individuals: List of individuals, 2-D numpy array or Population
+    :param buffer: DoubleBuffer or None
+    :return: Population of the generation to evolve
+    """
+    if buffer is None:
+        return population.as_population(individuals)
+    if individuals is not buffer.current:
+        raise ValueError("With a DoubleBuffer the individuals to evolve must be buffer.current")
+    return buffer.current
+
+
+def _next_generation(children, individuals, buffer):
+    """
+    :param children: Population
+    :param individuals: List of individuals, 2-D numpy array or Population passed in by the caller
+    :param buffer: DoubleBuffer or None
+    :return: The children, of the same type as individuals
+    """
+    if buffer is not None:
+        buffer.swap()
+    return population.restore_type(children, individuals)
+
+
+def _mutate(children, mutation: Optional[Callable], buffer=None):
+    """
+    Mutate the children in place. The default mutation (see mutation.mut_default: Gaussian for float genes, bit flip,
+    random resetting or swaps for the other kinds of genes) is applied to the whole genome matrix at once, a user
+    supplied mutation is called once per child with the child's row of the genome matrix.
+    :param children: Population
+    :param mutation: Callable or None
+    :param buffer: Optional DoubleBuffer providing the scratch space of the default mutation
+    """
+    if mutation is not None:
+        for child in children:
+            mutation(child)
+    else:
+        mut.mut_default(children, 0.01, buffer=buffer)
+
+
+def _elitism(pop, fitness, children):
+    """
+    Copy the best 5% of the current population unchanged to the first rows of the children.
+    :param pop: Population, current generation
+    :param fitness: List of fitness values or FitnessView of the current generation, the view reuses the ordering
+    computed by the selection
+    :param children: Population, next generation (modified in place)
+    :return: Indexes of the copied individuals, in the order of the rows they were copied to
+    """
     best_id = selection.sel_best(fitness, round(0.05 * len(fitness)))
-    for i, best in enumerate(best_id):
-        new_individuals[i] = list(individuals[best])
+    _copy_elite(pop, best_id, children)
+    return best_id
 
-    return new_individuals
+
+def _copy_elite(pop, elite, children):
+    """
+    Copy the individuals 'elite' of the current population to the first rows of the children.
+    """
+    if lz.is_lazy(children) and children.source is pop:
+        children.copy_rows(np.arange(len(elite)), elite)
+        return
+    np.take(pop.genomes, elite, axis=0, out=children.genomes[:len(elite)])
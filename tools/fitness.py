@@ -0,0 +1,250 @@
+import asyncio
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Optional
+
+import numpy as np
+
+from tools import population
+from tools import shared
+
+"""
+Fitness evaluation is the process of scoring every individual of a generation with a fitness function.
+It is usually by far the most expensive step of the genetic algorithm.
+
+Two kinds of fitness functions are supported:
+Scalar: fitness_function(individual) -> float, called once per individual.
+Batch: fitness_function(genomes) -> array of floats, called with a genome matrix (one row per individual) and
+returning one fitness value per row.
+
+An Evaluator fans the population out over a process pool in chunks. Whatever the mode, the returned fitness list is
+index aligned with the individuals, i.e fitness[i] is the fitness of individuals[i], as assumed by every 'sel_*'
+function. Note that fitness functions used with a process pool must be picklable, i.e defined at module level.
+The individuals are pickled to the workers, except for a tools.shared.SharedPopulation: the workers attach to its
+shared memory and write the fitness of their rows into its shared fitness vector.
+
+I/O bound fitness functions, e.g calling a simulation server, can be written as coroutines:
+'async def fitness_function(individual) -> float'. An AsyncEvaluator scores a population with many calls in flight,
+bounded by a semaphore, with a timeout per call. A call that fails or times out gets a penalty fitness instead of
+failing the whole generation. 'evaluate' recognises coroutine functions and runs them through an AsyncEvaluator.
+"""
+
+
+def evaluate(individuals, fitness_function: Callable, batch=False) -> list:
+    """
+    Evaluate the fitness of every individual in the calling process.
+    :param individuals: List of individuals, 2-D numpy array or Population
+    :param fitness_function: Callable, scalar or batch fitness function
+    :param batch: Boolean, True if fitness_function scores a whole genome matrix at once
+    :return: List of fitness values, index aligned with individuals
+    """
+    if batch:
+        return _evaluate_batch(fitness_function, population.as_population(individuals).genomes)
+    if asyncio.iscoroutinefunction(fitness_function):
+        return AsyncEvaluator(fitness_function).evaluate(individuals)
+    return [fitness_function(individual) for individual in individuals]
+
+
+async def evaluate_async(individuals, fitness_function: Callable, concurrency=32, timeout: Optional[float] = None,
+                         penalty=-math.inf) -> list:
+    """
+    Evaluate the fitness of every individual with a coroutine fitness function, see AsyncEvaluator.
+    :return: List of fitness values, index aligned with individuals
+    """
+    return await AsyncEvaluator(fitness_function, concurrency, timeout, penalty).aevaluate(individuals)
+
+
+class AsyncEvaluator:
+    """
+    Evaluate the fitness of a population with a coroutine fitness function, running up to 'concurrency' calls at once.
+
+    Inside a running event loop await 'aevaluate', e.g in tools.driver.aiterate which picks it up as its evaluator.
+    Otherwise 'evaluate' runs the evaluation in a new event loop:
+
+        evaluator = AsyncEvaluator(fitness_function, concurrency=64, timeout=5.)
+        fitness = evaluator.evaluate(individuals)
+    """
+
+    def __init__(self, fitness_function: Callable, concurrency=32, timeout: Optional[float] = None,
+                 penalty=-math.inf):
+        """
+        :param fitness_function: Coroutine function, fitness_function(individual) -> float
+        :param concurrency: Integer, maximum number of calls in flight
+        :param timeout: Optional float, seconds after which a call is cancelled and scored 'penalty'
+        :param penalty: Float, fitness of the individuals whose call failed or timed out
+        """
+        self.fitness_function = fitness_function
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.penalty = penalty
+        self.failures = 0
+        self.timeouts = 0
+        self.last_error = None
+
+    def evaluate(self, individuals) -> list:
+        """
+        Evaluate the fitness of every individual in a new event loop (must not be called from a running loop).
+        :param individuals: List of individuals, 2-D numpy array or Population
+        :return: List of fitness values, index aligned with individuals
+        """
+        return asyncio.run(self.aevaluate(individuals))
+
+    async def aevaluate(self, individuals) -> list:
+        """
+        Evaluate the fitness of every individual, returning once the whole population is scored.
+        :param individuals: List of individuals, 2-D numpy array or Population
+        :return: List of fitness values, index aligned with individuals
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def score(individual):
+            async with semaphore:
+                try:
+                    return await asyncio.wait_for(self.fitness_function(individual), self.timeout)
+                except asyncio.TimeoutError:
+                    self.timeouts += 1
+                    return self.penalty
+                except Exception as error:
+                    self.failures += 1
+                    self.last_error = error
+                    return self.penalty
+
+        return list(await asyncio.gather(*(score(individual) for individual in individuals)))
+
+
+class Evaluator:
+    """
+    Evaluate the fitness of a population over a pool of worker processes.
+
+    Use 'evaluate' to block until the whole population is scored, or 'submit' to start the evaluation and keep
+    working (e.g on breeding bookkeeping) while the workers score the population:
+
+        with Evaluator(fitness_function, processes=8) as evaluator:
+            pending = evaluator.submit(individuals)
+            ...
+            fitness = pending.result()
+    """
+
+    def __init__(self, fitness_function: Callable, batch=False, processes: Optional[int] = None,
+                 chunksize: Optional[int] = None):
+        """
+        :param fitness_function: Callable, scalar or batch fitness function
+        :param batch: Boolean, True if fitness_function scores a whole genome matrix at once
+        :param processes: Integer, number of worker processes. None uses all cores, 1 evaluates in the calling process.
+        :param chunksize: Integer, number of individuals sent to a worker per task.
+        None splits the population in about four chunks per worker.
+        """
+        self.fitness_function = fitness_function
+        self.batch = batch
+        self.processes = (os.cpu_count() or 1) if processes is None else processes
+        self.chunksize = chunksize
+        self._executor = ProcessPoolExecutor(max_workers=self.processes) if self.processes > 1 else None
+
+    def evaluate(self, individuals) -> list:
+        """
+        Evaluate the fitness of every individual.
+        :param individuals: List of individuals, 2-D numpy array or Population
+        :return: List of fitness values, index aligned with individuals
+        """
+        return self.submit(individuals).result()
+
+    def submit(self, individuals):
+        """
+        Start evaluating the fitness of every individual without waiting for the result.
+        :param individuals: List of individuals, 2-D numpy array or Population
+        :return: PendingFitness, call 'result()' to get the list of fitness values
+        """
+        if self._executor is None:
+            return PendingFitness([evaluate(individuals, self.fitness_function, self.batch)])
+        if isinstance(individuals, shared.SharedPopulation):
+            # Only the handle of the population and row ranges are sent to the workers
+            chunksize = self._chunksize(len(individuals))
+            futures = [self._executor.submit(_evaluate_shared, self.fitness_function, individuals, start,
+                                             start + chunksize, self.batch)
+                       for start in range(0, len(individuals), chunksize)]
+            return PendingFitness(futures, individuals.fitness)
+        if self.batch:
+            individuals = population.as_population(individuals).genomes
+        chunksize = self._chunksize(len(individuals))
+        futures = [self._executor.submit(_evaluate_chunk, self.fitness_function,
+                                         individuals[start:start + chunksize], self.batch)
+                   for start in range(0, len(individuals), chunksize)]
+        return PendingFitness(futures)
+
+    def close(self):
+        """
+        Shut down the worker processes.
+        """
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _chunksize(self, size):
+        if self.chunksize is not None:
+            return max(1, self.chunksize)
+        return max(1, math.ceil(size / (4 * self.processes)))
+
+
+class PendingFitness:
+    """
+    Fitness evaluation in progress. The chunks are kept in submission order so the result stays index aligned.
+    """
+
+    def __init__(self, chunks, fitness=None):
+        """
+        :param chunks: List of futures or lists, each holding the fitness values of consecutive individuals
+        :param fitness: Optional numpy array the chunks write the fitness values into instead of returning them
+        """
+        self._chunks = chunks
+        self._fitness = fitness
+
+    def done(self):
+        """
+        :return: Boolean, True if every chunk has been evaluated
+        """
+        return all(chunk.done() for chunk in self._chunks if not isinstance(chunk, list))
+
+    def result(self) -> list:
+        """
+        Wait for the evaluation to finish.
+        :return: List of fitness values, index aligned with the submitted individuals
+        """
+        if self._fitness is not None:
+            for chunk in self._chunks:
+                chunk.result()
+            return self._fitness.tolist()
+        fitness = []
+        for chunk in self._chunks:
+            fitness.extend(chunk if isinstance(chunk, list) else chunk.result())
+        return fitness
+
+
+def _evaluate_chunk(fitness_function, individuals, batch):
+    """
+    Worker entrypoint, evaluate a chunk of consecutive individuals.
+    """
+    if batch:
+        return _evaluate_batch(fitness_function, individuals)
+    return [fitness_function(individual) for individual in individuals]
+
+
+def _evaluate_shared(fitness_function, pop, start, stop, batch):
+    """
+    Worker entrypoint, evaluate the rows start:stop of a SharedPopulation (attached when unpickled) into its fitness.
+    """
+    pop.fitness[start:stop] = _evaluate_chunk(fitness_function, pop.genomes[start:stop], batch)
+
+
+def _evaluate_batch(fitness_function, genomes):
+    fitness = np.asarray(fitness_function(genomes)).ravel()
+    if len(fitness) != len(genomes):
+        raise ValueError("Batch fitness function returned {} values for {} individuals".format(len(fitness),
+                                                                                              len(genomes)))
+    return fitness.tolist()
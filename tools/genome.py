@@ -0,0 +1,429 @@
+import operator
+
+import numpy as np
+
+from tools import population
+from tools import rng
+
+"""
+Compact genome representations.
+
+A list of genes stores every gene as a boxed Python object, e.g a 10k bit binary chromosome takes about 80 KB as a
+list. The genomes below store their genes in a single numpy array instead:
+
+BinaryGenome: bits packed 8 per byte (np.packbits), i.e 1.25 KB for 10k bits.
+IntegerGenome: fixed width integers (int8 to int64).
+FloatGenome: float32 or float64 values.
+
+BinaryPopulation is the population counterpart of BinaryGenome, a genome matrix with one row of packed bits per
+individual.
+CharPopulation stores strings of equal length as a genome matrix of uint8 character codes (Latin-1), one row per
+string, with the alphabet of codes the genes are drawn from. Matching a target is a single comparison of the genome
+matrix with the encoded target, and strings are only decoded for reporting.
+
+The crossover and mutation operators recognise these types and use representation specific fast paths, e.g uniform
+crossover of binary genomes swaps bits 64 at a time through XOR masks on 64 bit words, and bit flip mutation
+XORs the flipped bits into the packed bytes. The packed bytes are padded to a whole number of 64 bit words and the
+padding bits are always zero.
+"""
+
+WORD_BYTES = 8
+
+
+def _packed_size(n_bits):
+    # Number of bytes holding n_bits, rounded up to whole 64 bit words
+    return -(-n_bits // (8 * WORD_BYTES)) * WORD_BYTES
+
+
+def pack_bits(bits):
+    """
+    Pack the last axis of a 0/1 array, padding with zeros to whole 64 bit words.
+    :param bits: numpy array (or array like) of 0/1 or booleans, 1-D or 2-D
+    :return: numpy array of uint8
+    """
+    bits = np.asarray(bits)
+    packed = np.packbits(bits.astype(bool), axis=-1)
+    padding = _packed_size(bits.shape[-1]) - packed.shape[-1]
+    if padding:
+        packed = np.concatenate((packed, np.zeros(packed.shape[:-1] + (padding,), dtype=np.uint8)), axis=-1)
+    return packed
+
+
+def unpack_bits(packed, n_bits):
+    """
+    :param packed: numpy array of uint8, 1-D or 2-D
+    :param n_bits: Integer, number of bits in each row
+    :return: numpy array of uint8 0/1 values
+    """
+    return np.unpackbits(packed, axis=-1, count=n_bits)
+
+
+def random_bits(shape, prob):
+    """
+    Packed random bits, each bit set with probability prob.
+    :param shape: Tuple (rows, n_bits) or integer n_bits
+    :param prob: Float
+    :return: numpy array of uint8 packed as by pack_bits
+    """
+    shape = (shape,) if np.isscalar(shape) else tuple(shape)
+    if prob == 0.5:
+        # Every bit of a random byte is set with probability 0.5, no need to draw bit by bit
+        n_bytes = shape[:-1] + (_packed_size(shape[-1]),)
+        packed = np.frombuffer(rng.get().bytes(int(np.prod(n_bytes))), dtype=np.uint8).reshape(n_bytes).copy()
+        return packed & pack_bits(np.ones(shape[-1], dtype=bool))
+    return pack_bits(rng.get().random(shape) < prob)
+
+
+class BinaryGenome:
+    """
+    Binary chromosome stored as packed bits.
+    """
+    __slots__ = ("packed", "n_bits")
+
+    def __init__(self, packed, n_bits):
+        """
+        :param packed: numpy array of uint8 as returned by pack_bits
+        :param n_bits: Integer, number of bits of the chromosome
+        """
+        self.packed = packed
+        self.n_bits = n_bits
+
+    @classmethod
+    def from_bits(cls, bits):
+        """
+        :param bits: List or numpy array of 0/1 values
+        :return: BinaryGenome
+        """
+        return cls(pack_bits(bits), len(bits))
+
+    @classmethod
+    def random(cls, n_bits, prob=0.5):
+        return cls(random_bits(n_bits, prob), n_bits)
+
+    def to_bits(self):
+        """
+        :return: numpy array of uint8 0/1 values
+        """
+        return unpack_bits(self.packed, self.n_bits)
+
+    @property
+    def words(self):
+        return self.packed.view(np.uint64)
+
+    @property
+    def bit_shape(self):
+        return (self.n_bits,)
+
+    def with_packed(self, packed):
+        """
+        :param packed: numpy array of uint8 packed bits, same size as this genome
+        :return: BinaryGenome
+        """
+        return BinaryGenome(packed, self.n_bits)
+
+    @property
+    def nbytes(self):
+        return self.packed.nbytes
+
+    def copy(self):
+        return BinaryGenome(self.packed.copy(), self.n_bits)
+
+    def __len__(self):
+        return self.n_bits
+
+    def __getitem__(self, index):
+        """
+        :param index: Integer (negative counts from the end) or slice
+        :return: Integer 0/1 bit, numpy array of uint8 0/1 values for a slice
+        """
+        if isinstance(index, slice):
+            return self.to_bits()[index]
+        index = self._bit_index(index)
+        return int(self.packed[index >> 3] >> (7 - (index & 7)) & 1)
+
+    def __setitem__(self, index, value):
+        """
+        :param index: Integer (negative counts from the end) or slice
+        :param value: Truthy bit, array like of 0/1 values for a slice
+        """
+        if isinstance(index, slice):
+            bits = self.to_bits()
+            bits[index] = np.asarray(value, dtype=bool)
+            self.packed[:] = pack_bits(bits)
+            return
+        index = self._bit_index(index)
+        bit = np.uint8(0x80 >> (index & 7))
+        if value:
+            self.packed[index >> 3] |= bit
+        else:
+            self.packed[index >> 3] &= ~bit
+
+    def _bit_index(self, index):
+        # Bounds check of a single bit index, the padding bits of the packed bytes must stay zero
+        index = operator.index(index)
+        if index < 0:
+            index += self.n_bits
+        if not 0 <= index < self.n_bits:
+            raise IndexError("Bit index out of range for a genome of {} bits".format(self.n_bits))
+        return index
+
+    def __iter__(self):
+        return iter(self.to_bits().tolist())
+
+    def __array__(self, dtype=None, copy=None):
+        return self.to_bits() if dtype is None else self.to_bits().astype(dtype)
+
+    def __eq__(self, other):
+        return isinstance(other, BinaryGenome) and self.n_bits == other.n_bits and \
+            np.array_equal(self.packed, other.packed)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return "BinaryGenome('{}')".format(''.join(map(str, self.to_bits().tolist())))
+
+
+class ArrayGenome:
+    """
+    Chromosome stored as a 1-D numpy array of a fixed dtype.
+    """
+    __slots__ = ("genes",)
+    dtypes = ()
+
+    def __init__(self, genes, dtype=None):
+        """
+        :param genes: List or numpy array of genes
+        :param dtype: numpy dtype, one of the dtypes allowed by the class (defaults to the first one)
+        """
+        genes = np.asarray(genes, dtype=dtype)
+        if genes.dtype not in self.dtypes:
+            if dtype is not None:
+                raise ValueError("{} does not support dtype {}".format(type(self).__name__, genes.dtype))
+            genes = genes.astype(self.dtypes[0])
+        self.genes = genes
+
+    @property
+    def dtype(self):
+        return self.genes.dtype
+
+    @property
+    def nbytes(self):
+        return self.genes.nbytes
+
+    def copy(self):
+        return type(self)(self.genes.copy())
+
+    def __len__(self):
+        return len(self.genes)
+
+    def __getitem__(self, index):
+        return self.genes[index]
+
+    def __setitem__(self, index, value):
+        self.genes[index] = value
+
+    def __iter__(self):
+        return iter(self.genes.tolist())
+
+    def __array__(self, dtype=None, copy=None):
+        return self.genes if dtype is None else self.genes.astype(dtype)
+
+    def __eq__(self, other):
+        return type(other) is type(self) and np.array_equal(self.genes, other.genes)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return "{}({}, dtype={})".format(type(self).__name__, self.genes.tolist(), self.genes.dtype)
+
+
+class IntegerGenome(ArrayGenome):
+    """
+    Chromosome of fixed width integers.
+    """
+    __slots__ = ()
+    dtypes = tuple(np.dtype(t) for t in (np.int64, np.int32, np.int16, np.int8, np.uint64, np.uint32, np.uint16,
+                                         np.uint8))
+
+
+class FloatGenome(ArrayGenome):
+    """
+    Chromosome of float64 or float32 values.
+    """
+    __slots__ = ()
+    dtypes = (np.dtype(np.float64), np.dtype(np.float32))
+
+
+class BinaryPopulation(population.Population):
+    """
+    Population of binary chromosomes, one row of packed bits (see pack_bits) per individual.
+    Iterating or indexing a single row gives a BinaryGenome sharing the memory of the row.
+    """
+    __slots__ = ("n_bits",)
+
+    def __init__(self, genomes, n_bits):
+        """
+        :param genomes: 2-D numpy array of uint8, packed rows
+        :param n_bits: Integer, number of bits per individual
+        """
+        super().__init__(genomes)
+        self.n_bits = n_bits
+
+    @classmethod
+    def from_bits(cls, bits):
+        """
+        :param bits: 2-D array of 0/1 values, one row per individual
+        :return: BinaryPopulation
+        """
+        bits = np.asarray(bits)
+        return cls(pack_bits(bits), bits.shape[1])
+
+    @classmethod
+    def from_list(cls, individuals, dtype=None):
+        """
+        :param individuals: List of BinaryGenome or of lists of 0/1 values
+        :return: BinaryPopulation
+        """
+        if individuals and isinstance(individuals[0], BinaryGenome):
+            return cls(np.stack([ind.packed for ind in individuals]), individuals[0].n_bits)
+        return cls.from_bits(individuals)
+
+    @property
+    def n_genes(self):
+        return self.n_bits
+
+    @property
+    def words(self):
+        return self.genomes.view(np.uint64)
+
+    @property
+    def bit_shape(self):
+        return len(self), self.n_bits
+
+    def with_packed(self, packed):
+        """
+        :param packed: numpy array of uint8 packed bits, same size as this population
+        :return: BinaryPopulation
+        """
+        return BinaryPopulation(packed.reshape(self.genomes.shape), self.n_bits)
+
+    def to_bits(self):
+        """
+        :return: 2-D numpy array of uint8 0/1 values
+        """
+        return unpack_bits(self.genomes, self.n_bits)
+
+    def _new(self, genomes):
+        return BinaryPopulation(genomes, self.n_bits)
+
+    def __getitem__(self, index):
+        if isinstance(index, (int, np.integer)):
+            return BinaryGenome(self.genomes[index], self.n_bits)
+        return self.genomes[index]
+
+    def __iter__(self):
+        return (BinaryGenome(row, self.n_bits) for row in self.genomes)
+
+    def __repr__(self):
+        return "BinaryPopulation(n_individuals={}, n_bits={})".format(len(self), self.n_bits)
+
+    def tolist(self):
+        """
+        :return: List of BinaryGenome
+        """
+        return [BinaryGenome(row.copy(), self.n_bits) for row in self.genomes]
+
+
+def encode_chars(strings):
+    """
+    Encode strings of equal length as Latin-1 character codes.
+    :param strings: String or list of strings
+    :return: numpy array of uint8, 1-D for a string, one row per string for a list
+    """
+    if isinstance(strings, str):
+        return np.frombuffer(strings.encode("latin-1"), dtype=np.uint8).copy()
+    strings = list(strings)
+    length = len(strings[0]) if strings else 0
+    if any(len(string) != length for string in strings):
+        raise ValueError("The strings must have the same length")
+    codes = np.frombuffer("".join(strings).encode("latin-1"), dtype=np.uint8)
+    return codes.reshape(len(strings), length).copy()
+
+
+def decode_chars(codes):
+    """
+    :param codes: numpy array of uint8 character codes, 1-D or 2-D
+    :return: String for a 1-D array, list of strings (one per row) for a 2-D array
+    """
+    codes = np.ascontiguousarray(codes, dtype=np.uint8)
+    if codes.ndim == 1:
+        return codes.tobytes().decode("latin-1")
+    text = codes.tobytes().decode("latin-1")
+    length = codes.shape[1]
+    return [text[start:start + length] for start in range(0, len(text), length)] if length else [""] * len(codes)
+
+
+class CharPopulation(population.Population):
+    """
+    Population of strings of equal length, one row of uint8 character codes (see encode_chars) per individual.
+    """
+    __slots__ = ("alphabet",)
+
+    def __init__(self, genomes, alphabet):
+        """
+        :param genomes: 2-D numpy array of uint8 character codes
+        :param alphabet: String, list of characters or numpy array of codes, the sample space of the genes
+        """
+        super().__init__(np.asarray(genomes, dtype=np.uint8))
+        self.alphabet = alphabet if isinstance(alphabet, np.ndarray) else encode_chars("".join(alphabet))
+
+    @classmethod
+    def from_strings(cls, strings, alphabet):
+        """
+        :param strings: List of strings of equal length
+        :param alphabet: String or list of characters
+        :return: CharPopulation
+        """
+        return cls(encode_chars(strings), alphabet)
+
+    @classmethod
+    def random(cls, n_individuals, length, alphabet):
+        """
+        Draw random strings, each character drawn from the alphabet with replacement.
+        :param n_individuals: Integer
+        :param length: Integer, number of characters of each string
+        :param alphabet: String or list of characters
+        :return: CharPopulation
+        """
+        alphabet = encode_chars("".join(alphabet))
+        return cls(rng.get().choice(alphabet, size=(n_individuals, length)), alphabet)
+
+    def _new(self, genomes):
+        return CharPopulation(genomes, self.alphabet)
+
+    def __repr__(self):
+        return "CharPopulation(n_individuals={}, length={})".format(len(self), self.n_genes)
+
+    def tolist(self):
+        """
+        :return: List of strings
+        """
+        return decode_chars(self.genomes)
+
+
+def is_binary(obj):
+    """
+    Check if obj is a BinaryGenome or a BinaryPopulation
+    :param obj: Object
+    :return: Boolean
+    """
+    return isinstance(obj, (BinaryGenome, BinaryPopulation))
+
+
+def is_array_genome(obj):
+    """
+    Check if obj is an IntegerGenome or a FloatGenome
+    :param obj: Object
+    :return: Boolean
+    """
+    return isinstance(obj, ArrayGenome)
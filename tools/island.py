@@ -0,0 +1,182 @@
+import multiprocessing
+import queue
+import random
+import traceback
+from typing import Callable, Optional
+
+import numpy as np
+
+from tools import fitness as fit
+from tools import population
+from tools import rng
+from tools import selection
+
+"""
+Island model.
+
+The population is split in islands, each evolved independently in its own process with any evolve_* strategy.
+Every 'migration_interval' generations each island sends copies of its best 'n_migrants' individuals to its
+neighbours, where they replace the worst individuals. Islands explore different regions of the search space and
+migration spreads good genes between them, which keeps diversity high while using one core per island.
+
+Topologies:
+ring: island i sends to island i + 1.
+full: every island sends to every other island.
+random: every migration the islands are shuffled into a new ring.
+
+Migrants travel between processes as raw genome and fitness buffers (bytes of the numpy arrays) through one inbox
+queue per island, hence the genome matrix is never converted to lists.
+
+The island processes are daemonic, so they can not start processes of their own: a fitness function scoring with a
+multiprocessing pool (e.g a tools.fitness.Evaluator with processes > 1) fails inside an island. Use one island per core
+instead, or threads within the fitness function.
+"""
+
+TOPOLOGIES = ("ring", "full", "random")
+
+
+def migration_plan(topology, n_islands, epoch, seed=0):
+    """
+    Return which island sends migrants to which island at a migration.
+    The plan only depends on its arguments so that every island process computes the same plan.
+    :param topology: String, one of 'ring', 'full' or 'random'
+    :param n_islands: Integer
+    :param epoch: Integer, index of the migration (0 for the first migration)
+    :param seed: Integer, seed of the random topology
+    :return: List of (source, destination) tuples
+    """
+    if n_islands < 2:
+        return []
+    if topology == "ring":
+        return [(i, (i + 1) % n_islands) for i in range(n_islands)]
+    if topology == "full":
+        return [(i, j) for i in range(n_islands) for j in range(n_islands) if i != j]
+    if topology == "random":
+        order = np.random.default_rng([seed, epoch]).permutation(n_islands).tolist()
+        return [(order[i], order[(i + 1) % n_islands]) for i in range(n_islands)]
+    raise ValueError("Unknown topology '{}', expected one of {}".format(topology, TOPOLOGIES))
+
+
+def run_islands(islands, fitness_function: Callable, strategy: Callable, strategy_args=(), generations=100,
+                migration_interval=10, n_migrants=2, topology="ring", batch=False, seed: Optional[int] = None):
+    """
+    Evolve each island in its own process with migration between islands.
+    The fitness function and the strategy must be picklable, i.e defined at module level, and must not start
+    processes since the islands run in daemonic processes.
+    :param islands: List of initial populations (lists of individuals, 2-D numpy arrays or Populations)
+    :param fitness_function: Callable, scalar or batch fitness function (see tools.fitness)
+    :param strategy: Callable, an evolve_* function called as strategy(pop, fitness, *strategy_args)
+    :param strategy_args: Tuple of the remaining arguments of strategy, e.g (n_parents, mutation) for evolve_best
+    :param generations: Integer, number of generations to evolve each island
+    :param migration_interval: Integer, number of generations between migrations
+    :param n_migrants: Integer, number of individuals each island sends to each of its neighbours
+    :param topology: String, one of 'ring', 'full' or 'random'
+    :param batch: Boolean, True if fitness_function scores a whole genome matrix at once
+    :param seed: Optional integer, seed of the random generators of the islands and of the random topology
+    :return: List of (Population, fitness) tuples, one per island, each population of the type of its initial one
+    """
+    if topology not in TOPOLOGIES:
+        raise ValueError("Unknown topology '{}', expected one of {}".format(topology, TOPOLOGIES))
+    seed_sequence = np.random.SeedSequence(seed)
+    topology_seed = int(seed_sequence.generate_state(1)[0])
+    island_seeds = seed_sequence.spawn(len(islands))
+
+    context = multiprocessing.get_context()
+    inboxes = [context.Queue() for _ in islands]
+    results = context.Queue()
+    processes = []
+    # Populations as passed in, the evolved islands are returned with the same type and attributes, e.g the number of
+    # bits of a BinaryPopulation or the alphabet of a CharPopulation
+    initial = [population.as_population(individuals) for individuals in islands]
+    for index, pop in enumerate(initial):
+        config = dict(index=index, genomes=pop.genomes, template=pop._new(pop.genomes[:0]),
+                      fitness_function=fitness_function, strategy=strategy, strategy_args=tuple(strategy_args),
+                      generations=generations, migration_interval=migration_interval, n_migrants=n_migrants,
+                      topology=topology, batch=batch, seed=island_seeds[index], topology_seed=topology_seed)
+        process = context.Process(target=_island_worker, args=(config, inboxes, results), daemon=True)
+        process.start()
+        processes.append(process)
+
+    evolved = [None] * len(islands)
+    try:
+        remaining = len(islands)
+        while remaining:
+            try:
+                message = results.get(timeout=1.)
+            except queue.Empty:
+                if any(process.exitcode not in (None, 0) for process in processes):
+                    raise RuntimeError("An island process died unexpectedly")
+                continue
+            if message[0] == "error":
+                raise RuntimeError("Island {} failed:\n{}".format(message[1], message[2]))
+            _, index, genomes, island_fitness = message
+            evolved[index] = (initial[index]._new(genomes), island_fitness)
+            remaining -= 1
+    finally:
+        for process in processes:
+            if process.is_alive() and any(result is None for result in evolved):
+                process.terminate()
+            process.join()
+    return evolved
+
+
+def _island_worker(config, inboxes, results):
+    """
+    Process entrypoint, evolve one island and exchange migrants with the other islands.
+    """
+    index = config["index"]
+    try:
+        # Independent stream per island, the random module is seeded too for user supplied callables
+        rng.seed(config["seed"])
+        random.seed(int(config["seed"].generate_state(1)[0]))
+        pop = config["template"]._new(config["genomes"])
+        island_fitness = fit.evaluate(pop, config["fitness_function"], config["batch"])
+        pending = {}  # Migrants received ahead of time, by migration epoch
+        epoch = 0
+        for generation in range(1, config["generations"] + 1):
+            pop = config["strategy"](pop, island_fitness, *config["strategy_args"])
+            island_fitness = fit.evaluate(pop, config["fitness_function"], config["batch"])
+            if generation % config["migration_interval"] == 0:
+                plan = migration_plan(config["topology"], len(inboxes), epoch, config["topology_seed"])
+                island_fitness = _migrate(pop, island_fitness, index, epoch, plan, config["n_migrants"], inboxes,
+                                          pending)
+                epoch += 1
+        results.put(("result", index, pop.genomes, island_fitness))
+    except Exception:
+        results.put(("error", index, traceback.format_exc()))
+
+
+def _migrate(pop, island_fitness, index, epoch, plan, n_migrants, inboxes, pending):
+    """
+    Send the best individuals to the destinations of this island and replace the worst individuals with the migrants
+    received from its sources.
+    :return: List of fitness values of the population after migration
+    """
+    best = selection.sel_best(island_fitness, n_migrants)
+    genomes = np.ascontiguousarray(pop.genomes[best])
+    migrant_fitness = np.asarray(island_fitness, dtype=float)[best]
+    for source, destination in plan:
+        if source == index:
+            inboxes[destination].put((epoch, index, genomes.dtype.str, genomes.shape, genomes.tobytes(),
+                                      migrant_fitness.tobytes()))
+
+    n_sources = sum(1 for source, destination in plan if destination == index)
+    received = pending.pop(epoch, [])
+    while len(received) < n_sources:
+        message = inboxes[index].get()
+        if message[0] == epoch:
+            received.append(message)
+        else:
+            pending.setdefault(message[0], []).append(message)
+
+    # Migrants arrive in any order (e.g with the full topology), apply them by source island so that seeded runs are
+    # reproducible
+    received.sort(key=lambda message: message[1])
+    island_fitness = list(island_fitness)
+    for _, _, dtype, shape, genome_bytes, fitness_bytes in received:
+        migrants = np.frombuffer(genome_bytes, dtype=dtype).reshape(shape)
+        worst = selection.sel_worst(island_fitness, len(migrants))
+        pop.genomes[worst] = migrants
+        for i, value in zip(worst, np.frombuffer(fitness_bytes, dtype=float).tolist()):
+            island_fitness[i] = value
+    return island_fitness
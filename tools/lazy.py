@@ -0,0 +1,194 @@
+import numpy as np
+
+from tools import population
+
+"""
+Lazy children.
+
+Breeding a generation eagerly gathers both parents of every pair into genome matrices, crosses them into two children
+of which only the first is kept, and then overwrites the rows of the elite. For wide genomes most of the time is
+spent moving genes around.
+
+LazyChildren records each child as a recipe instead: the indexes of its two parents in the parent population, the
+crossover as a packed bit mask (one bit per gene, the genes taken from the second parent) or a cut point, and the
+mutations as sparse (row, gene, value) deltas. The genome matrix is built in a single pass on first access to
+'genomes', e.g when the fitness is evaluated, and the unused sibling is never computed. Rows copied by elitism just
+point at their source row, and 'take' or indexing a single row only builds the requested rows.
+
+LazyChildren is a Population: every operator reading 'genomes' works on it unchanged, it is simply materialized
+first. The parent population must not be modified until the children are materialized, which holds in the evolve
+loop since the parents are replaced by the children. Breeding into a DoubleBuffer is always eager.
+"""
+
+
+class LazyChildren(population.Population):
+    """
+    Children of a parent population built from their recipe on first access to their genomes.
+    """
+    __slots__ = ("source", "parents1", "parents2", "mask", "co_points", "_deltas", "_genomes")
+
+    def __init__(self, source, parents1, parents2, mask=None, co_points=None):
+        """
+        :param source: Population of the parents, see 'supports'
+        :param parents1: numpy array, index of the first parent of each child
+        :param parents2: numpy array, index of the second parent of each child
+        :param mask: Optional numpy array of uint8, packed bits (np.packbits along the genes) set for the genes taken
+        from the second parent
+        :param co_points: Optional numpy array, cut point of each child, the genes from the cut point on are taken from
+        the second parent. Without mask and co_points the children are copies of their first parent.
+        """
+        self.source = source
+        self.parents1 = np.asarray(parents1, dtype=np.intp)
+        self.parents2 = np.asarray(parents2, dtype=np.intp)
+        self.mask = mask
+        self.co_points = co_points
+        self._deltas = []
+        self._genomes = None
+
+    @property
+    def genomes(self):
+        if self._genomes is None:
+            self._genomes = self._build(None)
+            # The recipe is not needed anymore, release the references to the parents
+            self.source = self.mask = self.co_points = None
+            self._deltas = []
+        return self._genomes
+
+    @genomes.setter
+    def genomes(self, genomes):
+        self._genomes = genomes
+
+    @property
+    def materialized(self):
+        return self._genomes is not None
+
+    @property
+    def n_genes(self):
+        return self._genomes.shape[1] if self.materialized else self.source.n_genes
+
+    @property
+    def dtype(self):
+        return self._genomes.dtype if self.materialized else self.source.dtype
+
+    def __len__(self):
+        return len(self._genomes) if self.materialized else len(self.parents1)
+
+    def __getitem__(self, index):
+        if not self.materialized and isinstance(index, (int, np.integer)):
+            return self._build(np.array([index], dtype=np.intp))[0]
+        return self.genomes[index]
+
+    def __repr__(self):
+        return "LazyChildren(n_individuals={}, n_genes={}, materialized={})".format(len(self), self.n_genes,
+                                                                                   self.materialized)
+
+    def take(self, index):
+        """
+        Return a new population made of the rows 'index', built without materializing the other rows.
+        :param index: List of integers (indexes of individuals)
+        :return: Population
+        """
+        if self.materialized:
+            return super().take(index)
+        return self._new(self._build(np.asarray(index, dtype=np.intp)))
+
+    def copy_rows(self, rows, sources):
+        """
+        Make the children 'rows' copies of the parents 'sources', e.g the elite, dropping their crossover and
+        mutations. Only possible before the children are materialized.
+        :param rows: numpy array of row indexes
+        :param sources: numpy array of indexes in the parent population
+        """
+        if self.materialized:
+            raise ValueError("The children are already materialized, copy the rows of the parent population instead")
+        rows = np.asarray(rows, dtype=np.intp)
+        self.parents1[rows] = sources
+        self.parents2[rows] = sources
+        copied = np.zeros(len(self.parents1), dtype=bool)
+        copied[rows] = True
+        self._deltas = [(kind, delta_rows[keep], genes[keep], values[keep])
+                        for kind, delta_rows, genes, values in self._deltas
+                        for keep in [~copied[delta_rows]]]
+
+    def add(self, rows, genes, values):
+        """
+        Add values to genes, e.g Gaussian perturbations.
+        :param rows: numpy array of row indexes
+        :param genes: numpy array of gene indexes
+        :param values: numpy array, the value added to genes[i] of row rows[i]
+        """
+        if self.materialized:
+            np.add.at(self._genomes, (rows, genes), values)
+        else:
+            self._deltas.append(("add", np.asarray(rows), np.asarray(genes), np.asarray(values)))
+
+    def set(self, rows, genes, values):
+        """
+        Set the value of genes, e.g random resetting.
+        :param rows: numpy array of row indexes
+        :param genes: numpy array of gene indexes
+        :param values: numpy array, the new value of genes[i] of row rows[i]
+        """
+        if self.materialized:
+            self._genomes[rows, genes] = values
+        else:
+            self._deltas.append(("set", np.asarray(rows), np.asarray(genes), np.asarray(values)))
+
+    def _build(self, rows):
+        """
+        :param rows: numpy array of the rows to build, None for all the rows
+        :return: numpy array, the genome matrix of the rows
+        """
+        parents1 = self.parents1 if rows is None else self.parents1[rows]
+        parents2 = self.parents2 if rows is None else self.parents2[rows]
+        genomes = self.source.genomes.take(parents1, axis=0)
+        n_genes = genomes.shape[1]
+        if self.mask is not None:
+            mask = np.unpackbits(self.mask if rows is None else self.mask[rows], axis=1, count=n_genes).view(bool)
+            np.copyto(genomes, self.source.genomes.take(parents2, axis=0), where=mask)
+        elif self.co_points is not None:
+            co_points = self.co_points if rows is None else self.co_points[rows]
+            tail = np.arange(n_genes) >= co_points[:, None]
+            np.copyto(genomes, self.source.genomes.take(parents2, axis=0), where=tail)
+        for kind, delta_rows, genes, values in self._deltas:
+            if rows is not None:
+                positions, delta = _positions(rows, delta_rows)
+                delta_rows, genes, values = positions, genes[delta], values[delta]
+            if kind == "add":
+                np.add.at(genomes, (delta_rows, genes), values)
+            else:
+                genomes[delta_rows, genes] = values
+        return genomes
+
+
+def supports(individuals):
+    """
+    Check if the children of individuals can be bred lazily: only plain Population are, the populations with extra
+    attributes (BinaryPopulation, CharPopulation, SharedPopulation...) are bred eagerly.
+    :param individuals: Object
+    :return: Boolean
+    """
+    return type(individuals) is population.Population or isinstance(individuals, LazyChildren)
+
+
+def is_lazy(obj):
+    """
+    Check if obj is LazyChildren not materialized yet
+    :param obj: Object
+    :return: Boolean
+    """
+    return isinstance(obj, LazyChildren) and not obj.materialized
+
+
+def _positions(rows, delta_rows):
+    """
+    Match the rows of deltas to the positions of the requested rows (which may repeat).
+    :return: Tuple of numpy arrays (position in rows, index of the delta) of every match
+    """
+    order = np.argsort(rows, kind="stable")
+    sorted_rows = rows[order]
+    low = np.searchsorted(sorted_rows, delta_rows, side="left")
+    counts = np.searchsorted(sorted_rows, delta_rows, side="right") - low
+    delta = np.repeat(np.arange(len(delta_rows)), counts)
+    offsets = np.arange(len(delta)) - np.repeat(np.cumsum(counts) - counts, counts)
+    return order[np.repeat(low, counts) + offsets], delta
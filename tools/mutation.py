@@ -1,5 +1,9 @@
-import random
+import numpy as np
 
+from tools import genome
+from tools import lazy
+from tools import population
+from tools import rng
 
 """
 Mutation is the process of changing a gene of an individual by random chance.
@@ -8,27 +12,78 @@ Ideally each individual should have its own mutation function.
 
 Here is a list of possible mutation strategies:
 Perturbation: Change at random some gene of the individual by perturbing its value.
+Self-adaptive perturbation: Perturb the genes with a step size carried by the individual as its last gene.
+Bit flip: Flip at random some bit of a binary individual.
+Random resetting: Replace at random some gene by a value drawn from the sample space, e.g a character.
 Swap: Choose two genes and swap their position.
 Scramble: Choose a random length segment and interchange genes in this segment.
 Inversion: Choose a random length segment and reverse the order of genes in it.
+
+The perturbation methods also accept a Population (or 2-D numpy array), in which case every gene of every individual
+is mutated in place using a single mask drawn for the whole genome matrix. Given a DoubleBuffer the mask is drawn
+block of rows by block of rows into the scratch space of the buffer. LazyChildren not materialized yet (see
+tools.lazy) only record the mutated genes and their new values: the mutated positions are drawn directly, without a
+mask over the whole genome matrix.
+
+Compact genomes (see tools.genome) are mutated in place on their numpy array, binary genomes with XOR masks on their
+packed bits.
+
+Swap, scramble and inversion only move genes, hence permutations (order encoding) stay valid. Given a Population
+every row is mutated, with its own segment, in one vectorized call.
+
+With return_changed=True the perturbation, bit flip and swap mutations also return which genes they changed,
+e.g for a delta fitness (see evolve.evolve_delta): a numpy array of gene indexes for a single individual, a tuple
+(rows, genes) of numpy arrays for a Population, sorted by row then gene.
 """
 
-def mut_uniform(individual, mut_prob, range_max, range_min):
+
+def mut_uniform(individual, mut_prob, range_max, range_min, buffer=None, return_changed=False):
     """
     Mutate an individual of genes with float values.
     :param individual: List of values
     :param mut_prob: Double, probability for mutation
     :param range_max: Float, maximum constraint
     :param range_min: Float, minimum constraint
-    :return: List
+    :param buffer: Optional DoubleBuffer providing the scratch space (matrix individuals only)
+    :param return_changed: Boolean, also return the indexes of the mutated genes
+    :return: List, or (List, changed indexes) if return_changed
     """
-    for i, val in enumerate(individual):
-        if random.random() <= mut_prob:
-            individual[i] = range_min + (range_max - range_min) * random.random()
-    return individual
+    if lazy.is_lazy(individual):
+        rows, genes = _sparse_genes(len(individual), individual.n_genes, mut_prob)
+        individual.set(rows, genes, range_min + (range_max - range_min) * rng.get().random(len(rows)))
+        return _result(individual, (rows, genes), return_changed)
+    if population.is_matrix(individual):
+        genomes = population.genomes(individual)
+        if buffer is not None:
+            changed = []
+            for start, stop in buffer.blocks(len(genomes)):
+                mask = buffer.random_mask(stop - start, mut_prob, inclusive=True)
+                rows = genomes[start:stop]
+                rows[mask] = range_min + (range_max - range_min) * rng.get().random(np.count_nonzero(mask))
+                if return_changed:
+                    changed.append(_block_changed(mask, start))
+            return _result(individual, _concatenate_changed(changed), return_changed)
+        mask = rng.get().random(genomes.shape) <= mut_prob
+        genomes[mask] = range_min + (range_max - range_min) * rng.get().random(np.count_nonzero(mask))
+        return _result(individual, mask, return_changed)
+    if genome.is_array_genome(individual):
+        mask = rng.random(len(individual)) <= mut_prob
+        if isinstance(individual, genome.IntegerGenome):
+            # Integers drawn uniformly from [range_min, range_max]
+            individual.genes[mask] = rng.get().integers(range_min, range_max, size=np.count_nonzero(mask),
+                                                        endpoint=True)
+        else:
+            individual.genes[mask] = range_min + (range_max - range_min) * rng.random(np.count_nonzero(mask))
+        return _result(individual, mask, return_changed)
+    mutate = np.flatnonzero(rng.random(len(individual)) <= mut_prob)
+    values = (range_min + (range_max - range_min) * rng.random(len(mutate))).tolist()
+    for i, value in zip(mutate.tolist(), values):
+        individual[i] = value
+    return (individual, mutate) if return_changed else individual
 
 
-def mut_gauss(individual: list, mut_prob: float, perturb_size=1., mu=0., sigma=0.1):
+def mut_gauss(individual: list, mut_prob: float, perturb_size=1., mu=0., sigma=0.1, buffer=None,
+              return_changed=False):
     """
     Mutate an individual using a Gaussian distribution.
     This function assume the individual genes are a list of floats.
@@ -37,9 +92,335 @@ def mut_gauss(individual: list, mut_prob: float, perturb_size=1., mu=0., sigma=0
     :param perturb_size: Float, size of perturbation
     :param mu: mean for the gaussian distribution
     :param sigma: the standard deviation
-    :return: List
+    :param buffer: Optional DoubleBuffer providing the scratch space (matrix individuals only)
+    :param return_changed: Boolean, also return the indexes of the mutated genes
+    :return: List, or (List, changed indexes) if return_changed
+    """
+    if lazy.is_lazy(individual):
+        rows, genes = _sparse_genes(len(individual), individual.n_genes, mut_prob)
+        individual.add(rows, genes, perturb_size * rng.get().normal(mu, sigma, len(rows)))
+        return _result(individual, (rows, genes), return_changed)
+    if population.is_matrix(individual):
+        genomes = population.genomes(individual)
+        if buffer is not None:
+            changed = []
+            for start, stop in buffer.blocks(len(genomes)):
+                mask = buffer.random_mask(stop - start, mut_prob, inclusive=True)
+                rows = genomes[start:stop]
+                rows[mask] += perturb_size * rng.get().normal(mu, sigma, np.count_nonzero(mask))
+                if return_changed:
+                    changed.append(_block_changed(mask, start))
+            return _result(individual, _concatenate_changed(changed), return_changed)
+        mask = rng.get().random(genomes.shape) <= mut_prob
+        genomes[mask] += perturb_size * rng.get().normal(mu, sigma, np.count_nonzero(mask))
+        return _result(individual, mask, return_changed)
+    if genome.is_array_genome(individual):
+        mask = rng.random(len(individual)) <= mut_prob
+        perturbations = perturb_size * rng.get().normal(mu, sigma, np.count_nonzero(mask))
+        if isinstance(individual, genome.IntegerGenome):
+            # Integer genes are perturbed by the rounded perturbation
+            perturbations = np.rint(perturbations).astype(individual.dtype)
+        individual.genes[mask] += perturbations
+        return _result(individual, mask, return_changed)
+    mutate = np.flatnonzero(rng.random(len(individual)) <= mut_prob)
+    perturbations = rng.get().normal(mu, sigma, len(mutate)).tolist()
+    for i, perturbation in zip(mutate.tolist(), perturbations):
+        individual[i] = individual[i] + perturb_size * perturbation
+    return (individual, mutate) if return_changed else individual
+
+
+def mut_self_adaptive(individual, mut_prob=1., tau=None, min_sigma=1e-10):
+    """
+    Self-adaptive Gaussian mutation: the last gene of the individual is its own mutation step size sigma. It is first
+    mutated log-normally, sigma * exp(tau * N(0, 1)), then every other gene is perturbed with probability mut_prob
+    by N(0, sigma). The step sizes of the children that survive survive with them, hence sigma adapts to the fitness
+    landscape without a schedule (see tools.adaptive.with_step_sizes to append the step size gene).
+    :param individual: List, numpy array, FloatGenome or Population of floats (every row mutated with its own sigma)
+    :param mut_prob: Float, probability for mutation of each gene other than the step size
+    :param tau: Float, learning rate of the step size, defaults to 1 / sqrt(number of genes)
+    :param min_sigma: Float, lower bound of the step size
+    :return: The mutated individual
+    """
+    if population.is_matrix(individual):
+        genes = population.genomes(individual)
+    elif genome.is_array_genome(individual):
+        genes = individual.genes
+    elif isinstance(individual, np.ndarray):
+        genes = individual
+    else:
+        mutated = mut_self_adaptive(np.array(individual, dtype=float), mut_prob, tau, min_sigma)
+        individual[:] = mutated.tolist()
+        return individual
+    rows = genes.reshape(-1, genes.shape[-1])
+    n_genes = rows.shape[1] - 1
+    tau = 1 / np.sqrt(max(1, n_genes)) if tau is None else tau
+    generator = rng.get()
+    sigma = np.maximum(rows[:, -1] * np.exp(tau * generator.standard_normal(len(rows))), min_sigma)
+    rows[:, -1] = sigma
+    mutated_rows, mutated_genes = np.nonzero(generator.random((len(rows), n_genes)) <= mut_prob)
+    rows[mutated_rows, mutated_genes] += sigma[mutated_rows] * generator.standard_normal(len(mutated_rows))
+    return individual
+
+
+def mut_reset(individual, mut_prob, sample_space=None, return_changed=False):
+    """
+    Random resetting: replace each gene with probability mut_prob by a value drawn from the sample space, e.g the
+    characters of a string genome. Given a Population the replacement values of all the genes are drawn at once.
+    :param individual: List, numpy array, IntegerGenome or Population (e.g CharPopulation)
+    :param mut_prob: Float, probability for mutation
+    :param sample_space: List or numpy array of values, defaults to the alphabet of a CharPopulation
+    :param return_changed: Boolean, also return the indexes of the reset genes
+    :return: The mutated individual, or (individual, changed indexes) if return_changed
     """
-    for i, val in enumerate(individual):
-        if random.random() <= mut_prob:
-            individual[i] = val + perturb_size * random.gauss(mu, sigma)
+    if sample_space is None:
+        sample_space = individual.alphabet
+    generator = rng.get()
+    if lazy.is_lazy(individual):
+        rows, genes = _sparse_genes(len(individual), individual.n_genes, mut_prob)
+        individual.set(rows, genes, generator.choice(np.asarray(sample_space, dtype=individual.dtype), size=len(rows)))
+        return _result(individual, (rows, genes), return_changed)
+    if population.is_matrix(individual) or genome.is_array_genome(individual) or isinstance(individual, np.ndarray):
+        genes = population.genomes(individual) if population.is_matrix(individual) \
+            else getattr(individual, "genes", individual)
+        mask = generator.random(genes.shape) <= mut_prob
+        genes[mask] = generator.choice(np.asarray(sample_space, dtype=genes.dtype), size=np.count_nonzero(mask))
+        return _result(individual, mask, return_changed)
+    mutate = np.flatnonzero(rng.random(len(individual)) <= mut_prob)
+    values = generator.integers(0, len(sample_space), size=len(mutate)).tolist()
+    for i, value in zip(mutate.tolist(), values):
+        individual[i] = sample_space[value]
+    return (individual, mutate) if return_changed else individual
+
+
+def mut_flip(individual, mut_prob, return_changed=False):
+    """
+    Flip each bit of a binary individual with probability mut_prob.
+    For a BinaryGenome or BinaryPopulation only the number of flips is drawn per bit, the flipped positions are then
+    XORed into the packed bits, hence the cost is proportional to the number of flips.
+    :param individual: List, 2-D numpy array or Population of 0/1 values, BinaryGenome or BinaryPopulation
+    :param mut_prob: Float, probability for mutation
+    :param return_changed: Boolean, also return the indexes of the flipped bits
+    :return: The mutated individual, or (individual, changed indexes) if return_changed
+    """
+    if genome.is_binary(individual):
+        packed = individual.packed if isinstance(individual, genome.BinaryGenome) else individual.genomes
+        n_bits = individual.n_bits
+        total = packed.size // packed.shape[-1] * n_bits
+        generator = rng.get()
+        flips = np.sort(generator.choice(total, size=generator.binomial(total, mut_prob), replace=False))
+        rows, bits = np.divmod(flips, n_bits)
+        masks = (0x80 >> (bits & 7)).astype(np.uint8)
+        np.bitwise_xor.at(packed, (rows, bits >> 3) if packed.ndim == 2 else bits >> 3, masks)
+        return _result(individual, (rows, bits) if packed.ndim == 2 else bits, return_changed)
+    if population.is_matrix(individual) or genome.is_array_genome(individual):
+        genes = population.genomes(individual) if population.is_matrix(individual) else individual.genes
+        mask = rng.get().random(genes.shape) <= mut_prob
+        if genes.dtype == bool:
+            genes ^= mask
+        else:
+            genes[mask] = 1 - genes[mask]
+        return _result(individual, mask, return_changed)
+    mutate = np.flatnonzero(rng.random(len(individual)) <= mut_prob)
+    for i in mutate.tolist():
+        individual[i] = 1 - individual[i]
+    return (individual, mutate) if return_changed else individual
+
+
+def mut_swap(individual, mut_prob, return_changed=False):
+    """
+    Swap mutation of a permutation: each gene is swapped with probability mut_prob with a gene at a random position.
+    :param individual: List, numpy array, IntegerGenome or Population (every row mutated in place)
+    :param mut_prob: Float, probability for mutation of each gene
+    :param return_changed: Boolean, also return the indexes of the moved genes
+    :return: The mutated individual, or (individual, changed indexes) if return_changed
+    """
+    genes = _permutation_genes(individual)
+    generator = rng.get()
+    if genes is not None and genes.ndim == 2:
+        n_rows, size = genes.shape
+        swaps = generator.random(genes.shape) <= mut_prob
+        others = generator.integers(0, size - 1, size=genes.shape)
+        others += others >= np.arange(size)  # never swap a gene with itself
+        # One column at a time for all the rows, same result as swapping gene by gene within each row
+        for i in np.flatnonzero(swaps.any(axis=0)).tolist():
+            rows = np.flatnonzero(swaps[:, i])
+            j = others[rows, i]
+            genes[rows, i], genes[rows, j] = genes[rows, j], genes[rows, i]
+        if return_changed:
+            # Both ends of every swap, each gene reported once
+            moved = np.zeros(genes.shape, dtype=bool)
+            moved[swaps] = True
+            moved[np.nonzero(swaps)[0], others[swaps]] = True
+            return individual, np.nonzero(moved)
+        return individual
+    genes = individual if genes is None else genes
+    size = len(genes)
+    mutate = np.flatnonzero(rng.random(size) <= mut_prob)
+    others = generator.integers(0, size - 1, size=len(mutate))
+    others += others >= mutate
+    for i, j in zip(mutate.tolist(), others.tolist()):
+        genes[i], genes[j] = genes[j], genes[i]
+    if return_changed:
+        return individual, np.union1d(mutate, others)
+    return individual
+
+
+def mut_inversion(individual, mut_prob=1.):
+    """
+    Inversion mutation of a permutation: reverse the order of the genes of a random segment.
+    :param individual: List, numpy array, IntegerGenome or Population (every row mutated in place)
+    :param mut_prob: Float, probability for the individual (each row of a Population) to be mutated
+    :return: The mutated individual
+    """
+    genes = _permutation_genes(individual)
+    if genes is not None and genes.ndim == 2:
+        rows, start, stop, segment = _mutated_segments(genes.shape, mut_prob)
+        positions = np.broadcast_to(np.arange(genes.shape[1]), (len(rows), genes.shape[1]))
+        positions = np.where(segment, start[:, None] + stop[:, None] - 1 - positions, positions)
+        genes[rows] = np.take_along_axis(genes[rows], positions, axis=1)
+        return individual
+    genes = individual if genes is None else genes
+    if rng.random(1)[0] <= mut_prob:
+        start, stop = _segment(len(genes))
+        genes[start:stop] = genes[start:stop][::-1]
     return individual
+
+
+def mut_scramble(individual, mut_prob=1.):
+    """
+    Scramble mutation of a permutation: shuffle the genes of a random segment.
+    :param individual: List, numpy array, IntegerGenome or Population (every row mutated in place)
+    :param mut_prob: Float, probability for the individual (each row of a Population) to be mutated
+    :return: The mutated individual
+    """
+    genes = _permutation_genes(individual)
+    if genes is not None and genes.ndim == 2:
+        rows, start, stop, segment = _mutated_segments(genes.shape, mut_prob)
+        positions = np.arange(genes.shape[1], dtype=float)
+        # Random sort keys within [start, stop) shuffle the segment and leave the other genes in place
+        keys = start[:, None] + rng.get().random(segment.shape) * (stop - start)[:, None]
+        positions = np.argsort(np.where(segment, keys, positions), axis=1)
+        genes[rows] = np.take_along_axis(genes[rows], positions, axis=1)
+        return individual
+    genes = individual if genes is None else genes
+    if rng.random(1)[0] <= mut_prob:
+        start, stop = _segment(len(genes))
+        genes[start:stop] = [genes[i] for i in (start + rng.get().permutation(stop - start)).tolist()]
+    return individual
+
+
+def mut_default(individual, mut_prob=0.01, buffer=None, return_changed=False):
+    """
+    Default mutation of a genome matrix, chosen by the kind of genes so they keep their type: bit flip for a
+    BinaryPopulation, boolean or 0/1 integer genes, random resetting to the alphabet of a CharPopulation, Gaussian
+    perturbation of float genes, swaps of permutations (every row holding the same distinct values), random resetting
+    within the range of the values of other integer genes and to the values present for other genes (e.g characters).
+    LazyChildren are classified from their parents and stay lazy with Gaussian perturbation or random resetting.
+    :param individual: Population or 2-D numpy array, mutated in place
+    :param mut_prob: Float, probability for mutation of each gene
+    :param buffer: Optional DoubleBuffer providing the scratch space of the Gaussian mutation
+    :param return_changed: Boolean, also return the (rows, genes) changed
+    :return: The mutated individual, or (individual, changed indexes) if return_changed
+    """
+    if isinstance(individual, genome.BinaryPopulation):
+        return mut_flip(individual, mut_prob, return_changed=return_changed)
+    if isinstance(individual, genome.CharPopulation):
+        return mut_reset(individual, mut_prob, return_changed=return_changed)
+    # The dtype alone, reading the genomes would materialize LazyChildren
+    dtype = individual.dtype
+    if np.issubdtype(dtype, np.floating):
+        return mut_gauss(individual, mut_prob, buffer=buffer, return_changed=return_changed)
+    if dtype == bool:
+        return mut_flip(individual, mut_prob, return_changed=return_changed)
+    # The children hold the gene values of their parents, classify the parents of LazyChildren
+    genes = individual.source.genomes if lazy.is_lazy(individual) else population.genomes(individual)
+    if not genes.size:
+        return _result(individual, np.zeros(genes.shape, dtype=bool), return_changed)
+    integer = np.issubdtype(dtype, np.integer)
+    if integer and genes.min() >= 0 and genes.max() <= 1:
+        return mut_flip(individual, mut_prob, return_changed=return_changed)
+    if genes.shape[1] > 1 and _is_permutation(genes):
+        return mut_swap(individual, mut_prob, return_changed=return_changed)
+    # Every integer of the range if it is not larger than the genome matrix, otherwise the values present (e.g the
+    # characters of string genomes)
+    low, high = (genes.min(), genes.max()) if integer else (0, genes.size)
+    values = np.arange(low, high + 1, dtype=dtype) if high - low < genes.size else np.unique(genes)
+    return mut_reset(individual, mut_prob, sample_space=values, return_changed=return_changed)
+
+
+def _is_permutation(genes):
+    """
+    :param genes: 2-D numpy array
+    :return: Boolean, True if every row is a permutation of the same distinct values
+    """
+    ordered = np.sort(genes, axis=1)
+    return bool(np.all(ordered[:, 1:] != ordered[:, :-1]) and np.all(ordered == ordered[0]))
+
+
+def _permutation_genes(individual):
+    # numpy array of genes modified in place by the permutation mutations, None for lists
+    if population.is_matrix(individual):
+        return population.genomes(individual)
+    if genome.is_array_genome(individual):
+        return individual.genes
+    if isinstance(individual, np.ndarray):
+        return individual
+    return None
+
+
+def _segment(size):
+    # start and stop (exclusive) of a random non empty segment
+    start, stop = sorted(rng.get().integers(0, size, size=2).tolist())
+    return start, stop + 1
+
+
+def _mutated_segments(shape, mut_prob):
+    """
+    Draw the rows to mutate and a random non empty segment per mutated row.
+    :return: Indexes of the rows, start, stop (exclusive) and mask of the segments
+    """
+    n_rows, size = shape
+    generator = rng.get()
+    rows = np.flatnonzero(generator.random(n_rows) <= mut_prob)
+    start, stop = np.sort(generator.integers(0, size, size=(2, len(rows))), axis=0)
+    stop = stop + 1
+    positions = np.arange(size)
+    return rows, start, stop, (start[:, None] <= positions) & (positions < stop[:, None])
+
+
+def _result(individual, changed, return_changed):
+    """
+    :param individual: The mutated individual
+    :param changed: Boolean mask of the mutated genes, or the indexes as returned by the mutations
+    :param return_changed: Boolean
+    :return: individual, or (individual, changed indexes) if return_changed
+    """
+    if not return_changed:
+        return individual
+    if isinstance(changed, np.ndarray) and changed.dtype == bool:
+        changed = np.nonzero(changed) if changed.ndim == 2 else np.flatnonzero(changed)
+    return individual, changed
+
+
+def _sparse_genes(n_rows, n_genes, mut_prob):
+    """
+    Draw the genes of a (n_rows, n_genes) genome matrix mutated with probability mut_prob. Only the number of mutations
+    is drawn per gene, hence the cost is proportional to the number of mutations.
+    :return: Tuple (rows, genes) of numpy arrays, sorted by row then gene
+    """
+    total = n_rows * n_genes
+    generator = rng.get()
+    picks = np.sort(generator.choice(total, size=generator.binomial(total, mut_prob), replace=False))
+    return np.divmod(picks, n_genes)
+
+
+def _block_changed(mask, start):
+    # (rows, genes) mutated in the block of rows starting at row 'start'
+    rows, genes = np.nonzero(mask)
+    return rows + start, genes
+
+
+def _concatenate_changed(changed):
+    if not changed:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+    return np.concatenate([rows for rows, _ in changed]), np.concatenate([genes for _, genes in changed])
@@ -0,0 +1,238 @@
+import numpy as np
+
+from tools import extra
+from tools import rng
+
+"""
+Matrix backed population.
+
+The individuals of a generation are stored as the rows of a single 2-D numpy array, the genome matrix.
+Row i is individual i and column j is gene j, hence 'population[i]' behaves like 'individuals[i]' does for a list
+of lists, the difference being that each row is a view into the matrix and not a separate Python object.
+
+Every stage of the evolve loop (selection, breeding, crossover, mutation and elitism) accepts and returns a
+Population, which lets each stage operate on all genes of all individuals in a single numpy call.
+Lists of individuals are still supported, they are converted to a Population on entry and back on exit.
+
+A DoubleBuffer keeps two populations of the same shape for long runs: the children of a generation are written into
+the 'next' population while the 'current' one holds the parents, then the two are swapped. Together with the scratch
+space of the buffer, this makes a generation reuse the same memory instead of allocating new genome matrices.
+"""
+
+
+class Population:
+    """
+    Population of individuals stored as a (n_individuals, n_genes) genome matrix.
+    """
+    __slots__ = ("genomes",)
+
+    def __init__(self, genomes):
+        """
+        :param genomes: 2-D numpy array (or array like), one row per individual
+        """
+        genomes = np.asarray(genomes)
+        if genomes.ndim != 2:
+            raise ValueError("The genome matrix must be 2-D, got shape {}".format(genomes.shape))
+        self.genomes = genomes
+
+    @classmethod
+    def from_list(cls, individuals, dtype=None):
+        """
+        Build a population from a list of individuals. Strings are split into their characters.
+        :param individuals: List of lists, numpy arrays or strings of equal length
+        :param dtype: Optional numpy dtype of the genome matrix
+        :return: Population
+        """
+        rows = [list(ind) if isinstance(ind, str) else ind for ind in individuals]
+        lengths = {len(row) for row in rows if hasattr(row, "__len__")}
+        if len(lengths) > 1:
+            raise ValueError("Every individual must have the same number of genes to form a genome matrix, got "
+                             "lengths {}".format(sorted(lengths)))
+        return cls(np.array(rows, dtype=dtype))
+
+    @classmethod
+    def empty(cls, n_individuals, n_genes, dtype=float):
+        """
+        Allocate an uninitialised population.
+        :param n_individuals: Integer
+        :param n_genes: Integer
+        :param dtype: numpy dtype of the genome matrix
+        :return: Population
+        """
+        return cls(np.empty((n_individuals, n_genes), dtype=dtype))
+
+    @property
+    def n_genes(self):
+        return self.genomes.shape[1]
+
+    @property
+    def dtype(self):
+        return self.genomes.dtype
+
+    def __len__(self):
+        return self.genomes.shape[0]
+
+    def __getitem__(self, index):
+        return self.genomes[index]
+
+    def __setitem__(self, index, value):
+        self.genomes[index] = value
+
+    def __iter__(self):
+        return iter(self.genomes)
+
+    def __repr__(self):
+        return "Population(n_individuals={}, n_genes={}, dtype={})".format(len(self), self.n_genes, self.dtype)
+
+    def take(self, index):
+        """
+        Return a new population made of the rows 'index' (copied).
+        :param index: List of integers (indexes of individuals)
+        :return: Population
+        """
+        return self._new(self.genomes[np.asarray(index, dtype=np.intp)])
+
+    def copy(self):
+        return self._new(self.genomes.copy())
+
+    def _new(self, genomes):
+        """
+        Population of the same kind as this one holding 'genomes', overridden by populations with extra attributes.
+        """
+        return Population(genomes)
+
+    def tolist(self):
+        """
+        :return: List of lists, one list of genes per individual
+        """
+        return self.genomes.tolist()
+
+
+def is_population(obj):
+    """
+    Check if obj is a Population
+    :param obj: Object
+    :return: Boolean
+    """
+    return isinstance(obj, Population)
+
+
+def is_matrix(obj):
+    """
+    Check if obj is a Population or a 2-D numpy array, i.e. if the vectorized operators can be used.
+    :param obj: Object
+    :return: Boolean
+    """
+    return is_population(obj) or (extra.is_numpy(obj) and obj.ndim == 2)
+
+
+def genomes(obj):
+    """
+    Return the genome matrix of a Population, or obj itself if it already is a numpy array.
+    :param obj: Population or numpy array
+    :return: numpy array
+    """
+    return obj.genomes if is_population(obj) else obj
+
+
+def as_population(individuals):
+    """
+    Convert individuals to a Population without copying when possible.
+    :param individuals: Population, 2-D numpy array or list of individuals
+    :return: Population
+    """
+    if is_population(individuals):
+        return individuals
+    if extra.is_numpy(individuals):
+        return Population(individuals)
+    return Population.from_list(individuals)
+
+
+def restore_type(pop, reference):
+    """
+    Convert a Population back to the type of 'reference', i.e. the type passed in by the caller.
+    :param pop: Population
+    :param reference: Population, numpy array or list the population was created from
+    :return: Population, numpy array or list
+    """
+    if is_population(reference):
+        # Keep the attributes of the population passed in, e.g the alphabet of a CharPopulation
+        return pop if isinstance(pop, type(reference)) else reference._new(pop.genomes)
+    if extra.is_numpy(reference):
+        return pop.genomes
+    return pop.tolist()
+
+
+class DoubleBuffer:
+    """
+    Two preallocated populations swapped every generation, and scratch space for the operators writing into them.
+    The scratch space holds 'block' rows, operators process the population block of rows by block of rows.
+    """
+    __slots__ = ("current", "next", "_draw", "_mask", "_rows")
+
+    def __init__(self, individuals, block=1024, spare=None):
+        """
+        :param individuals: Population, 2-D numpy array or list of individuals of the first generation
+        :param block: Integer, number of rows of the scratch space
+        :param spare: Optional Population of the same shape and dtype receiving the next generation, e.g a
+        tools.shared.SharedPopulation. Defaults to a new population.
+        """
+        self.current = as_population(individuals)
+        # Populations with extra attributes (e.g packed bits) can not be written row by row as plain genome matrices
+        if type(self.current)._new is not Population._new:
+            raise ValueError("DoubleBuffer does not support {}".format(type(self.current).__name__))
+        if spare is None:
+            spare = Population(np.empty_like(self.current.genomes))
+        elif spare.genomes.shape != self.current.genomes.shape or spare.dtype != self.current.dtype:
+            raise ValueError("The spare population must have the shape and dtype of the first generation")
+        self.next = spare
+        block = max(1, min(block, len(self.current)))
+        self._draw = np.empty((block, self.current.n_genes))
+        self._mask = np.empty((block, self.current.n_genes), dtype=bool)
+        self._rows = np.empty((block, self.current.n_genes), dtype=self.current.dtype)
+
+    @property
+    def block(self):
+        return self._draw.shape[0]
+
+    def swap(self):
+        """
+        Make the next population the current one. The previous current population is overwritten by the next
+        generation, hence it must not be used after the swap.
+        """
+        self.current, self.next = self.next, self.current
+
+    def blocks(self, n_rows):
+        """
+        :param n_rows: Integer
+        :return: Generator of (start, stop) row ranges of at most 'block' rows covering n_rows rows
+        """
+        for start in range(0, n_rows, self.block):
+            yield start, min(start + self.block, n_rows)
+
+    def rows(self, n_rows):
+        """
+        :param n_rows: Integer, at most 'block'
+        :return: Scratch genome matrix with n_rows rows
+        """
+        return self._rows[:n_rows]
+
+    def mask(self, n_rows):
+        """
+        :param n_rows: Integer, at most 'block'
+        :return: Scratch boolean matrix with n_rows rows
+        """
+        return self._mask[:n_rows]
+
+    def random_mask(self, n_rows, prob, inclusive=False):
+        """
+        Draw a boolean matrix where each element is True with probability prob.
+        The mask lives in the scratch space and is overwritten by the next call.
+        :param n_rows: Integer, at most 'block'
+        :param prob: Float
+        :param inclusive: Boolean, compare the uniform draws with <= instead of <
+        :return: Scratch boolean matrix with n_rows rows
+        """
+        draw = rng.get().random(out=self._draw[:n_rows])
+        compare = np.less_equal if inclusive else np.less
+        return compare(draw, prob, out=self._mask[:n_rows])
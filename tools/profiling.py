@@ -0,0 +1,165 @@
+import contextlib
+import cProfile
+import json
+import pstats
+import time
+import tracemalloc
+from typing import Callable, Optional
+
+import numpy as np
+
+from tools import diversity as div
+
+"""
+Profiling of the evolve pipeline.
+
+Each evolve_* function runs a generation in stages: select -> breed -> mutate -> elitism, followed by
+deduplicate when given a GenomeIndex (see tools.diversity).
+Passing a Metrics object to an evolve_* function records for every stage the wall time and the number of calls,
+and for every generation statistics of the population (best and mean fitness, fitness spread and genome diversity).
+Without a Metrics object the stages run inside a shared no-op context, so the overhead is a function call per stage.
+
+Optional modes:
+trace_allocations: measure the bytes and the number of memory blocks allocated by each stage with tracemalloc (slows
+down the stages, the blocks are counted by comparing snapshots of the traced blocks). Tracing is stopped after each
+stage unless it was already on, e.g started by the caller.
+profile: run the stages under cProfile, see 'Metrics.profile_stats'.
+
+The collected metrics can be exported as a dictionary or written as JSON lines, one line per generation.
+"""
+
+_NO_STAGE = contextlib.nullcontext()
+
+
+def stage(metrics, name):
+    """
+    Context manager measuring a stage of the evolve pipeline.
+    :param metrics: Metrics or None
+    :param name: String, name of the stage
+    :return: Context manager
+    """
+    if metrics is None:
+        return _NO_STAGE
+    return metrics.stage(name)
+
+
+def diversity(pop):
+    """
+    Genotype diversity of a population: the mean distance of the individuals to the centroid of the population (see
+    diversity.centroid_distance), i.e Euclidean for float genomes and Hamming over the bits, genes or characters
+    otherwise.
+    :param pop: Population
+    :return: Float
+    """
+    return div.centroid_distance(pop)
+
+
+class Metrics:
+    """
+    Per-stage and per-generation metrics of the evolve pipeline.
+    """
+
+    def __init__(self, trace_allocations=False, profile=False, population_stats=True,
+                 on_stage: Optional[Callable] = None):
+        """
+        :param trace_allocations: Boolean, record the bytes and blocks allocated per stage with tracemalloc
+        :param profile: Boolean, run the stages under cProfile
+        :param population_stats: Boolean, record fitness and diversity statistics of every generation
+        :param on_stage: Optional callable on_stage(name, record) called when a stage ends
+        """
+        self.trace_allocations = trace_allocations
+        self.population_stats = population_stats
+        self.on_stage = on_stage
+        self.profiler = cProfile.Profile() if profile else None
+        self.totals = {}
+        self.generations = []
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """
+        Measure the code run inside the context as stage 'name' of the current generation.
+        :param name: String
+        """
+        started = False
+        if self.trace_allocations:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                started = True
+            start_snapshot = _snapshot()
+            tracemalloc.reset_peak()
+            start_memory = tracemalloc.get_traced_memory()[0]
+        if self.profiler is not None:
+            self.profiler.enable()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            if self.profiler is not None:
+                self.profiler.disable()
+            record = {"seconds": seconds}
+            if self.trace_allocations:
+                current, peak = tracemalloc.get_traced_memory()
+                record["alloc_bytes"] = current - start_memory
+                record["peak_bytes"] = peak - start_memory
+                # Blocks allocated by the stage and still alive at its end
+                record["alloc_blocks"] = sum(stat.count_diff for stat in _snapshot().compare_to(start_snapshot,
+                                                                                              "filename"))
+                if started:
+                    tracemalloc.stop()
+            self._add(name, record)
+
+    def start_generation(self, pop, fitness):
+        """
+        Start the record of a new generation.
+        :param pop: Population of the generation being evolved
+        :param fitness: List of fitness values of pop
+        """
+        record = {"generation": len(self.generations)}
+        if self.population_stats and len(fitness):
+            values = np.asarray(fitness, dtype=float)
+            record.update(best=float(values.max()), mean=float(values.mean()), std=float(values.std()),
+                          diversity=diversity(pop))
+        record["stages"] = {}
+        self.generations.append(record)
+
+    def to_dict(self):
+        """
+        :return: Dictionary with the totals per stage and the list of generation records
+        """
+        return {"stages": self.totals, "generations": self.generations}
+
+    def write_jsonl(self, file):
+        """
+        Write one JSON line per generation.
+        :param file: Path or writable text file
+        """
+        if isinstance(file, str):
+            with open(file, "w") as handle:
+                self.write_jsonl(handle)
+            return
+        for record in self.generations:
+            file.write(json.dumps(record) + "\n")
+
+    def profile_stats(self):
+        """
+        :return: pstats.Stats of the profiled stages (requires profile=True)
+        """
+        if self.profiler is None:
+            raise ValueError("Metrics was created without profile=True")
+        return pstats.Stats(self.profiler)
+
+    def _add(self, name, record):
+        total = self.totals.setdefault(name, {"calls": 0, "seconds": 0.})
+        total["calls"] += 1
+        for key, value in record.items():
+            total[key] = total.get(key, 0) + value
+        if self.generations:
+            self.generations[-1]["stages"][name] = record
+        if self.on_stage is not None:
+            self.on_stage(name, record)
+
+
+def _snapshot():
+    # Traced blocks, without those of tracemalloc itself
+    return tracemalloc.take_snapshot().filter_traces((tracemalloc.Filter(False, tracemalloc.__file__),))
@@ -0,0 +1,150 @@
+import contextlib
+
+import numpy as np
+
+"""
+Random number generation.
+
+Every operator of tools draws its random numbers from one shared numpy Generator, hence a single call to 'seed' makes
+a whole run reproducible. The generator can be replaced with 'set_generator' or temporarily with 'using'.
+
+Parallel workers must not share a stream: 'spawn' derives independent generators from a SeedSequence, one per worker,
+so that parallel runs are deterministic under a single seed no matter how the work is scheduled.
+
+Operators working on one individual at a time draw all the numbers they need for that individual in one call.
+Small draws are served from a block of numbers drawn in advance (see 'random'), which avoids the overhead of calling
+the generator for every individual.
+
+'get_state' and 'set_state' capture and restore the shared generator together with its block, e.g to resume a run
+from a checkpoint (see tools.checkpoint).
+"""
+
+BLOCK_SIZE = 4096
+
+
+class RandomBlock:
+    """
+    Uniform numbers in [0, 1) drawn 'size' at a time from a generator and handed out in slices.
+    """
+    __slots__ = ("generator", "size", "_values", "_position")
+
+    def __init__(self, generator, size=BLOCK_SIZE, values=None, position=0):
+        """
+        :param generator: numpy Generator
+        :param size: Integer, number of values drawn at once
+        :param values: Optional numpy array of 'size' values to start from instead of drawing a block, see 'set_state'
+        :param position: Integer, number of values of 'values' already handed out
+        """
+        self.generator = generator
+        self.size = size
+        self._values = generator.random(size) if values is None else values
+        self._position = position
+
+    def random(self, n):
+        """
+        :param n: Integer
+        :return: numpy array of n uniform values in [0, 1)
+        """
+        if n > self.size:
+            return self.generator.random(n)
+        if self._position + n > self.size:
+            # Draw a new block rather than refilling in place, slices handed out earlier stay valid
+            self._values = self.generator.random(self.size)
+            self._position = 0
+        values = self._values[self._position:self._position + n]
+        self._position += n
+        return values
+
+
+_generator = np.random.default_rng()
+_block = RandomBlock(_generator)
+
+
+def get():
+    """
+    :return: The shared numpy Generator
+    """
+    return _generator
+
+
+def seed(seed=None):
+    """
+    Reseed the shared generator.
+    :param seed: None (fresh entropy), integer, sequence of integers or numpy SeedSequence
+    :return: The new shared numpy Generator
+    """
+    return set_generator(np.random.default_rng(seed))
+
+
+def set_generator(generator):
+    """
+    Replace the shared generator.
+    :param generator: numpy Generator
+    :return: numpy Generator
+    """
+    global _generator, _block
+    _generator = generator
+    _block = RandomBlock(generator)
+    return generator
+
+
+@contextlib.contextmanager
+def using(generator):
+    """
+    Context manager drawing from 'generator' instead of the shared generator.
+    :param generator: numpy Generator
+    """
+    previous = _generator
+    set_generator(generator)
+    try:
+        yield generator
+    finally:
+        set_generator(previous)
+
+
+def spawn(n, seed=None):
+    """
+    Derive independent generators, e.g one per parallel worker.
+    :param n: Integer, number of generators
+    :param seed: Optional seed. None spawns the generators from the shared generator.
+    :return: List of numpy Generators
+    """
+    if seed is None:
+        return _generator.spawn(n)
+    sequence = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+    return [np.random.default_rng(child) for child in sequence.spawn(n)]
+
+
+def random(n):
+    """
+    Uniform numbers in [0, 1) from the block of the shared generator. The returned array is read only by convention,
+    it is a view into the block.
+    :param n: Integer
+    :return: numpy array of n values
+    """
+    return _block.random(n)
+
+
+def get_state():
+    """
+    State of the shared generator, including the numbers drawn in advance, e.g to checkpoint a run.
+    The state only holds dictionaries, lists, strings and numbers, i.e it can be written as JSON.
+    :return: Dictionary
+    """
+    return {"bit_generator": _generator.bit_generator.state, "block_size": _block.size,
+            "block": _block._values.tolist(), "position": _block._position}
+
+
+def set_state(state):
+    """
+    Replace the shared generator with a generator in the given state, the run then draws the same numbers as the run
+    the state was taken from.
+    :param state: Dictionary returned by 'get_state'
+    :return: The new shared numpy Generator
+    """
+    global _generator, _block
+    bit_generator = getattr(np.random, state["bit_generator"]["bit_generator"])()
+    bit_generator.state = state["bit_generator"]
+    _generator = np.random.Generator(bit_generator)
+    _block = RandomBlock(_generator, state["block_size"], np.array(state["block"], dtype=float), state["position"])
+    return _generator
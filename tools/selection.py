@@ -1,41 +1,217 @@
-import random
+import bisect
 
 import numpy as np
 
 from tools import extra
+from tools import rng
 
 """
 Selection is the process of selecting parents to generate the children of the next generation.
 The idea is that those individuals who are not selected will unfortunately succumb to the challenges of this generation,
 i.e they will not survive to the next generation.
+
+The selection methods work on numpy arrays of the fitness values. Ranking uses a partial sort (argpartition) of the k
+selected individuals, fitness proportionate methods use prefix sums searched with 'searchsorted' (a WeightedSampler
+reuses them for all the draws of a generation), and roulette selection without replacement uses the Efraimidis-Spirakis
+keys u^(1/w). Ties are broken as by sorting (fitness, index) pairs, i.e the individual with the larger index ranks first
+in descending order.
+
+A FitnessView wraps the fitness of a generation and computes its ordering (one O(n log n) sort) and its scaled weights
+once, on first use. Every selection and the elitism of a generation given the same view share them. The weights of
+fitness proportionate selection (roulette, SUS) are the fitness values by default, which must not be negative nor all 0
+(ValueError otherwise), or one of the transforms of the view:
+linear_ranking: weights depending on the rank only, from 'pressure' for the best individual to 2 - pressure for the
+worst.
+sigma: sigma scaling, the fitness minus (mean - c * standard deviation), clipped at 0.
+window: windowing, the fitness minus the worst fitness of the generation.
+boltzmann: exp((fitness - best fitness) / temperature).
+
+view = selection.FitnessView(fitness, "linear_ranking", pressure=1.7)
+parents = selection.sel_sus(view, n_parents)
+elite = selection.sel_best(view, n_elite)
+
+Multi-objective selection (NSGA-II) works on an (n_individuals, n_objectives) matrix of objective values, every
+objective being maximized like the fitness (negate the objectives to minimize). Individuals are ranked by
+non-dominated front, then by crowding distance within a front, which keeps the whole Pareto front instead of the
+optimum of a weighted sum of the objectives.
+Non-dominated sorting uses a sweep over the individuals sorted by the first objective for two objectives (Jensen,
+Kung et al.), O(n log n), and an efficient non-dominated sort with binary search over the fronts (ENS-BS) otherwise,
+O(m n^2) in the worst case but close to O(m n sqrt(n)) on typical populations.
 """
 
+class FitnessView:
+    """
+    Fitness of a generation with its ordering and transforms computed once and shared by the selections.
+    It behaves as the array of fitness values (len, indexing, iteration and numpy conversion).
+    """
+    __slots__ = ("values", "scaling", "params", "_ascending", "_transforms")
+
+    def __init__(self, fitness, scaling=None, **params):
+        """
+        :param fitness: List or numpy array of fitness values, or a FitnessView whose values are reused
+        :param scaling: Optional name of the transform giving the weights of fitness proportionate selection,
+        "linear_ranking", "sigma", "window" or "boltzmann". None uses the fitness values, which must not be negative.
+        :param params: Parameters of the transform, e.g pressure=1.7 for "linear_ranking"
+        """
+        if scaling is not None and scaling not in _SCALINGS:
+            raise ValueError("Unknown scaling {!r}, expected one of {}".format(scaling, sorted(_SCALINGS)))
+        self.values = np.asarray(fitness.values if isinstance(fitness, FitnessView) else fitness, dtype=float)
+        self.scaling = scaling
+        self.params = params
+        self._ascending = None
+        self._transforms = {}
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, index):
+        return self.values[index]
+
+    def __iter__(self):
+        return iter(self.values)
+
+    def __array__(self, dtype=None, copy=None):
+        return self.values if dtype is None else self.values.astype(dtype, copy=False)
+
+    def __repr__(self):
+        return "FitnessView(n_individuals={}, scaling={!r})".format(len(self), self.scaling)
+
+    @property
+    def ascending(self):
+        """
+        :return: numpy array, indexes from worst to best, ties ordered by index
+        """
+        if self._ascending is None:
+            self._ascending = _order(self.values, descending=False)
+        return self._ascending
+
+    @property
+    def order(self):
+        """
+        :return: numpy array, indexes from best to worst, ties ordered by descending index
+        """
+        return self.ascending[::-1]
+
+    @property
+    def ranks(self):
+        """
+        :return: numpy array, rank of each individual, 0 for the best
+        """
+        return self._cached(("ranks",), self._ranks)
+
+    @property
+    def weights(self):
+        """
+        :return: numpy array, non negative weights of fitness proportionate selection
+        """
+        if self.scaling is None:
+            return self.values
+        return getattr(self, _SCALINGS[self.scaling])(**self.params)
+
+    def best(self, size):
+        """
+        :param size: Integer
+        :return: numpy array, indexes of the 'size' best individuals from best to worst
+        """
+        return self.order[:max(0, size)]
+
+    def worst(self, size):
+        """
+        :param size: Integer
+        :return: numpy array, indexes of the 'size' worst individuals from worst to best
+        """
+        return self.ascending[:max(0, size)]
+
+    def linear_ranking(self, pressure=1.5):
+        """
+        :param pressure: Float in [1, 2], weight of the best individual, the worst one weighs 2 - pressure
+        :return: numpy array of weights, averaging 1
+        """
+        def transform():
+            n = len(self.values)
+            if n < 2:
+                return np.ones(n)
+            return (2 - pressure) + 2 * (pressure - 1) * (n - 1 - self.ranks) / (n - 1)
+        return self._cached(("linear_ranking", pressure), transform)
+
+    def sigma_scaling(self, c=2.):
+        """
+        :param c: Float, number of standard deviations below the mean fitness at which the weight is 0
+        :return: numpy array of weights
+        """
+        def transform():
+            finite = self.values[np.isfinite(self.values)]
+            if not len(finite) or finite.std() == 0:
+                return np.where(np.isfinite(self.values), 1., 0.)
+            return np.maximum(self.values - (finite.mean() - c * finite.std()), 0.)
+        return self._cached(("sigma", c), transform)
+
+    def windowing(self):
+        """
+        :return: numpy array of weights, the fitness minus the worst finite fitness
+        """
+        def transform():
+            finite = np.isfinite(self.values)
+            if not finite.any():
+                return np.ones(len(self.values))
+            weights = np.where(finite, self.values - self.values[finite].min(), 0.)
+            return weights if weights.any() else finite.astype(float)
+        return self._cached(("window",), transform)
+
+    def boltzmann(self, temperature=1.):
+        """
+        :param temperature: Float, the lower the temperature the higher the selection pressure
+        :return: numpy array of weights in [0, 1], 1 for the best individual
+        """
+        def transform():
+            finite = np.isfinite(self.values)
+            if not finite.any():
+                return np.ones(len(self.values))
+            return np.where(finite, np.exp((self.values - self.values[finite].max()) / temperature), 0.)
+        return self._cached(("boltzmann", temperature), transform)
+
+    def _ranks(self):
+        ranks = np.empty(len(self.values), dtype=np.intp)
+        ranks[self.order] = np.arange(len(self.values))
+        return ranks
+
+    def _cached(self, key, transform):
+        value = self._transforms.get(key)
+        if value is None:
+            value = self._transforms[key] = transform()
+        return value
+
+
+def as_fitness_view(fitness):
+    """
+    :param fitness: List or numpy array of fitness values, or a FitnessView
+    :return: FitnessView, fitness itself if it already is one
+    """
+    return fitness if isinstance(fitness, FitnessView) else FitnessView(fitness)
+
+
 def sel_best(fitness, size):
     """
     Return list of indexes with length 'size' in descending order [from best to worst]
-    :param fitness: List
+    :param fitness: List or FitnessView
     :param size: Integer
     :return: List with indexes of 'fitness'
     """
-    fitness_index = []
-    for i, _ in enumerate(fitness):
-        fitness_index.append(i)
-    sorted_fitness, sorted_index = extra.sort_lists(fitness, fitness_index, descending=True)
-    return [sorted_index[k] for k in range(size)]
+    if isinstance(fitness, FitnessView):
+        return fitness.best(size).tolist()
+    return _top_k(np.asarray(fitness, dtype=float), size, descending=True).tolist()
 
 
 def sel_worst(fitness, size):
     """
     Return list of indexes with length 'size' in ascending order [from worst to best]
-    :param fitness: List
+    :param fitness: List or FitnessView
     :param size: Integer
     :return: List with indexes of 'fitness'
     """
-    fitness_index = []
-    for i, _ in enumerate(fitness):
-        fitness_index.append(i)
-    sorted_fitness, sorted_index = extra.sort_lists(fitness, fitness_index, descending=False)
-    return [sorted_index[k] for k in range(size)]
+    if isinstance(fitness, FitnessView):
+        return fitness.worst(size).tolist()
+    return _top_k(np.asarray(fitness, dtype=float), size, descending=False).tolist()
 
 
 def sel_random(individuals, size, replacement=False):
@@ -47,48 +223,90 @@ def sel_random(individuals, size, replacement=False):
     :return: List with elements of 'individuals'
     """
     if extra.is_numpy(individuals):
-        return [np.random.choice(individuals, replace=replacement) for _ in range(size)]
+        return list(rng.get().choice(individuals, size=size, replace=replacement))
     else:
-        if replacement:
-            return random.choices(individuals, k=size)
-        else:
-            return random.sample(individuals, k=size)
+        index = rng.get().choice(len(individuals), size=size, replace=replacement)
+        return [individuals[i] for i in index.tolist()]
 
 
 def sel_roulette(fitness, tournaments, replace=False):
     """
     Fitness proportionate selection or roulette wheel selection.
-    Note that all fitness values should be positive
-    :param fitness: List of fitness values
+    Note that the fitness values must not be negative nor all 0, or be given as a FitnessView with a scaling
+    :param fitness: List of fitness values or FitnessView (selecting with its weights)
     :param tournaments: Integer, number of tournaments to hold
     :param replace: Boolean, select individuals with replacement (True) or unique (False)
     :return: List with indexes of 'fitness'
+    :raises ValueError: If a weight is negative or all the weights are 0
     """
-    # Create list of indexes
-    tmp_index, tmp_fitness = [], []
-    for i, val in enumerate(fitness):
-        tmp_index.append(i)
-        tmp_fitness.append(val)
-    # Normalize with regard to total fitness
-    total_fitness = sum(tmp_fitness)
-    # Draw individuals
-    sel_individuals = []
-    for tournament in range(tournaments):
-        # Get random value between [0, total_fitness)
-        i, value = 0, random.random() * total_fitness
-        while True:
-            value -= tmp_fitness[i]
-            # Check if 'tmp_index[i]' is the winner
-            if value < 0:
-                sel_individuals.append(tmp_index[i])
-                break
-            i += 1
-        if replace is False:
-            del tmp_fitness[i]
-            del tmp_index[i]
-            # Adjust interval for random number
-            total_fitness = sum(tmp_fitness)
-    return sel_individuals
+    if replace:
+        return WeightedSampler(fitness).sample(tournaments).tolist()
+    weights = _weights(fitness)
+    if tournaments > len(weights):
+        raise IndexError("Cannot draw {} unique individuals from {}".format(tournaments, len(weights)))
+    # Efraimidis-Spirakis: sorting the keys u^(1/w) in descending order is equivalent to drawing one individual at
+    # a time proportionally to its fitness and removing it from the wheel. log(u)/w is used to avoid underflow.
+    with np.errstate(divide="ignore"):
+        keys = np.log(1. - rng.get().random(len(weights))) / weights
+    return _top_k(keys, tournaments, descending=True).tolist()
+
+
+class WeightedSampler:
+    """
+    Draw indexes with probability proportional to their weight, e.g the fitness for roulette wheel selection.
+    The cumulative weights are computed once, then every draw is a binary search: build one sampler per generation
+    and draw all the indexes of the generation in one call.
+    """
+    __slots__ = ("cumulative",)
+
+    def __init__(self, weights):
+        """
+        :param weights: List or numpy array of non negative weights, not all 0, or a FitnessView (its weights)
+        :raises ValueError: If a weight is negative or all the weights are 0
+        """
+        self.cumulative = np.cumsum(_weights(weights))
+
+    def __len__(self):
+        return len(self.cumulative)
+
+    def sample(self, size):
+        """
+        Draw with replacement.
+        :param size: Integer, number of draws
+        :return: numpy array of indexes
+        """
+        # Each draw lands in the slice of the cumulative weights holding the random value
+        values = rng.get().random(size) * self.cumulative[-1]
+        return self._search(values)
+
+    def sample_pairs(self, size):
+        """
+        Draw pairs of distinct indexes, the first index with probability proportional to its weight and the second
+        proportionally among the other indexes, i.e as drawing two indexes without replacement for every pair.
+        :param size: Integer, number of pairs
+        :return: Two numpy arrays of indexes
+        """
+        n = len(self.cumulative)
+        if n < 2:
+            raise IndexError("Cannot draw pairs of distinct individuals from {}".format(n))
+        first = self.sample(size)
+        # The second draw skips the slice of the first index: values past the start of the slice are moved past its
+        # end
+        start = np.where(first > 0, self.cumulative[first - 1], 0.)
+        excluded = self.cumulative[first] - start
+        remaining = self.cumulative[-1] - excluded
+        values = rng.get().random(size) * remaining
+        values = np.where(values >= start, self.cumulative[first] + (values - start), values)
+        second = self._search(values)
+        # All the weight on the first index, the second one is drawn uniformly among the others
+        degenerate = (remaining <= 0) | (second == first)
+        if degenerate.any():
+            offsets = rng.get().integers(1, n, size=np.count_nonzero(degenerate))
+            second[degenerate] = (first[degenerate] + offsets) % n
+        return first, second
+
+    def _search(self, values):
+        return np.minimum(np.searchsorted(self.cumulative, values, side="right"), len(self.cumulative) - 1)
 
 
 def sel_sus(fitness: list, size: int) -> list:
@@ -101,65 +319,266 @@ def sel_sus(fitness: list, size: int) -> list:
 
     "https://en.wikipedia.org/wiki/Stochastic_universal_sampling"
 
-    :param fitness: List of fitness values for the population
+    :param fitness: List of fitness values for the population, or FitnessView (selecting with its weights)
     :param size: Integer
     :return: List of indexes of 'fitness'
+    :raises ValueError: If a weight is negative or all the weights are 0
     """
-    # Sort fitness in descending order
-    sorted_fitness, sorted_index = extra.sort_lists(fitness, list(range(len(fitness))), descending=True)
-    # Total fitness
-    total_fitness = sum(sorted_fitness)
-    # Normalize fitness (i.e map fitness values to the interval [0, 1])
-    sorted_fitness[:] = [fitness / total_fitness for fitness in sorted_fitness]
+    weights = _weights(fitness)
+    if isinstance(fitness, FitnessView):
+        # The transforms keep the order of the fitness values
+        sorted_index = fitness.order
+    else:
+        # Sort fitness in descending order
+        sorted_index = _order(weights, descending=True)
+    # Normalized cumulative fitness (i.e map fitness values to the interval [0, 1])
+    cumulative = np.cumsum(weights[sorted_index])
+    cumulative /= cumulative[-1]
     # Distance between the pointers to create
     distance = 1 / size
-    # Initial pointer start
-    start = random.uniform(0, distance)
-    # Pointers
-    pointers = [start + i * distance for i in range(size)]
-
-    # Perform selection
-    sel_individuals = []
-    for pointer in pointers:
-        i = 0
-        tmp_sum = sorted_fitness[i]
-        while tmp_sum < pointer:
-            i += 1
-            tmp_sum += sorted_fitness[i]
-        sel_individuals.append(sorted_index[i])
-
-    return sel_individuals
+    # Evenly spaced pointers from a random start
+    pointers = rng.get().uniform(0, distance) + distance * np.arange(size)
+    # Each pointer selects the first individual whose cumulative fitness reaches it
+    positions = np.minimum(np.searchsorted(cumulative, pointers, side="left"), len(weights) - 1)
+    return sorted_index[positions].tolist()
 
 
 def sel_tournament(fitness, tournaments, tour_size, replace=False):
     """
     Tournament selection.
-    :param fitness: List of fitness
+    :param fitness: List of fitness or FitnessView
     :param tour_size: Number of individuals participating in each tournament
     :param tournaments: Integer, number of tournaments held (if replace=True, then tournaments <= len(fitness) - 1
     :param replace: Boolean, select individuals with replacement (True) or unique (False)
     :return: List with indexes of 'fitness'
     """
-    # List of indexes
-    tmp_index, tmp_fitness = [], []
-    for i, val in enumerate(fitness):
-        tmp_index.append(i)
-        tmp_fitness.append(val)
-    # Perform tournament
+    view = fitness if isinstance(fitness, FitnessView) else None
+    fitness = np.asarray(fitness, dtype=float)
+    size = len(fitness)
+    # Individuals grouped by fitness value, in ascending index order within a group. The winner of a tournament is the
+    # remaining individual with the lowest index among those sharing the best fitness drawn.
+    order = view.ascending if view is not None else _order(fitness, descending=False)
+    new_value = np.ones(size, dtype=bool)
+    new_value[1:] = fitness[order][1:] != fitness[order][:-1]
+    group = np.empty(size, dtype=np.intp)
+    group[order] = np.cumsum(new_value) - 1
+    group_start = np.flatnonzero(new_value)
+
+    if replace:
+        # Nobody leaves the population, every tournament can be drawn at once
+        contestants = rng.get().integers(0, size, size=(tournaments, tour_size))
+        best = contestants[np.arange(tournaments), np.argmax(fitness[contestants], axis=1)]
+        return order[group_start[group[best]]].tolist()
+
+    if tournaments > size:
+        raise IndexError("Cannot hold {} tournaments with unique winners among {} individuals".format(tournaments,
+                                                                                                      size))
+    # Draw all tournaments up front as fractions of the individuals remaining at that tournament
+    draws = (rng.get().random((tournaments, tour_size)) * (size - np.arange(tournaments))[:, None]).astype(np.intp)
+    fitness, group, order = fitness.tolist(), group.tolist(), order.tolist()
+    next_in_group = group_start.tolist()
+    # Remaining individuals, removed by swapping with the last one
+    remaining = list(range(size))
+    position = list(range(size))
     sel_individuals = []
-    for tournament in range(tournaments):
-        # Draw a set of individuals from current tmp_fitness population
-        # It's OK to draw with replacement because the individual is removed if 'replace=False'
-        tour_individuals = sel_random(tmp_fitness, tour_size, replacement=True)
-        # Select best individual from tournament individuals
-        best_ind = max(tour_individuals)
-        # Append corresponding index of best performing individual to selected individuals
-        for i, val in enumerate(tmp_fitness):
-            if val == best_ind:
-                sel_individuals.append(tmp_index[i])
-                break
-        # Using replacement
-        if replace is False:
-            del tmp_index[tmp_fitness.index(best_ind)]
-            del tmp_fitness[tmp_fitness.index(best_ind)]
+    for tournament, draw in enumerate(draws.tolist()):
+        best = max((remaining[i] for i in draw), key=fitness.__getitem__)
+        g = group[best]
+        winner = order[next_in_group[g]]
+        next_in_group[g] += 1
+        sel_individuals.append(winner)
+        # Remove the winner from the remaining individuals
+        last = remaining[size - tournament - 1]
+        remaining[position[winner]] = last
+        position[last] = position[winner]
     return sel_individuals
+
+
+def non_dominated_sort(objectives):
+    """
+    Fast non-dominated sorting: the front of every individual, 0 for the individuals dominated by no other individual
+    (the Pareto front), 1 for those only dominated by front 0, etc.
+    An individual dominates another one if it is at least as good on every objective and better on one of them.
+    :param objectives: 2-D array like (n_individuals, n_objectives), every objective is maximized
+    :return: numpy array of integers, the front of each individual
+    """
+    objectives = np.asarray(objectives, dtype=float)
+    if objectives.ndim == 1:
+        objectives = objectives[:, None]
+    if len(objectives) == 0:
+        return np.empty(0, dtype=np.intp)
+    if objectives.shape[1] == 1:
+        # A single objective: the fronts are the distinct values in descending order
+        return np.unique(-objectives[:, 0], return_inverse=True)[1].reshape(-1).astype(np.intp)
+    if objectives.shape[1] == 2:
+        return _non_dominated_sort_2d(objectives)
+    return _non_dominated_sort_nd(objectives)
+
+
+def crowding_distance(objectives, fronts):
+    """
+    Crowding distance of every individual within its front: the sum over the objectives of the distance between its
+    two neighbours in the front, normalized by the range of the objective in the front. The extremes of a front get
+    an infinite distance.
+    :param objectives: 2-D array like (n_individuals, n_objectives)
+    :param fronts: numpy array, the front of each individual (see non_dominated_sort)
+    :return: numpy array of floats
+    """
+    objectives = np.asarray(objectives, dtype=float)
+    if objectives.ndim == 1:
+        objectives = objectives[:, None]
+    fronts = np.asarray(fronts)
+    n = len(fronts)
+    distance = np.zeros(n)
+    if n == 0:
+        return distance
+    for values in objectives.T:
+        # Individuals sorted by front, then by objective value: the neighbours in a front are adjacent
+        order = np.lexsort((values, fronts))
+        sorted_values, sorted_fronts = values[order], fronts[order]
+        first = np.ones(n, dtype=bool)
+        first[1:] = sorted_fronts[1:] != sorted_fronts[:-1]
+        last = np.ones(n, dtype=bool)
+        last[:-1] = first[1:]
+        starts, ends = np.flatnonzero(first), np.flatnonzero(last)
+        span = np.repeat(sorted_values[ends] - sorted_values[starts], ends - starts + 1)
+        gap = np.zeros(n)
+        gap[1:-1] = sorted_values[2:] - sorted_values[:-2]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            gap = np.where(span > 0, gap / span, 0.)
+        distance[order] += np.where(first | last, np.inf, gap)
+    return distance
+
+
+def sel_nsga2(objectives, size):
+    """
+    NSGA-II selection: the best 'size' individuals by non-dominated front, then by crowding distance (descending)
+    within the front. For (mu + lambda) survival pass the objectives of parents and children together.
+    :param objectives: 2-D array like (n_individuals, n_objectives), every objective is maximized
+    :param size: Integer
+    :return: List with indexes of 'objectives' in ranking order
+    """
+    fronts = non_dominated_sort(objectives)
+    distance = crowding_distance(objectives, fronts)
+    return np.lexsort((-distance, fronts))[:size].tolist()
+
+
+def _non_dominated_sort_2d(objectives):
+    """
+    Sweep over the individuals sorted by the first objective (descending), each front only needs the best second
+    objective of its members so far: an individual belongs to the first front whose best second objective is worse
+    than its own, found by binary search.
+    """
+    first, second = objectives[:, 0], objectives[:, 1]
+    order = np.lexsort((-second, -first))
+    fronts = np.empty(len(first), dtype=np.intp)
+    # Negated best second objective of each front, in ascending order
+    front_best = []
+    previous, front = None, 0
+    for i, point in zip(order.tolist(), objectives[order].tolist()):
+        if point != previous:
+            # Equal points do not dominate each other and share a front
+            front = bisect.bisect_right(front_best, -point[1])
+            if front == len(front_best):
+                front_best.append(-point[1])
+            else:
+                front_best[front] = -point[1]
+            previous = point
+        fronts[i] = front
+    return fronts
+
+
+def _non_dominated_sort_nd(objectives):
+    """
+    Efficient non-dominated sort with binary search (ENS-BS, Zhang et al.): the individuals are visited in
+    lexicographically descending order, so only the individuals visited before can dominate the current one. If a
+    member of front k dominates it, a member of every front before k does too, hence the first front without a member
+    dominating it is found by binary search over the fronts, each test comparing it to the members of a front at once.
+    """
+    n, m = objectives.shape
+    order = np.lexsort(-objectives.T[::-1])
+    fronts = np.empty(n, dtype=np.intp)
+    # Objectives of the members of each front, one column per member in buffers doubled when full, and their numbers
+    members, sizes = [], []
+    previous, front = None, 0
+    for i, point in zip(order.tolist(), objectives[order][:, :, None]):
+        if previous is None or not np.array_equal(point, previous):
+            # Equal points do not dominate each other and share a front
+            low, high = 0, len(members)
+            while low < high:
+                middle = (low + high) // 2
+                # Visited before and not equal: at least as good on every objective means dominating
+                if (members[middle][:, :sizes[middle]] >= point).all(axis=0).any():
+                    low = middle + 1
+                else:
+                    high = middle
+            front = low
+            if front == len(members):
+                members.append(np.empty((m, 4)))
+                sizes.append(0)
+            if sizes[front] == members[front].shape[1]:
+                members[front] = np.concatenate((members[front], np.empty_like(members[front])), axis=1)
+            members[front][:, sizes[front]] = point[:, 0]
+            sizes[front] += 1
+            previous = point
+        fronts[i] = front
+    return fronts
+
+
+def _weights(fitness):
+    """
+    :param fitness: List or numpy array of fitness values, or a FitnessView
+    :return: numpy array, weights of fitness proportionate selection
+    :raises ValueError: If a weight is negative (or NaN) or all the weights are 0
+    """
+    weights = fitness.weights if isinstance(fitness, FitnessView) else np.asarray(fitness, dtype=float)
+    if len(weights):
+        # Negative weights shift the cumulative weights off the wheel and all 0 weights always draw the same
+        # individuals, both select silently wrong individuals
+        if not weights.min() >= 0:
+            raise ValueError("Fitness proportionate selection needs non negative fitness values, select with a "
+                             "FitnessView scaling them instead, e.g FitnessView(fitness, 'window')")
+        if not weights.sum() > 0:
+            raise ValueError("Fitness proportionate selection needs a positive fitness value, select with a "
+                             "FitnessView scaling them instead, e.g FitnessView(fitness, 'window')")
+    return weights
+
+
+def _order(values, descending):
+    """
+    Indexes sorting 'values', ties ordered by index (descending order reverses the ties too).
+    :param values: numpy array
+    :param descending: Boolean
+    :return: numpy array of indexes
+    """
+    order = np.lexsort((np.arange(len(values)), values))
+    return order[::-1] if descending else order
+
+
+def _top_k(values, size, descending):
+    """
+    Indexes of the 'size' largest (descending=True) or smallest values in sorted order, without sorting every value.
+    :param values: numpy array
+    :param size: Integer
+    :param descending: Boolean
+    :return: numpy array of indexes
+    """
+    n = len(values)
+    if size >= n:
+        return _order(values, descending)
+    if size <= 0:
+        return np.empty(0, dtype=np.intp)
+    key = values if descending else -values
+    threshold = np.partition(key, n - size)[n - size]
+    above = np.flatnonzero(key > threshold)
+    ties = np.flatnonzero(key == threshold)
+    # Ties at the boundary: the larger indexes rank first in descending order, the smaller ones in ascending order
+    n_ties = size - len(above)
+    ties = ties[len(ties) - n_ties:] if descending else ties[:n_ties]
+    chosen = np.sort(np.concatenate((above, ties)))
+    return chosen[_order(values[chosen], descending)]
+
+
+# Transform of each scaling of FitnessView
+_SCALINGS = {"linear_ranking": "linear_ranking", "sigma": "sigma_scaling", "window": "windowing",
+             "boltzmann": "boltzmann"}
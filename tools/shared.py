@@ -0,0 +1,225 @@
+import atexit
+import uuid
+import weakref
+from collections import OrderedDict
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from tools import population
+
+"""
+Shared memory populations.
+
+A SharedPopulation keeps its genome matrix and a fitness vector in two multiprocessing.shared_memory segments. It is a
+Population, its 'genomes' being a numpy view of the segment, so every selection, breeding and mutation operator works
+on it unchanged. Worker processes attach to the segments by name (see SharedPopulation.attach) and read the genome
+rows without copying them, instead of unpickling the whole population every generation, and write the fitness of
+their rows into the shared fitness vector. tools.fitness.Evaluator does this for a SharedPopulation: only the names
+of the segments and row ranges are sent to the workers.
+
+The process creating a population owns its segments and unlinks them when the population is closed, garbage
+collected or the process exits (including on an uncaught exception). If the owner is killed, the resource tracker of
+multiprocessing unlinks the segments it left behind. Processes attaching to a population never unlink its segments,
+closing their mapping only. They are expected to be started by the owner, e.g the workers of a process pool, with
+which they share the resource tracker.
+
+For a run, two shared populations are swapped by a DoubleBuffer, so the children are bred straight into shared
+memory:
+
+with shared.SharedPopulation.from_individuals(individuals) as current, shared.SharedPopulation.like(current) as spare:
+    buffer = population.DoubleBuffer(current, spare=spare)
+    with fitness.Evaluator(fitness_function, processes=8) as evaluator:
+        for generation in range(generations):
+            fitness = evaluator.evaluate(buffer.current)
+            evolve.evolve_best(buffer.current, fitness, n_parents, mutation, buffer=buffer)
+"""
+
+_PREFIX = "ga-"
+
+
+class SharedHandle:
+    """
+    Picklable description of a SharedPopulation, enough for another process to attach to it.
+    """
+    __slots__ = ("genomes_name", "fitness_name", "shape", "dtype")
+
+    def __init__(self, genomes_name, fitness_name, shape, dtype):
+        """
+        :param genomes_name: String, name of the genome matrix segment
+        :param fitness_name: String, name of the fitness vector segment
+        :param shape: Tuple (n_individuals, n_genes)
+        :param dtype: String, numpy dtype of the genome matrix
+        """
+        self.genomes_name = genomes_name
+        self.fitness_name = fitness_name
+        self.shape = tuple(shape)
+        self.dtype = dtype
+
+    def __repr__(self):
+        return "SharedHandle(genomes_name={!r}, shape={}, dtype={})".format(self.genomes_name, self.shape, self.dtype)
+
+
+class SharedPopulation(population.Population):
+    """
+    Population whose genome matrix and fitness vector live in shared memory.
+    """
+    __slots__ = ("fitness", "handle", "owner", "_segments", "_finalizer", "__weakref__")
+
+    def __init__(self, segments, handle, owner):
+        """
+        Use 'create', 'from_individuals', 'like' or 'attach' instead.
+        :param segments: Tuple of the SharedMemory of the genome matrix and of the fitness vector
+        :param handle: SharedHandle
+        :param owner: Boolean, True if this process created the segments and unlinks them
+        """
+        genomes_segment, fitness_segment = segments
+        super().__init__(np.ndarray(handle.shape, dtype=handle.dtype, buffer=genomes_segment.buf))
+        self.fitness = np.ndarray((handle.shape[0],), dtype=np.float64, buffer=fitness_segment.buf)
+        self.handle = handle
+        self.owner = owner
+        self._segments = segments
+        self._finalizer = weakref.finalize(self, _release, segments, owner)
+
+    @classmethod
+    def create(cls, n_individuals, n_genes, dtype=float):
+        """
+        Allocate a population in new shared memory segments, the genomes are uninitialised and the fitness is NaN.
+        :param n_individuals: Integer
+        :param n_genes: Integer
+        :param dtype: numpy dtype of the genome matrix
+        :return: SharedPopulation owned by this process
+        """
+        dtype = np.dtype(dtype)
+        name = _PREFIX + uuid.uuid4().hex[:16]
+        # Segments of 0 bytes are not allowed
+        genomes_segment = shared_memory.SharedMemory(name + "-g", create=True,
+                                                     size=max(1, n_individuals * n_genes * dtype.itemsize))
+        try:
+            fitness_segment = shared_memory.SharedMemory(name + "-f", create=True, size=max(1, n_individuals * 8))
+        except BaseException:
+            _release((genomes_segment,), True)
+            raise
+        handle = SharedHandle(genomes_segment.name, fitness_segment.name, (n_individuals, n_genes), dtype.str)
+        pop = cls((genomes_segment, fitness_segment), handle, owner=True)
+        pop.fitness.fill(np.nan)
+        return pop
+
+    @classmethod
+    def from_individuals(cls, individuals, fitness=None):
+        """
+        Copy individuals (and optionally their fitness) into a new shared population.
+        :param individuals: List of individuals, 2-D numpy array or Population (not a BinaryPopulation)
+        :param fitness: Optional list of fitness values of individuals
+        :return: SharedPopulation owned by this process
+        """
+        source = population.as_population(individuals)
+        if type(source) is not population.Population and not isinstance(source, SharedPopulation):
+            raise ValueError("SharedPopulation does not support {}".format(type(source).__name__))
+        pop = cls.create(len(source), source.n_genes, source.dtype)
+        pop.genomes[:] = source.genomes
+        if fitness is not None:
+            pop.fitness[:] = fitness
+        return pop
+
+    @classmethod
+    def like(cls, pop):
+        """
+        :param pop: Population
+        :return: New SharedPopulation owned by this process, of the same shape and dtype as pop
+        """
+        return cls.create(len(pop), pop.n_genes, pop.dtype)
+
+    @classmethod
+    def attach(cls, handle):
+        """
+        Map the segments of a population created by another process.
+        :param handle: SharedHandle of the population
+        :return: SharedPopulation, not owned: closing it leaves the segments to their owner
+        """
+        genomes_segment = _open(handle.genomes_name)
+        try:
+            fitness_segment = _open(handle.fitness_name)
+        except BaseException:
+            genomes_segment.close()
+            raise
+        return cls((genomes_segment, fitness_segment), handle, owner=False)
+
+    @property
+    def closed(self):
+        return not self._finalizer.alive
+
+    def close(self):
+        """
+        Release the memory of the population in this process, unlinking the segments if this process owns them.
+        The genomes and fitness arrays must not be used afterwards.
+        """
+        self.genomes = self.fitness = None
+        self._finalizer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __reduce__(self):
+        # Sent to another process as its handle, the receiver attaches instead of copying the genomes
+        return attached, (self.handle,)
+
+    def __repr__(self):
+        return "SharedPopulation(n_individuals={}, n_genes={}, dtype={}, name={!r})".format(
+            self.handle.shape[0], self.handle.shape[1], self.handle.dtype, self.handle.genomes_name)
+
+
+def attached(handle):
+    """
+    Attach to a shared population, reusing the mapping made by a previous call in this process. Meant for worker
+    processes, which see the same populations generation after generation.
+    :param handle: SharedHandle
+    :return: SharedPopulation, not owned
+    """
+    pop = _attached.get(handle.genomes_name)
+    if pop is None:
+        pop = SharedPopulation.attach(handle)
+        _attached[handle.genomes_name] = pop
+        if len(_attached) > _MAX_ATTACHED:
+            _attached.popitem(last=False)[1].close()
+    else:
+        _attached.move_to_end(handle.genomes_name)
+    return pop
+
+
+def _open(name):
+    """
+    Open an existing segment without taking ownership of it.
+    """
+    try:
+        return shared_memory.SharedMemory(name, track=False)
+    except TypeError:
+        # Before Python 3.13 the segment is registered with the resource tracker, which the processes started by the
+        # owner share with it: the registration is the same as the owner's and the segment is not unlinked before the
+        # owner unlinks it
+        return shared_memory.SharedMemory(name)
+
+
+def _release(segments, owner):
+    for segment in segments:
+        try:
+            segment.close()
+        except BufferError:
+            # numpy views of the segment are still alive, the mapping is released with them
+            pass
+        if owner:
+            try:
+                segment.unlink()
+            except FileNotFoundError:
+                pass
+
+
+# Mappings of worker processes, least recently used first. A DoubleBuffer alternates two populations.
+_MAX_ATTACHED = 4
+_attached = OrderedDict()
+
+# The finalizers of populations still alive at exit run through weakref's atexit hook, close the worker mappings too
+atexit.register(lambda: [pop.close() for pop in list(_attached.values())])
@@ -0,0 +1,171 @@
+import heapq
+from typing import Callable, Optional
+
+import numpy as np
+
+from tools import crossover
+from tools import fitness as fit
+from tools import genome
+from tools import mutation as mut
+from tools import population
+from tools import rng
+
+"""
+Steady-state evolution.
+
+The evolve_* strategies are generational: every call breeds a whole new population, which is then scored in full.
+A steady-state engine instead breeds a few offspring (lambda) per step, scores only them and lets each one replace the
+worst member of the population (mu individuals) if it is better, i.e (mu + lambda) survival applied one offspring at a
+time. Only lambda fitness evaluations are needed per step, which suits expensive objectives and continuous operation:
+the population is always complete and can be read between steps.
+
+The fitness ranking is kept in two binary heaps of (fitness, slot) entries, a min-heap to find the worst member and a
+max-heap to find the best one. Replacing a member pushes one entry on each heap, O(log mu), instead of sorting the
+population. Entries of replaced members are left in the heaps and skipped when they reach the top (each slot has a
+version number), the heaps are rebuilt when they grow to several times the population size.
+
+Parents are chosen by tournament among the whole population.
+
+Example:
+engine = SteadyState(individuals, fitness, fitness_function, n_offspring=8)
+while engine.best_fitness < target:
+    engine.step()
+"""
+
+
+class SteadyState:
+    """
+    Steady-state (mu + lambda) evolution of a population, updated in place.
+    """
+
+    def __init__(self, individuals, fitness, fitness_function: Optional[Callable] = None, n_offspring=2,
+                 tour_size=3, co_prob=0.5, mutation: Optional[Callable] = None, batch=False, evaluator=None):
+        """
+        :param individuals: List of individuals, 2-D numpy array or Population (mu = number of individuals)
+        :param fitness: List of fitness values of individuals, NaN values count as -inf
+        :param fitness_function: Callable, scalar, batch or coroutine fitness function (see tools.fitness)
+        :param n_offspring: Integer, lambda, number of offspring bred and scored per step
+        :param tour_size: Integer, size of the tournaments choosing the parents
+        :param co_prob: Float, probability of swapping each gene in the uniform crossover of the parents
+        :param mutation: Optional callable mutating an offspring in place. Defaults to mutation.mut_default of the
+        offspring with probability 0.01, e.g Gaussian for float genes and swaps for permutations.
+        :param batch: Boolean, True if fitness_function scores a whole genome matrix at once
+        :param evaluator: Optional object with an evaluate(individuals) method, e.g a tools.fitness.Evaluator, used
+        instead of fitness_function
+        """
+        if fitness_function is None and evaluator is None:
+            raise ValueError("SteadyState needs a fitness_function or an evaluator")
+        self.population = population.as_population(individuals).copy()
+        # NaN fitness (e.g a failed evaluation) ranks below every value, it would break the ordering of the heaps
+        self.fitness = np.nan_to_num(np.array(fitness, dtype=float), nan=-np.inf, posinf=np.inf, neginf=-np.inf)
+        self.fitness_function = fitness_function
+        self.n_offspring = n_offspring
+        self.tour_size = tour_size
+        self.co_prob = co_prob
+        self.mutation = mutation
+        self.batch = batch
+        self.evaluator = evaluator
+        self.steps = 0
+        self.evaluations = 0
+        self.replacements = 0
+        self._version = np.zeros(len(self.fitness), dtype=np.int64)
+        self._rebuild()
+
+    def step(self):
+        """
+        Breed, score and insert 'n_offspring' offspring.
+        :return: Integer, number of offspring that replaced a member of the population
+        """
+        offspring = self._breed()
+        offspring_fitness = self._evaluate(offspring)
+        self.steps += 1
+        self.evaluations += len(offspring_fitness)
+        replaced = 0
+        for row, value in enumerate(offspring_fitness):
+            if self.insert(offspring[row], value) is not None:
+                replaced += 1
+        return replaced
+
+    def insert(self, individual, value):
+        """
+        Replace the worst member of the population with 'individual' if it is better.
+        :param individual: Genome, row of a genome matrix of the same kind as the population
+        :param value: Float, fitness of individual (NaN counts as -inf)
+        :return: Index of the replaced member, or None if individual is not better than the worst member
+        """
+        value = -np.inf if np.isnan(value) else float(value)
+        slot, worst = self.worst()
+        if not value > worst:
+            return None
+        heapq.heappop(self._min_heap)
+        self.population.genomes[slot] = individual.packed if isinstance(individual, genome.BinaryGenome) \
+            else individual
+        self.fitness[slot] = value
+        self._version[slot] += 1
+        version = int(self._version[slot])
+        heapq.heappush(self._min_heap, (value, version, slot))
+        heapq.heappush(self._max_heap, (-value, version, slot))
+        self.replacements += 1
+        if len(self._max_heap) > 4 * len(self.fitness):
+            self._rebuild()
+        return slot
+
+    def worst(self):
+        """
+        :return: Tuple (index, fitness) of the worst member of the population
+        """
+        heap = self._min_heap
+        while heap[0][1] != self._version[heap[0][2]]:
+            heapq.heappop(heap)
+        value, _, slot = heap[0]
+        return slot, value
+
+    def best(self):
+        """
+        :return: Tuple (index, fitness) of the best member of the population
+        """
+        heap = self._max_heap
+        while heap[0][1] != self._version[heap[0][2]]:
+            heapq.heappop(heap)
+        value, _, slot = heap[0]
+        return slot, -value
+
+    @property
+    def best_fitness(self):
+        return self.best()[1]
+
+    @property
+    def best_individual(self):
+        return self.population[self.best()[0]]
+
+    def _rebuild(self):
+        # Heaps of the current members only, dropping the entries of replaced members
+        slots = range(len(self.fitness))
+        values = self.fitness.tolist()
+        versions = self._version.tolist()
+        self._min_heap = [(values[i], versions[i], i) for i in slots]
+        self._max_heap = [(-values[i], versions[i], i) for i in slots]
+        heapq.heapify(self._min_heap)
+        heapq.heapify(self._max_heap)
+
+    def _breed(self):
+        """
+        :return: Population of n_offspring mutated children of tournament winners
+        """
+        generator = rng.get()
+        entrants = generator.integers(0, len(self.fitness), size=(2, self.n_offspring, self.tour_size))
+        # Winner of each tournament: the entrant with the best fitness
+        winners = np.take_along_axis(entrants, np.argmax(self.fitness[entrants], axis=2)[..., None], axis=2)[..., 0]
+        offspring, _ = crossover.co_uniform(self.population.take(winners[0]), self.population.take(winners[1]),
+                                            self.co_prob, modify_in_place=True)
+        if self.mutation is not None:
+            for child in offspring:
+                self.mutation(child)
+        else:
+            mut.mut_default(offspring, 0.01)
+        return offspring
+
+    def _evaluate(self, offspring):
+        if self.evaluator is not None:
+            return self.evaluator.evaluate(offspring)
+        return fit.evaluate(offspring, self.fitness_function, self.batch)
@@ -0,0 +1,307 @@
+import math
+from typing import Callable, Optional
+
+import numpy as np
+
+from tools import cache
+from tools import extra
+from tools import fitness as fit
+from tools import genome
+from tools import population
+from tools import rng
+
+"""
+Surrogate assisted evaluation.
+
+When the fitness function is an expensive simulation, scoring every child of every generation dominates the run.
+A Surrogate learns a cheap model of the fitness from the (genome, fitness) pairs scored so far and pre-screens the
+children of each generation: the model ranks them, only the best ranked fraction (plus a few random children, the
+exploration fraction, so the model also learns outside of the region it favours) is scored by the fitness function,
+and the other children get the fitness predicted by the model. Surrogate.estimated flags the predicted values of the
+last generation, tools.driver leaves them out of the best so far and of its termination policies.
+
+Genomes already scored, e.g the elite copied unchanged, get their true fitness back from a FitnessCache (see
+tools.cache). The first generations are scored entirely until the history holds 'warmup' genomes.
+
+Models, NumPy only and refitted on the history after every generation:
+RidgeModel: ridge regression on the genes and their squares, i.e a separable quadratic model of the fitness.
+KNNModel: inverse distance weighted mean fitness of the k nearest genomes of the history.
+Any object with fit(features, fitness) and predict(features) methods can be used, the features being the genes as
+floats (one per bit for a BinaryPopulation).
+
+Every generation the predictions for the children that were scored are compared to their true fitness, and
+Surrogate.accuracy records the mean absolute error and the rank correlation. A Surrogate has the 'evaluate' method of
+an evaluator, tools.driver.iterate counts only the true evaluations it makes:
+
+screening = surrogate.Surrogate(fitness_function, fraction=0.25)
+snapshot = driver.run(individuals, fitness_function, evolve.evolve_best, (n_parents, mutation),
+                      stop=[driver.evaluation_budget(10000)], evaluator=screening)
+print(screening.saved, screening.accuracy[-1])
+"""
+
+# Rows processed at once by the nearest neighbours search, bounding the size of the distance matrix
+_BLOCK = 1024
+
+
+class RidgeModel:
+    """
+    Ridge regression of the fitness on the standardized genes, and their squares if 'squares'.
+    """
+
+    def __init__(self, alpha=1., squares=True):
+        """
+        :param alpha: Float, L2 regularization of the weights
+        :param squares: Boolean, also regress on the squared genes, which fits fitness functions with an optimum
+        inside the search space (e.g sum of squares)
+        """
+        self.alpha = alpha
+        self.squares = squares
+        self._mean = self._scale = self._weights = None
+        self._offset = 0.
+
+    def fit(self, features, fitness):
+        """
+        :param features: 2-D numpy array, one row per genome
+        :param fitness: numpy array, fitness of each row
+        """
+        x = self._expand(features)
+        self._mean = x.mean(axis=0)
+        self._scale = x.std(axis=0)
+        self._scale[self._scale == 0] = 1.
+        x = (x - self._mean) / self._scale
+        self._offset = fitness.mean()
+        y = fitness - self._offset
+        n_samples, n_features = x.shape
+        # Solve the smaller of the primal and dual systems
+        if n_samples >= n_features:
+            self._weights = np.linalg.solve(x.T @ x + self.alpha * np.eye(n_features), x.T @ y)
+        else:
+            self._weights = x.T @ np.linalg.solve(x @ x.T + self.alpha * np.eye(n_samples), y)
+
+    def predict(self, features):
+        """
+        :param features: 2-D numpy array, one row per genome
+        :return: numpy array, predicted fitness of each row
+        """
+        return ((self._expand(features) - self._mean) / self._scale) @ self._weights + self._offset
+
+    def _expand(self, features):
+        return np.hstack((features, features ** 2)) if self.squares else features
+
+
+class KNNModel:
+    """
+    Inverse distance weighted mean fitness of the k nearest genomes (Euclidean distance).
+    """
+
+    def __init__(self, k=5):
+        """
+        :param k: Integer, number of neighbours
+        """
+        self.k = k
+        self._features = self._fitness = self._norms = None
+
+    def fit(self, features, fitness):
+        """
+        :param features: 2-D numpy array, one row per genome
+        :param fitness: numpy array, fitness of each row
+        """
+        self._features = features
+        self._fitness = fitness
+        self._norms = (features ** 2).sum(axis=1)
+
+    def predict(self, features):
+        """
+        :param features: 2-D numpy array, one row per genome
+        :return: numpy array, predicted fitness of each row
+        """
+        k = min(self.k, len(self._fitness))
+        predicted = np.empty(len(features))
+        for start in range(0, len(features), _BLOCK):
+            rows = features[start:start + _BLOCK]
+            squared = (rows ** 2).sum(axis=1)[:, None] + self._norms - 2 * rows @ self._features.T
+            nearest = np.argpartition(squared, k - 1, axis=1)[:, :k]
+            distances = np.sqrt(np.maximum(np.take_along_axis(squared, nearest, axis=1), 0.))
+            weights = 1. / (distances + 1e-12)
+            predicted[start:start + _BLOCK] = (weights * self._fitness[nearest]).sum(axis=1) / weights.sum(axis=1)
+        return predicted
+
+
+class Surrogate:
+    """
+    Evaluator scoring only the children a surrogate model ranks best, the others get the predicted fitness.
+    """
+
+    def __init__(self, fitness_function: Optional[Callable] = None, batch=False, evaluator=None, model=None,
+                 fraction=0.3, exploration=0.05, history=5000, warmup: Optional[int] = None):
+        """
+        :param fitness_function: Callable, scalar or batch fitness function (ignored if evaluator is given)
+        :param batch: Boolean, True if fitness_function scores a whole genome matrix at once
+        :param evaluator: Optional evaluator scoring the selected children, e.g a tools.fitness.Evaluator
+        :param model: Object with fit(features, fitness) and predict(features) methods, defaults to a RidgeModel
+        :param fraction: Float in (0, 1], fraction of the new children scored by the fitness function
+        :param exploration: Float, fraction of the new children scored at random instead of by rank, part of
+        'fraction'
+        :param history: Integer, number of scored genomes the model is fitted on (the most recent ones) and
+        remembered by the fitness cache
+        :param warmup: Integer, number of scored genomes needed before the model is used. Defaults to two
+        generations.
+        """
+        self.fitness_function = fitness_function
+        self.batch = batch
+        self.evaluator = evaluator
+        self.model = RidgeModel() if model is None else model
+        self.fraction = fraction
+        self.exploration = exploration
+        self.history = history
+        self.warmup = warmup
+        self.cache = cache.FitnessCache(maxsize=history)
+        self.evaluations = 0
+        self.estimates = 0
+        self.last_evaluations = 0
+        self.estimated = np.zeros(0, dtype=bool)
+        self.accuracy = []
+        self._features = self._fitness = None
+        self._size = 0
+        self._next = 0
+
+    @property
+    def saved(self):
+        """
+        :return: Float, fraction of the fitness values predicted instead of scored
+        """
+        total = self.evaluations + self.estimates
+        return self.estimates / total if total else 0.
+
+    def evaluate(self, individuals) -> list:
+        """
+        Fitness of every individual: true fitness for the genomes scored now or before, predicted for the others.
+        :param individuals: List of individuals, 2-D numpy array or Population
+        :return: List of fitness values, index aligned with individuals
+        """
+        pop = population.as_population(individuals)
+        n = len(pop)
+        fitness = np.empty(n)
+        # First occurrence of every genome missing from the cache, and the rows repeating it
+        missing, repeats = {}, []
+        for i, row in enumerate(pop.genomes):
+            value = self.cache.get(row, _MISSING)
+            if value is not _MISSING:
+                fitness[i] = value
+            else:
+                key = cache.genome_key(row)
+                if key in missing:
+                    repeats.append((i, missing[key]))
+                else:
+                    missing[key] = i
+        new = np.fromiter(missing.values(), dtype=np.intp, count=len(missing))
+        warmup = 2 * n if self.warmup is None else self.warmup
+        estimated = np.zeros(n, dtype=bool)
+        if self._size >= max(warmup, 1) and len(new):
+            features = _features(pop.take(new))
+            predicted = self.model.predict(features)
+            chosen = self._screen(predicted)
+            fitness[new] = predicted
+            estimated[new] = True
+            estimated[new[chosen]] = False
+            scored = new[chosen]
+        else:
+            predicted = chosen = None
+            scored = new
+        values = np.asarray(self._score(individuals, scored), dtype=np.float64)
+        fitness[scored] = values
+        for i, value in zip(scored.tolist(), values.tolist()):
+            self.cache.put(pop.genomes[i], value)
+        for i, first in repeats:
+            fitness[i] = fitness[first]
+            estimated[i] = estimated[first]
+        if predicted is not None:
+            self.accuracy.append(_accuracy(predicted[chosen], values))
+        if len(scored):
+            self._remember(_features(pop.take(scored)), values)
+        self.last_evaluations = len(scored)
+        self.evaluations += len(scored)
+        self.estimates += int(np.count_nonzero(estimated))
+        self.estimated = estimated
+        return fitness.tolist()
+
+    def _screen(self, predicted):
+        """
+        :param predicted: numpy array, predicted fitness of the new children
+        :return: numpy array, index of the children to score: the best predicted and a few random ones
+        """
+        n_scored = min(len(predicted), max(1, math.ceil(self.fraction * len(predicted))))
+        n_random = min(n_scored - 1, round(self.exploration * len(predicted))) if n_scored > 1 else 0
+        order = np.argsort(-predicted, kind="stable")
+        best = order[:n_scored - n_random]
+        others = rng.get().choice(order[n_scored - n_random:], size=n_random, replace=False)
+        return np.sort(np.concatenate((best, others)))
+
+    def _score(self, individuals, index):
+        """
+        Score the individuals 'index' with the fitness function, passed in the type of individuals.
+        :return: List of fitness values
+        """
+        if not len(index):
+            return []
+        if population.is_population(individuals):
+            subset = individuals.take(index)
+        elif extra.is_numpy(individuals):
+            subset = individuals[index]
+        else:
+            subset = [individuals[i] for i in index.tolist()]
+        if self.evaluator is not None:
+            return self.evaluator.evaluate(subset)
+        return fit.evaluate(subset, self.fitness_function, self.batch)
+
+    def _remember(self, features, values):
+        """
+        Add scored genomes to the history (a ring buffer of the last 'history' genomes) and refit the model.
+        Genomes with a non finite fitness, e.g penalties, are left out.
+        """
+        finite = np.isfinite(values)
+        features, values = features[finite][-self.history:], values[finite][-self.history:]
+        if self._features is None:
+            self._features = np.empty((self.history, features.shape[1]))
+            self._fitness = np.empty(self.history)
+        rows = (self._next + np.arange(len(values))) % self.history
+        self._features[rows] = features
+        self._fitness[rows] = values
+        self._next = (self._next + len(values)) % self.history
+        self._size = min(self.history, self._size + len(values))
+        if self._size:
+            self.model.fit(self._features[:self._size], self._fitness[:self._size])
+
+
+def _features(pop):
+    """
+    :param pop: Population
+    :return: 2-D numpy array of floats, one row per individual and one column per gene (per bit if binary)
+    """
+    if isinstance(pop, genome.BinaryPopulation):
+        return genome.unpack_bits(pop.genomes, pop.n_bits).astype(np.float64)
+    genomes = pop.genomes
+    if genomes.dtype.kind == "U" and genomes.dtype.itemsize == 4:
+        # Single characters, e.g strings split by Population.from_list, as their code points
+        genomes = genomes.view(np.uint32)
+    return genomes.astype(np.float64)
+
+
+def _accuracy(predicted, values):
+    """
+    :return: Tuple (mean absolute error, Spearman rank correlation) of the predictions of the scored children
+    """
+    finite = np.isfinite(values)
+    predicted, values = predicted[finite], values[finite]
+    if not len(values):
+        return math.nan, math.nan
+    error = float(np.abs(predicted - values).mean())
+    if len(values) < 2:
+        return error, math.nan
+    ranks = np.argsort(np.argsort(predicted)), np.argsort(np.argsort(values))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        correlation = np.corrcoef(*ranks)[0, 1]
+    return error, float(correlation)
+
+
+_MISSING = object()